@@ -1,80 +1,213 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
-from pathlib import Path
-import tarfile
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, StreamingResponse
+import base64
+import json
+import os
 from datetime import datetime
-
-from backend.models import PackageRequest
-from backend.task_manager import task_manager
+from typing import Iterator, Optional, Tuple
+
+from backend.archive import (
+    BUNDLE_MEDIA_TYPES,
+    bundle_path,
+    check_bundle_format,
+    live_archive,
+    open_live_archive,
+    release_live_archive,
+)
+from backend.models import (
+    ConcurrencyUpdate,
+    PackageRequest,
+    PlannedPackage,
+    ResolvePlan,
+    TaskStatus,
+    UnresolvedRequirement,
+)
+from backend.events import task_events
+from backend.jobs import create_job_queue
+from backend.scheduler import QueueFull, download_scheduler
+from backend.task_manager import TERMINAL_STATUSES, TaskAbandoned, task_manager
 from backend.config import config
-from backend.resolvers.rpm import RPMRepodataParser, RPMDependencyResolver
-from backend.resolvers.deb import DEBPackageParser, DEBDependencyResolver
-from backend.downloaders.http import PackageDownloader
+from backend.resolvers.rpm import RPMDependencyResolver
+from backend.resolvers.deb import DEBDependencyResolver
+from backend.resolvers.registry import parser_registry
+from backend.resolvers.closure_cache import closure_cache
+from backend.resolvers.graph import dependency_graph
+from backend.resolvers.manifest import InstalledManifest
+from backend.downloaders import create_downloader
+from backend.downloaders.mirrors import mirror_group_for
+
+# 配置了共享任务队列时, 任务交给 worker 进程执行, 否则在本进程内调度
+job_queue = create_job_queue()
 
 router = APIRouter(prefix="/api", tags=["api"])
 
 
-def run_download_task(task_id: str, request: PackageRequest):
-    """后台执行下载任务"""
-    try:
-        task_manager.update_task(
-            task_id, status="running", progress=10, message="正在解析依赖..."
-        )
-        task_manager.increment_active()
-
-        # 解析依赖
-        if request.system_type == "rpm":
-            dist_config = config.DISTRIBUTIONS.get(request.distribution)
-            if not dist_config:
-                raise ValueError(f"不支持的发行版: {request.distribution}")
+def _select_parser(request: PackageRequest):
+    """返回 (parser, 解析器类, 架构)"""
+    dist_config = config.DISTRIBUTIONS.get(request.distribution)
+    if not dist_config:
+        raise ValueError(f"不支持的发行版: {request.distribution}")
+
+    if request.system_type == "rpm":
+        arch = dist_config.get("arch", "x86_64")
+        return parser_registry.get_rpm_parser(dist_config["baseos"]), RPMDependencyResolver, arch
+
+    # deb: 映射架构 x86_64 -> amd64, aarch64 -> arm64
+    arch_mapping = {
+        "x86_64": "amd64",
+        "aarch64": "arm64",
+        "noarch": "all"
+    }
+    arch = arch_mapping.get(request.arch, dist_config.get("arch", "amd64"))
+    return parser_registry.get_deb_parser(dist_config["main"], arch), DEBDependencyResolver, arch
+
+
+def _resolve_packages(request: PackageRequest):
+    """
+    解析请求中所有根包的闭包
+
+    返回 (parser, 解析器类, 包记录列表, 无法满足的依赖 [(包名, 依赖项)], 架构)
+    """
+    parser, resolver_cls, arch = _select_parser(request)
+
+    if request.installed:
+        # 目标机已有的包视为已解析: 广度优先遍历到这些包即停止, 不展开其依赖
+        manifest = InstalledManifest.parse(request.installed)
+        resolver = resolver_cls(parser)
+        resolver.mark_installed(manifest.satisfied(parser.package_cache, request.packages))
+        packages = []
+        for pkg_name in request.packages:
+            packages.extend(resolver.resolve(pkg_name))
+        return parser, resolver_cls, packages, resolver.unresolved, arch
+
+    # 闭包按依赖图的强连通分量预计算, 每个根包的闭包位图再按仓库版本缓存,
+    # 多个根包的闭包即位图的并集
+    graph = dependency_graph(parser, resolver_cls)
+    bits = 0
+    for pkg_name in request.packages:
+        closure = closure_cache.get(request.distribution, arch, parser.revision, pkg_name)
+        if closure is None:
+            closure = graph.closure([pkg_name])
+            closure_cache.put(request.distribution, arch, parser.revision, pkg_name, closure)
+        bits |= closure
+
+    return parser, resolver_cls, graph.packages(bits), graph.unresolved_in(bits), arch
+
+
+def resolve_download_list(request: PackageRequest) -> list:
+    """解析请求中的所有包及其依赖, 返回去重后的下载列表"""
+    parser, resolver_cls, packages, _, _ = _resolve_packages(request)
+    return resolver_cls(parser).get_download_list(packages)
+
+
+def resolve_download_stream(request: PackageRequest) -> Iterator[dict]:
+    """
+    边解析边产出下载项, 供下载器在解析期间就开始下载
+
+    所有根包的闭包都已缓存时直接展开缓存; 否则按广度优先遍历的发现顺序逐个产出,
+    产出完毕后再计算依赖图闭包填充缓存 (此时下载仍在进行, 不占用关键路径)。
+    两条路径的提供者选择规则相同, 只有产出顺序不同, 包集合一致。
+    """
+    parser, resolver_cls, arch = _select_parser(request)
+    cached = not request.installed and all(
+        closure_cache.get(request.distribution, arch, parser.revision, pkg_name) is not None
+        for pkg_name in request.packages
+    )
+    if cached:
+        yield from resolve_download_list(request)
+        return
+
+    resolver = resolver_cls(parser)
+    if request.installed:
+        manifest = InstalledManifest.parse(request.installed)
+        resolver.mark_installed(manifest.satisfied(parser.package_cache, request.packages))
+    yield from resolver.iter_download_list(
+        pkg for pkg_name in request.packages for pkg in resolver.iter_resolve(pkg_name)
+    )
 
-            parser = RPMRepodataParser(dist_config["baseos"])
-            parser.load_metadata()
-            parser.parse_packages()
+    if not request.installed:
+        _resolve_packages(request)
 
-            resolver = RPMDependencyResolver(parser)
-            packages = []
-            for pkg_name in request.packages:
-                packages.extend(resolver.resolve(pkg_name))
 
-            download_list = resolver.get_download_list(packages)
+def resolve_plan(request: PackageRequest) -> ResolvePlan:
+    """只解析不下载: 返回下载列表、各包大小 (取自仓库元数据) 与无法满足的依赖"""
+    parser, resolver_cls, packages, unresolved, arch = _resolve_packages(request)
+    download_list = resolver_cls(parser).get_download_list(packages)
 
-        else:  # deb
-            dist_config = config.DISTRIBUTIONS.get(request.distribution)
-            if not dist_config:
-                raise ValueError(f"不支持的发行版: {request.distribution}")
+    if request.system_type == "rpm":
+        fields = ("name", "version", "arch", "size")
+    else:
+        fields = ("Package", "Version", "Architecture", "Size")
 
-            # 映射架构: x86_64 -> amd64, aarch64 -> arm64
-            arch_mapping = {
-                "x86_64": "amd64",
-                "aarch64": "arm64",
-                "noarch": "all"
-            }
-            deb_arch = arch_mapping.get(request.arch, dist_config.get("arch", "amd64"))
+    packages = [
+        PlannedPackage(
+            name=pkg[fields[0]],
+            version=pkg[fields[1]],
+            arch=pkg.get(fields[2]),
+            url=pkg["url"],
+            size=int(pkg.get(fields[3]) or 0),
+        )
+        for pkg in download_list
+    ]
+
+    return ResolvePlan(
+        distribution=request.distribution,
+        system_type=request.system_type,
+        arch=arch,
+        revision=parser.revision,
+        packages=packages,
+        packages_count=len(packages),
+        total_size=sum(pkg.size for pkg in packages),
+        unresolved=[
+            UnresolvedRequirement(package=name, requirement=requirement)
+            for name, requirement in unresolved
+        ],
+    )
 
-            parser = DEBPackageParser(dist_config["main"], arch=deb_arch)
-            parser.load_packages()
 
-            resolver = DEBDependencyResolver(parser)
-            packages = []
-            for pkg_name in request.packages:
-                packages.extend(resolver.resolve(pkg_name))
+def _while_owned(task_id: str, packages: Iterator[dict]) -> Iterator[dict]:
+    """任务被删除或被其他 worker 接管后不再产出下载项, 下载器随即放弃尚未开始的下载"""
+    for pkg in packages:
+        if not task_manager.owns(task_id):
+            raise TaskAbandoned(task_id)
+        yield pkg
 
-            download_list = resolver.get_download_list(packages)
 
+def run_download_task(task_id: str, request: PackageRequest):
+    """后台执行下载任务"""
+    try:
         task_manager.update_task(
-            task_id, progress=30, message=f"找到 {len(download_list)} 个包,开始下载..."
+            task_id, status="running", progress=10, message="正在解析依赖并下载..."
         )
+        task_manager.increment_active()
 
-        # 下载
+        # 解析与下载流水线: 解析器每发现一个包即交给下载器
+        download_stream = _while_owned(task_id, resolve_download_stream(request))
+
+        # 下载: 每个包完成后即追加到压缩包, 任务运行期间客户端即可开始接收
         output_dir = config.DOWNLOAD_DIR / task_id / "packages"
-        downloader = PackageDownloader(max_workers=5)
+        bundle_format = task_manager.get_task(task_id).bundle_format
+        downloader = create_downloader(
+            max_workers=5, mirrors=mirror_group_for(config.DISTRIBUTIONS[request.distribution])
+        )
+        config.DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
+        archive = open_live_archive(task_id, bundle_format, ["packages", "packages/packages"])
+        if job_queue is None:
+            # 使用共享任务队列时压缩包在 worker 进程中写入, API 进程无法跟随其进度,
+            # 完成后才提供下载链接 (前端据此隐藏"边下载边获取")
+            task_manager.update_task(task_id, download_url=f"/api/download/{task_id}")
 
         progress_count = [0]
 
         def progress_callback(current, total, pkg):
+            # 两种下载器都以 URL 的文件名保存
+            filename = os.path.basename(pkg["url"])
+            archive.add(output_dir / filename, f"packages/packages/{filename}")
             progress_count[0] += 1
-            progress = 30 + int((progress_count[0] / total) * 50)
+            # 解析期间 total 仍在增长, 进度只增不减
+            progress = max(
+                task_manager.get_task(task_id).progress, 10 + int((progress_count[0] / total) * 80)
+            )
             task_manager.update_task(
                 task_id,
                 progress=progress,
@@ -82,22 +215,25 @@ def run_download_task(task_id: str, request: PackageRequest):
                 f"({progress_count[0]}/{total})",
             )
 
-        downloader.download_packages(download_list, output_dir, progress_callback)
-
-        task_manager.update_task(task_id, progress=85, message="正在打包...")
-
-        # 打包
-        tarball_path = config.DOWNLOAD_DIR / f"packages-{task_id}.tar.gz"
-        with tarfile.open(tarball_path, "w:gz") as tar:
-            tar.add(output_dir.parent, arcname="packages")
+        try:
+            results = downloader.download_packages(download_stream, output_dir, progress_callback)
+            if not task_manager.owns(task_id):
+                raise TaskAbandoned(task_id)
+            task_manager.update_task(task_id, progress=95, message="正在完成打包...")
+            archive.close()
+        except Exception as e:
+            # 已由其他 worker 接管的任务, 同名压缩包可能正由对方写入
+            archive.abort(e, remove=not isinstance(e, TaskAbandoned))
+            raise
 
         task_manager.update_task(
             task_id,
             status="completed",
             progress=100,
             message="下载完成!",
-            packages_count=len(download_list),
-            total_size=f"{Path(tarball_path).stat().st_size / (1024*1024):.2f} MB",
+            packages_count=results["total"],
+            cache_hits=results["cache_hits"],
+            total_size=f"{archive.path.stat().st_size / (1024*1024):.2f} MB",
             completed_at=datetime.now().isoformat(),
             download_url=f"/api/download/{task_id}",
         )
@@ -107,26 +243,160 @@ def run_download_task(task_id: str, request: PackageRequest):
             task_id, status="failed", message=f"下载失败: {str(e)}", error=str(e)
         )
     finally:
+        # 状态变为终态之后再移除, 流式下载请求不会落在两者之间
+        release_live_archive(task_id)
         task_manager.decrement_active()
 
 
 @router.post("/download")
-async def create_download_task(
-    request: PackageRequest, background_tasks: BackgroundTasks
-):
-    """创建下载任务"""
+def create_download_task(request: PackageRequest, http_request: Request):
+    """
+    创建下载任务, 交由全局调度器排队执行
+
+    同步路由, 在线程池中执行: 写入任务数据库与共享任务队列 (等待其他进程的写锁)
+    都会阻塞, 不能占用事件循环。
+    """
+    try:
+        check_bundle_format(request.bundle_format or config.BUNDLE_FORMAT)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     task = task_manager.create_task(request)
 
-    background_tasks.add_task(run_download_task, task.task_id, request)
+    # 客户端标识: 优先取 X-Client-Id, 否则按来源地址公平分配槽位
+    client = http_request.headers.get("X-Client-Id") or (
+        http_request.client.host if http_request.client else ""
+    )
+    try:
+        if job_queue:
+            job_queue.submit(task.task_id, request.model_dump_json(), client=client, priority=request.priority)
+            task_manager.detach(task.task_id)
+        else:
+            download_scheduler.submit(
+                task.task_id,
+                lambda: run_download_task(task.task_id, request),
+                client=client,
+                priority=request.priority,
+            )
+    except QueueFull as e:
+        task_manager.delete_task(task.task_id)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+
+    return {
+        "task_id": task.task_id,
+        "status": task.status,
+        "queue_position": (job_queue or download_scheduler).position(task.task_id),
+        "message": "任务已创建,正在处理...",
+    }
+
+
+@router.post("/resolve", response_model=ResolvePlan)
+def resolve_packages(request: PackageRequest):
+    """只解析依赖, 返回将要下载的包及大小, 不创建下载任务"""
+    try:
+        return resolve_plan(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _with_queue_position(task: TaskStatus) -> dict:
+    data = task.dict()
+    if task.status == "pending":
+        data["queue_position"] = (job_queue or download_scheduler).position(task.task_id)
+    return data
+
+
+def _encode_cursor(task: TaskStatus) -> str:
+    return base64.urlsafe_b64encode(f"{task.created_at}|{task.task_id}".encode()).decode()
+
 
-    return {"task_id": task.task_id, "status": task.status, "message": "任务已创建,正在处理..."}
+def _decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        created_at, task_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="无效的游标")
+    return created_at, task_id
 
 
 @router.get("/tasks")
-async def list_tasks(limit: int = 50):
-    """列出所有任务"""
-    tasks = task_manager.list_tasks(limit)
-    return {"tasks": [t.dict() for t in tasks]}
+async def list_tasks(
+    limit: int = Query(50, ge=1, le=500), cursor: Optional[str] = None, status: Optional[str] = None
+):
+    """按创建时间倒序列出任务; 返回的 next_cursor 用于获取下一页"""
+    before = _decode_cursor(cursor) if cursor else None
+    tasks = task_manager.list_tasks(limit, before=before, status=status)
+    return {
+        "tasks": [_with_queue_position(t) for t in tasks],
+        "next_cursor": _encode_cursor(tasks[-1]) if len(tasks) == limit else None,
+    }
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+# 关闭代理 (nginx) 的响应缓冲, 事件立即送达
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+@router.get("/tasks/events")
+async def stream_all_task_events():
+    """
+    所有任务的变化 (Server-Sent Events)
+
+    每个 task 事件是一个任务变化的字段 (含 task_id); 新建任务推送完整字段,
+    删除的任务推送 deleted。没有变化时只定期发送保活注释。
+    """
+    subscription = task_events.subscribe()
+
+    async def stream():
+        try:
+            while True:
+                changes = await subscription.get(timeout=config.TASK_EVENTS_KEEPALIVE)
+                if changes is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                for task_id, delta in changes.items():
+                    yield _sse("task", {"task_id": task_id, **delta})
+        finally:
+            task_events.unsubscribe(subscription)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@router.get("/tasks/{task_id}/events")
+async def stream_task_events(task_id: str):
+    """
+    单个任务的进度 (Server-Sent Events)
+
+    先发送 snapshot (与 GET /tasks/{task_id} 相同), 之后每次变化发送 progress
+    事件, 只含变化的字段; 任务结束或被删除后关闭连接。
+    """
+    # 先订阅再取快照, 两者之间的变化不会丢失 (重复推送的字段值相同)
+    subscription = task_events.subscribe(task_id)
+    task = task_manager.get_task(task_id)
+    if not task:
+        task_events.unsubscribe(subscription)
+        raise HTTPException(status_code=404, detail="任务不存在")
+
+    async def stream():
+        try:
+            yield _sse("snapshot", _with_queue_position(task))
+            status = task.status
+            while status not in TERMINAL_STATUSES:
+                changes = await subscription.get(timeout=config.TASK_EVENTS_KEEPALIVE)
+                if changes is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                delta = changes[task_id]
+                yield _sse("progress", delta)
+                if delta.get("deleted"):
+                    break
+                status = delta.get("status", status)
+        finally:
+            task_events.unsubscribe(subscription)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=SSE_HEADERS)
 
 
 @router.get("/tasks/{task_id}")
@@ -135,7 +405,22 @@ async def get_task_status(task_id: str):
     task = task_manager.get_task(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
-    return task.dict()
+    return _with_queue_position(task)
+
+
+@router.get("/scheduler")
+async def get_scheduler_stats():
+    """调度器状态: 并发槽位、运行中与排队任务数"""
+    return (job_queue or download_scheduler).stats()
+
+
+@router.put("/scheduler/concurrency")
+async def set_scheduler_concurrency(update: ConcurrencyUpdate):
+    """运行时调整同时执行的下载任务数"""
+    if job_queue:
+        raise HTTPException(status_code=400, detail="使用共享任务队列时, 并发数由各 worker 的 --concurrency 决定")
+    download_scheduler.set_concurrency(update.concurrency)
+    return download_scheduler.stats()
 
 
 @router.get("/download/{task_id}")
@@ -145,18 +430,24 @@ async def download_file(task_id: str):
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
 
+    filename = f"packages-{task_id}.{task.bundle_format}"
+    media_type = BUNDLE_MEDIA_TYPES[task.bundle_format]
     if task.status != "completed":
+        # 运行中的任务: 跟随写入进度流式返回, 已完成的包立即可以开始传输
+        archive = live_archive(task_id)
+        if task.status == "running" and archive:
+            return StreamingResponse(
+                archive.stream(),
+                media_type=media_type,
+                headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+            )
         raise HTTPException(status_code=400, detail="任务尚未完成")
 
-    tarball_path = config.DOWNLOAD_DIR / f"packages-{task_id}.tar.gz"
+    tarball_path = bundle_path(task_id, task.bundle_format)
     if not tarball_path.exists():
         raise HTTPException(status_code=404, detail="文件不存在或已过期")
 
-    return FileResponse(
-        path=tarball_path,
-        filename=f"packages-{task_id}.tar.gz",
-        media_type="application/gzip",
-    )
+    return FileResponse(path=tarball_path, filename=filename, media_type=media_type)
 
 
 @router.delete("/tasks/{task_id}")
@@ -173,12 +464,10 @@ async def delete_task(task_id: str):
 
         shutil.rmtree(output_dir)
 
-    tarball_path = config.DOWNLOAD_DIR / f"packages-{task_id}.tar.gz"
-    if tarball_path.exists():
-        tarball_path.unlink()
+    bundle_path(task_id, task.bundle_format).unlink(missing_ok=True)
 
-    # 删除任务
-    with task_manager.lock:
-        del task_manager.tasks[task_id]
+    # 删除任务并移出队列; 正在执行的任务由执行方发现后放弃 (worker 续租或落盘时得知)
+    (job_queue or download_scheduler).cancel(task_id)
+    task_manager.delete_task(task_id)
 
     return {"message": "任务已删除"}
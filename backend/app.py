@@ -7,6 +7,10 @@ from pathlib import Path
 from backend.task_manager import task_manager
 from backend.config import config
 from backend import api_routes
+from backend.archive import available_bundle_formats
+from backend.resolvers.closure_cache import closure_cache
+from backend.resolvers.registry import parser_registry
+from backend.scheduler import download_scheduler
 
 app = FastAPI(
     title="离线软件包下载服务",
@@ -30,10 +34,31 @@ async def health_check():
     return {
         "status": "ok",
         "active_downloads": task_manager.active_downloads,
-        "total_tasks": len(task_manager.tasks),
+        "total_tasks": task_manager.count(),
+        "scheduler": (api_routes.job_queue or download_scheduler).stats(),
+        "closure_cache": closure_cache.stats(),
     }
 
 
+@app.on_event("startup")
+def startup():
+    """
+    在后台预热并定期刷新仓库索引; 任务由 worker 进程执行时, 跟踪数据库中的
+    任务变化以推送进度事件
+    """
+    if config.INDEX_REFRESH_INTERVAL > 0:
+        parser_registry.start_refresher(config.DISTRIBUTIONS, config.INDEX_REFRESH_INTERVAL)
+    if api_routes.job_queue:
+        task_manager.watch_external()
+
+
+@app.on_event("shutdown")
+def shutdown():
+    """停止解析进程, 落盘未写入的任务进度"""
+    parser_registry.shutdown()
+    task_manager.close()
+
+
 @app.get("/api/systems")
 async def get_supported_systems():
     """获取支持的系统列表"""
@@ -44,6 +69,12 @@ app.include_router(api_routes.router)
 
 
 # 静态文件服务
+@app.get("/api/capabilities")
+async def get_capabilities():
+    """服务端可选功能: 可用的打包格式与默认格式"""
+    return {"bundle_formats": available_bundle_formats(), "default_bundle_format": config.BUNDLE_FORMAT}
+
+
 @app.get("/", response_class=HTMLResponse)
 async def root():
     """主页面"""
@@ -0,0 +1,260 @@
+import asyncio
+import gzip
+import logging
+import queue
+import tarfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from backend.config import config
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖, 仅 tar.zst 格式需要
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# tarfile 流模式的写缓冲, 也是客户端能看到新数据的粒度
+STREAM_BUFFER_SIZE = 256 * 1024
+READ_CHUNK_SIZE = 256 * 1024
+
+# 打包格式 -> 响应的 media type
+BUNDLE_MEDIA_TYPES = {
+    "tar": "application/x-tar",
+    "tar.gz": "application/gzip",
+    "tar.zst": "application/zstd",
+}
+
+# 分块并行 gzip 的块大小与压缩级别
+GZIP_BLOCK_SIZE = 1024 * 1024
+GZIP_LEVEL = 6
+
+# 所有任务共用的压缩线程 (zlib 压缩时释放 GIL)
+_compress_pool = ThreadPoolExecutor(
+    max_workers=config.BUNDLE_COMPRESS_THREADS, thread_name_prefix="bundle-compress"
+)
+
+
+class ParallelGzip:
+    """
+    分块并行 gzip
+
+    输入按固定大小分块, 每块在线程池中独立压缩为一个 gzip 成员; 按顺序拼接的
+    多成员 gzip 可直接用 gunzip / tar xzf 解压。.rpm/.deb 本身已经压缩, 单线程
+    gzip 压缩率几乎为零却占满一个核, 分块后可用满所有核。
+    """
+
+    def __init__(self, level: int = GZIP_LEVEL, block_size: int = GZIP_BLOCK_SIZE):
+        self.level = level
+        self.block_size = block_size
+        self._buffer = bytearray()
+        self._pending = deque()
+        # 在途块数上限, 限制内存占用
+        self._max_pending = 2 * config.BUNDLE_COMPRESS_THREADS
+
+    def compress(self, data: bytes) -> bytes:
+        """返回已按顺序完成的压缩数据 (可能为空)"""
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            self._submit(bytes(self._buffer[: self.block_size]))
+            del self._buffer[: self.block_size]
+        return self._collect(wait=False)
+
+    def flush(self) -> bytes:
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        return self._collect(wait=True)
+
+    def _submit(self, block: bytes):
+        self._pending.append(_compress_pool.submit(gzip.compress, block, self.level, mtime=0))
+
+    def _collect(self, wait: bool) -> bytes:
+        out = []
+        while self._pending and (wait or self._pending[0].done() or len(self._pending) > self._max_pending):
+            out.append(self._pending.popleft().result())
+        return b"".join(out)
+
+
+def check_bundle_format(bundle_format: str):
+    """不支持或缺少依赖时抛出 ValueError"""
+    if bundle_format not in BUNDLE_MEDIA_TYPES:
+        raise ValueError(f"不支持的打包格式: {bundle_format}")
+    if bundle_format == "tar.zst" and zstandard is None:
+        raise ValueError("tar.zst 格式需要安装 zstandard")
+
+
+def available_bundle_formats() -> List[str]:
+    """当前环境可用的打包格式 (tar.zst 需要安装 zstandard)"""
+    return [fmt for fmt in BUNDLE_MEDIA_TYPES if fmt != "tar.zst" or zstandard is not None]
+
+
+def create_compressor(bundle_format: str):
+    """返回带 compress()/flush() 的压缩器, tar 格式返回 None"""
+    check_bundle_format(bundle_format)
+    if bundle_format == "tar.gz":
+        return ParallelGzip()
+    if bundle_format == "tar.zst":
+        return zstandard.ZstdCompressor(level=3, threads=config.BUNDLE_COMPRESS_THREADS).compressobj()
+    return None
+
+
+def bundle_path(task_id: str, bundle_format: str) -> Path:
+    return config.DOWNLOAD_DIR / f"packages-{task_id}.{bundle_format}"
+
+
+class LiveArchive:
+    """
+    边下载边追加的 tar 包
+
+    包下载完成后由 add() 放入队列, 后台线程按完成顺序以流模式追加到 tar 包
+    (不阻塞下载线程或事件循环), tar 数据再经压缩器 (可选) 写入文件。stream()
+    跟随文件的增长读取已写出的部分, 直到 close() 写完结尾, 因此客户端可以在
+    任务运行期间开始接收压缩包。stream() 是异步生成器, 等待新数据时不占用线程:
+    写入方通过 call_soon_threadsafe 唤醒各读取方所在的事件循环。
+    """
+
+    def __init__(self, path: Path, directories: List[str] = (), compressor=None):
+        self.path = Path(path)
+        self.size = 0  # 已写入磁盘, 可供读取的字节数
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+        # 等待新数据的读取方: (事件循环, 事件)
+        self._readers: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+        self._queue: queue.Queue = queue.Queue()
+        self._compressor = compressor
+        self._file = open(self.path, "wb")
+        self._tar = tarfile.open(fileobj=self, mode="w|", bufsize=STREAM_BUFFER_SIZE)
+        for directory in directories:
+            info = tarfile.TarInfo(directory)
+            info.type = tarfile.DIRTYPE
+            info.mode = 0o755
+            self._tar.addfile(info)
+        self._thread = threading.Thread(target=self._run, name=f"archive-{self.path.name}", daemon=True)
+        self._thread.start()
+
+    def add(self, filepath: Path, arcname: str):
+        """追加文件 (异步写入)"""
+        self._queue.put((Path(filepath), arcname))
+
+    def close(self):
+        """等待队列中的文件写完并写出压缩包结尾"""
+        self._queue.put(None)
+        self._thread.join()
+        if self.error:
+            raise self.error
+
+    def abort(self, error: BaseException, remove: bool = True):
+        """放弃压缩包: 正在读取的客户端收到异常; remove 为 False 时保留文件 (已由其他进程接管)"""
+        with self._lock:
+            self.error = error
+            self._wake_readers()
+        self._queue.put(None)
+        self._thread.join()
+        if remove:
+            self.path.unlink(missing_ok=True)
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        """从头读取压缩包, 跟随写入进度直到写完"""
+        if self.error is not None:
+            raise IOError(f"Archive aborted: {self.error}")
+        loop = asyncio.get_running_loop()
+        reader = (loop, asyncio.Event())
+        with self._lock:
+            self._readers.add(reader)
+        offset = 0
+        try:
+            with open(self.path, "rb") as f:
+                while True:
+                    with self._lock:
+                        # 在锁内清除后再读取状态, 之后的写入都会重新唤醒
+                        reader[1].clear()
+                        if self.error is not None:
+                            raise IOError(f"Archive aborted: {self.error}")
+                        size, done = self.size, self.done
+                    if offset < size:
+                        data = await loop.run_in_executor(None, f.read, min(READ_CHUNK_SIZE, size - offset))
+                        offset += len(data)
+                        yield data
+                    elif done:
+                        return
+                    else:
+                        await reader[1].wait()
+        finally:
+            with self._lock:
+                self._readers.discard(reader)
+
+    def write(self, data: bytes) -> int:
+        """tarfile 的输出: 压缩后写出"""
+        if self.error is not None:
+            # 已放弃的压缩包不再写出 (包括 tarfile 对象析构时的收尾)
+            return len(data)
+        self._emit(self._compressor.compress(data) if self._compressor else data)
+        return len(data)
+
+    def _emit(self, data: bytes):
+        """写入文件并刷盘, 通知读取方"""
+        if not data:
+            return
+        self._file.write(data)
+        self._file.flush()
+        with self._lock:
+            self.size += len(data)
+            self._wake_readers()
+
+    def _run(self):
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None or self.error is not None:
+                    break
+                filepath, arcname = item
+                self._tar.add(filepath, arcname=arcname, recursive=False)
+            if self.error is None:
+                self._tar.close()
+                if self._compressor:
+                    self._emit(self._compressor.flush())
+        except Exception as e:
+            logger.exception(f"写入压缩包失败: {self.path}")
+            with self._lock:
+                self.error = e
+        finally:
+            self._file.close()
+            with self._lock:
+                self.done = True
+                self._wake_readers()
+
+    def _wake_readers(self):
+        """持有 _lock 时调用"""
+        for loop, event in list(self._readers):
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # 读取方的事件循环已关闭
+                self._readers.discard((loop, event))
+
+
+_live: Dict[str, LiveArchive] = {}
+_live_lock = threading.Lock()
+
+
+def open_live_archive(task_id: str, bundle_format: str, directories: List[str] = ()) -> LiveArchive:
+    archive = LiveArchive(bundle_path(task_id, bundle_format), directories, create_compressor(bundle_format))
+    with _live_lock:
+        _live[task_id] = archive
+    return archive
+
+
+def live_archive(task_id: str) -> Optional[LiveArchive]:
+    """任务运行期间正在写入的压缩包"""
+    return _live.get(task_id)
+
+
+def release_live_archive(task_id: str):
+    with _live_lock:
+        _live.pop(task_id, None)
@@ -12,43 +12,115 @@ class Config:
 
     # 下载配置
     MAX_CONCURRENT_DOWNLOADS: int = int(os.getenv("MAX_CONCURRENT_DOWNLOADS", "3"))
+    # 排队任务数上限, 超出时拒绝新任务 (503)
+    MAX_QUEUED_TASKS: int = int(os.getenv("MAX_QUEUED_TASKS", "100"))
+    # 共享任务队列 (如 sqlite:////var/lib/package-dep/jobs.db); 配置后任务由同一主机上的
+    # python -m backend.worker 进程执行; SQLite (WAL) 文件需在本机磁盘上, 不支持 NFS 等网络文件系统
+    JOB_QUEUE: str = os.getenv("JOB_QUEUE", "")
+    # worker 认领任务的租约 (秒), 期间定期续租; 租约过期的任务可被其他 worker 重新认领
+    JOB_LEASE_SECONDS: float = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    # 解析仓库元数据的进程数, 0 表示在任务线程内解析
+    PARSE_WORKERS: int = int(os.getenv("PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+    # 单个包下载中断后的续传次数
+    DOWNLOAD_RETRIES: int = int(os.getenv("DOWNLOAD_RETRIES", "3"))
+    # 下载引擎: thread (线程池) 或 async (aiohttp, 跨任务复用连接)
+    DOWNLOAD_ENGINE: str = os.getenv("DOWNLOAD_ENGINE", "thread")
+    DOWNLOAD_CONNECTION_LIMIT: int = int(os.getenv("DOWNLOAD_CONNECTION_LIMIT", "64"))
+    DOWNLOAD_CONNECTIONS_PER_HOST: int = int(os.getenv("DOWNLOAD_CONNECTIONS_PER_HOST", "8"))
+    # 连接无数据超过该秒数视为停滞, 换镜像续传
+    DOWNLOAD_STALL_TIMEOUT: int = int(os.getenv("DOWNLOAD_STALL_TIMEOUT", "30"))
+    # 首选镜像超过该秒数未响应时向下一个镜像发起对冲请求
+    MIRROR_HEDGE_DELAY: float = float(os.getenv("MIRROR_HEDGE_DELAY", "2.0"))
 
     # 存储路径
     BASE_DIR: Path = Path(__file__).parent.parent
     DOWNLOAD_DIR: Path = Path(os.getenv("DOWNLOAD_DIR", BASE_DIR / "downloads"))
     LOG_DIR: Path = Path(os.getenv("LOG_DIR", BASE_DIR / "logs"))
+    CACHE_DIR: Path = Path(os.getenv("CACHE_DIR", DOWNLOAD_DIR / ".cache"))
 
-    # 发行版配置
+    # 任务数据库, 进度更新批量落盘的间隔 (秒)
+    TASK_DB_PATH: Path = Path(os.getenv("TASK_DB_PATH", DOWNLOAD_DIR / "tasks.db"))
+    TASK_FLUSH_INTERVAL: float = float(os.getenv("TASK_FLUSH_INTERVAL", "1.0"))
+    # 任务事件流 (SSE) 无变化时发送保活注释的间隔 (秒)
+    TASK_EVENTS_KEEPALIVE: float = float(os.getenv("TASK_EVENTS_KEEPALIVE", "15"))
+
+    # 元数据缓存配置 (秒内不重复发起条件请求)
+    METADATA_CACHE_TTL: int = int(os.getenv("METADATA_CACHE_TTL", "300"))
+    # 超过该时间 (秒) 未使用的元数据文件在仓库更新时清理, 如旧版本的 primary/filelists
+    METADATA_CACHE_MAX_AGE: int = int(os.getenv("METADATA_CACHE_MAX_AGE", str(7 * 24 * 3600)))
+
+    # 共享包文件仓库 (按校验值去重) 及其容量上限
+    BLOB_STORE_DIR: Path = Path(os.getenv("BLOB_STORE_DIR", CACHE_DIR / "blobs"))
+    BLOB_STORE_QUOTA_MB: int = int(os.getenv("BLOB_STORE_QUOTA_MB", "10240"))
+
+    # 打包格式: tar (不压缩), tar.gz (分块并行 gzip), tar.zst (需安装 zstandard)
+    BUNDLE_FORMAT: str = os.getenv("BUNDLE_FORMAT", "tar.gz")
+    BUNDLE_COMPRESS_THREADS: int = int(os.getenv("BUNDLE_COMPRESS_THREADS", str(os.cpu_count() or 4)))
+
+    # 仓库索引后台刷新间隔 (秒): 启动时预热 DISTRIBUTIONS 中的仓库, 之后定期刷新;
+    # 0 表示不启用, 每次获取索引时重新验证
+    INDEX_REFRESH_INTERVAL: float = float(os.getenv("INDEX_REFRESH_INTERVAL", "600"))
+
+    # 依赖闭包缓存条目数
+    CLOSURE_CACHE_SIZE: int = int(os.getenv("CLOSURE_CACHE_SIZE", "1024"))
+
+    # 发行版配置 (mirrors: 内容相同的镜像, 下载时分散负载并互为故障转移)
     DISTRIBUTIONS = {
         # RPM 发行版
         "centos-7": {
             "type": "rpm",
             "name": "CentOS 7",
             "baseos": "https://mirrors.aliyun.com/centos/7/os/x86_64/",
+            "mirrors": [
+                "https://mirrors.aliyun.com/centos/7/os/x86_64/",
+                "https://mirrors.tuna.tsinghua.edu.cn/centos/7/os/x86_64/",
+                "https://mirrors.ustc.edu.cn/centos/7/os/x86_64/",
+            ],
             "arch": "x86_64",
         },
         "centos-8": {
             "type": "rpm",
             "name": "CentOS 8 Stream",
             "baseos": "https://mirrors.aliyun.com/centos/8-stream/BaseOS/x86_64/os/",
+            "mirrors": [
+                "https://mirrors.aliyun.com/centos/8-stream/BaseOS/x86_64/os/",
+                "https://mirrors.tuna.tsinghua.edu.cn/centos/8-stream/BaseOS/x86_64/os/",
+                "https://mirrors.ustc.edu.cn/centos/8-stream/BaseOS/x86_64/os/",
+            ],
             "arch": "x86_64",
         },
         "rhel-7": {
             "type": "rpm",
             "name": "RHEL 7",
             "baseos": "https://mirrors.aliyun.com/centos/7/os/x86_64/",
+            "mirrors": [
+                "https://mirrors.aliyun.com/centos/7/os/x86_64/",
+                "https://mirrors.tuna.tsinghua.edu.cn/centos/7/os/x86_64/",
+                "https://mirrors.ustc.edu.cn/centos/7/os/x86_64/",
+            ],
             "arch": "x86_64",
         },
         "rhel-8": {
             "type": "rpm",
             "name": "RHEL 8",
             "baseos": "https://mirrors.aliyun.com/centos/8-stream/BaseOS/x86_64/os/",
+            "mirrors": [
+                "https://mirrors.aliyun.com/centos/8-stream/BaseOS/x86_64/os/",
+                "https://mirrors.tuna.tsinghua.edu.cn/centos/8-stream/BaseOS/x86_64/os/",
+                "https://mirrors.ustc.edu.cn/centos/8-stream/BaseOS/x86_64/os/",
+            ],
             "arch": "x86_64",
         },
         "fedora": {
             "type": "rpm",
             "name": "Fedora",
             "baseos": "https://mirrors.aliyun.com/fedora/releases/39/Everything/x86_64/os/",
+            "mirrors": [
+                "https://mirrors.aliyun.com/fedora/releases/39/Everything/x86_64/os/",
+                "https://mirrors.tuna.tsinghua.edu.cn/fedora/releases/39/Everything/x86_64/os/",
+                "https://mirrors.ustc.edu.cn/fedora/releases/39/Everything/x86_64/os/",
+            ],
             "arch": "x86_64",
         },
         # DEB 发行版
@@ -56,36 +128,62 @@ class Config:
             "type": "deb",
             "name": "Ubuntu 20.04 LTS (Focal)",
             "main": "http://archive.ubuntu.com/ubuntu/dists/focal/main/",
+            "mirrors": [
+                "http://archive.ubuntu.com/ubuntu/dists/focal/main/",
+                "https://mirrors.aliyun.com/ubuntu/dists/focal/main/",
+                "https://mirrors.tuna.tsinghua.edu.cn/ubuntu/dists/focal/main/",
+            ],
             "arch": "amd64",
         },
         "ubuntu-22": {
             "type": "deb",
             "name": "Ubuntu 22.04 LTS (Jammy)",
             "main": "http://archive.ubuntu.com/ubuntu/dists/jammy/main/",
+            "mirrors": [
+                "http://archive.ubuntu.com/ubuntu/dists/jammy/main/",
+                "https://mirrors.aliyun.com/ubuntu/dists/jammy/main/",
+                "https://mirrors.tuna.tsinghua.edu.cn/ubuntu/dists/jammy/main/",
+            ],
             "arch": "amd64",
         },
         "ubuntu-24": {
             "type": "deb",
             "name": "Ubuntu 24.04 LTS (Noble)",
             "main": "http://archive.ubuntu.com/ubuntu/dists/noble/main/",
+            "mirrors": [
+                "http://archive.ubuntu.com/ubuntu/dists/noble/main/",
+                "https://mirrors.aliyun.com/ubuntu/dists/noble/main/",
+                "https://mirrors.tuna.tsinghua.edu.cn/ubuntu/dists/noble/main/",
+            ],
             "arch": "amd64",
         },
         "debian-11": {
             "type": "deb",
             "name": "Debian 11 (Bullseye)",
             "main": "http://deb.debian.org/debian/dists/bullseye/main/",
+            "mirrors": [
+                "http://deb.debian.org/debian/dists/bullseye/main/",
+                "https://mirrors.aliyun.com/debian/dists/bullseye/main/",
+                "https://mirrors.tuna.tsinghua.edu.cn/debian/dists/bullseye/main/",
+            ],
             "arch": "amd64",
         },
         "debian-12": {
             "type": "deb",
             "name": "Debian 12 (Bookworm)",
             "main": "http://deb.debian.org/debian/dists/bookworm/main/",
+            "mirrors": [
+                "http://deb.debian.org/debian/dists/bookworm/main/",
+                "https://mirrors.aliyun.com/debian/dists/bookworm/main/",
+                "https://mirrors.tuna.tsinghua.edu.cn/debian/dists/bookworm/main/",
+            ],
             "arch": "amd64",
         },
     }
 
     DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
     LOG_DIR.mkdir(parents=True, exist_ok=True)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
 
 config = Config()
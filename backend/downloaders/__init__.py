@@ -1 +1,14 @@
 """下载器模块"""
+from backend.config import config
+
+
+def create_downloader(max_workers: int = 5, mirrors=None):
+    """按 DOWNLOAD_ENGINE 配置创建下载器: thread (默认) 或 async"""
+    if config.DOWNLOAD_ENGINE == "async":
+        from backend.downloaders.async_http import AsyncPackageDownloader
+
+        return AsyncPackageDownloader(max_workers=max_workers, mirrors=mirrors)
+
+    from backend.downloaders.http import PackageDownloader
+
+    return PackageDownloader(max_workers=max_workers, mirrors=mirrors)
@@ -0,0 +1,329 @@
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+import aiohttp
+
+from backend.config import config
+from backend.downloaders.blob_store import BlobStore, blob_store, parse_checksum
+from backend.downloaders.http import IncompleteDownloadError, PartialDownload
+from backend.downloaders.mirrors import MirrorGroup
+from backend.singleflight import AsyncSingleFlight
+
+logger = logging.getLogger(__name__)
+
+# 每次从连接读取的块大小, 以及攒够多少字节再写盘
+READ_CHUNK_SIZE = 256 * 1024
+WRITE_BUFFER_SIZE = 4 * 1024 * 1024
+
+RETRY_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, IncompleteDownloadError)
+
+# 放入下载队列表示包列表产出失败, 取消已提交的下载
+_ABORT = object()
+
+
+class AsyncEngine:
+    """
+    进程内共享的 asyncio 下载引擎
+
+    事件循环运行在独立线程中, 所有任务共用一个 aiohttp 会话, 空闲连接在任务之间
+    保持复用; 每个主机的并发连接数由 limit_per_host 限制。
+    """
+
+    def __init__(self, limit: int, limit_per_host: int):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.session: Optional[aiohttp.ClientSession] = None
+        # 引擎线程内进行中的包下载, 不同任务请求同一个包时只下载一次
+        self.flights = AsyncSingleFlight()
+        self._lock = threading.Lock()
+
+    def run(self, coro):
+        """在引擎线程中执行协程并等待结果"""
+        return self.submit(coro).result()
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """在引擎线程中执行协程, 不等待"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def call_soon(self, callback, *args):
+        """在引擎线程中调用普通函数 (例如向 asyncio.Queue 放入数据)"""
+        self._ensure_loop().call_soon_threadsafe(callback, *args)
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """只能在引擎线程中调用"""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit, limit_per_host=self.limit_per_host, keepalive_timeout=60
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=30),
+            )
+        return self.session
+
+    def close(self):
+        with self._lock:
+            if self.loop is None:
+                return
+            if self.session is not None:
+                asyncio.run_coroutine_threadsafe(self.session.close(), self.loop).result()
+                self.session = None
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.loop = None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self.loop.run_forever, name="download-engine", daemon=True
+                ).start()
+            return self.loop
+
+
+async_engine = AsyncEngine(
+    limit=config.DOWNLOAD_CONNECTION_LIMIT, limit_per_host=config.DOWNLOAD_CONNECTIONS_PER_HOST
+)
+
+
+class AsyncPackageDownloader:
+    """基于 asyncio 的包下载器, 接口与 PackageDownloader 相同"""
+
+    def __init__(
+        self,
+        max_workers: int = 5,
+        store: Optional[BlobStore] = None,
+        retries: int = config.DOWNLOAD_RETRIES,
+        retry_delay: float = 1.0,
+        engine: Optional[AsyncEngine] = None,
+        mirrors: Optional[MirrorGroup] = None,
+    ):
+        self.max_workers = max_workers
+        self.store = store or blob_store
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.engine = engine or async_engine
+        self.mirrors = mirrors
+
+    def download_packages(
+        self,
+        packages: Iterable[Dict],
+        output_dir: Path,
+        progress_callback: Optional[Callable] = None,
+    ) -> Dict:
+        """
+        批量下载包 (阻塞直到全部完成), 进度回调在引擎线程中调用
+
+        packages 可以是生成器: 在调用线程中逐个取出并送入引擎, 解析 (调用线程)
+        与下载 (引擎线程) 同时进行; 按 URL 去重, 进度回调的 total 为目前已知的包数。
+        """
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        pending = asyncio.Queue()
+        future = self.engine.submit(self._download_all(pending, output_dir, progress_callback))
+        try:
+            for pkg in packages:
+                self.engine.call_soon(pending.put_nowait, pkg)
+        except BaseException:
+            # 包列表产出失败 (例如解析出错): 取消已提交的下载, 等其退出后再抛出
+            self.engine.call_soon(pending.put_nowait, _ABORT)
+            future.result()
+            raise
+        self.engine.call_soon(pending.put_nowait, None)
+        return future.result()
+
+    async def _download_all(self, pending: asyncio.Queue, output_dir, progress_callback) -> Dict:
+        results = {"success": [], "failed": [], "total": 0, "cache_hits": 0}
+        semaphore = asyncio.Semaphore(self.max_workers)
+        completed = 0
+
+        async def run(pkg):
+            nonlocal completed
+            try:
+                async with semaphore:
+                    filepath, cache_hit = await self._fetch(pkg, output_dir)
+                results["success"].append(filepath)
+                if cache_hit:
+                    results["cache_hits"] += 1
+                completed += 1
+                if progress_callback:
+                    progress_callback(completed, results["total"], pkg)
+            except asyncio.CancelledError:
+                # 包列表产出失败后取消: 也计入失败, 结果中不会缺少该包
+                results["failed"].append({"package": pkg, "error": "cancelled"})
+                raise
+            except Exception as e:
+                results["failed"].append({"package": pkg, "error": str(e)})
+
+        tasks = []
+        seen = set()
+        while True:
+            pkg = await pending.get()
+            if pkg is None:
+                break
+            if pkg is _ABORT:
+                for task in tasks:
+                    task.cancel()
+                break
+            url = pkg.get("url")
+            if url in seen:
+                continue
+            if url:
+                seen.add(url)
+            results["total"] += 1
+            tasks.append(asyncio.ensure_future(run(pkg)))
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return results
+
+    async def _fetch(self, pkg: Dict, output_dir: Path):
+        """
+        返回 (文件路径, 是否未经网络取得: 命中共享仓库或共享了其他任务的下载)
+
+        共享仓库的读写与文件改名都在线程池中执行: 仓库与任务目录不在同一文件系统时
+        链接退化为复制整个包, 不能阻塞所有任务共用的事件循环。
+        """
+        loop = asyncio.get_running_loop()
+        checksum = parse_checksum(pkg)
+        if checksum:
+            blob = await loop.run_in_executor(None, self.store.get, *checksum)
+            if blob:
+                filepath = output_dir / os.path.basename(pkg["url"])
+                await loop.run_in_executor(None, self.store.link, blob, filepath)
+                return filepath, True
+
+        filepath, shared = await self.engine.flights.do(
+            ("package", checksum or pkg.get("url")),
+            lambda: self._download_single(pkg, output_dir),
+            retry_on_error=True,
+        )
+        if not shared:
+            return filepath, False
+        dest = output_dir / filepath.name
+        if dest != filepath:
+            await loop.run_in_executor(None, self.store.link, filepath, dest)
+        return dest, True
+
+    async def _download_single(self, pkg: Dict, output_dir: Path) -> Path:
+        """下载单个包: .part 续传、增量校验、原子改名, 与线程池下载器一致"""
+        url = pkg.get("url")
+        if not url:
+            raise ValueError(f"Package {pkg.get('name')} has no URL")
+
+        filename = os.path.basename(url)
+        filepath = output_dir / filename
+        part_path = output_dir / f"{filename}.part"
+
+        # 打开已有的 .part 文件会重新计算其摘要, 与写入仓库一样在线程池中执行, 不阻塞事件循环
+        loop = asyncio.get_running_loop()
+        part = await loop.run_in_executor(None, PartialDownload, part_path, parse_checksum(pkg))
+        expected_size = int(pkg.get("size") or pkg.get("Size") or 0)
+        urls = self.mirrors.candidates(url) if self.mirrors else [url]
+
+        for attempt in range(self.retries + 1):
+            try:
+                await self._transfer(urls, part)
+                if expected_size and part.received < expected_size:
+                    raise IncompleteDownloadError(
+                        f"Incomplete download for {filename}: {part.received}/{expected_size} bytes"
+                    )
+                break
+            except RETRY_ERRORS as e:
+                if attempt == self.retries:
+                    raise
+                logger.warning(f"下载中断, 将从 {part.received} 字节处续传 {filename}: {e}")
+                urls = urls[1:] + urls[:1]
+                await asyncio.sleep(self.retry_delay * 2**attempt)
+
+        if not part.verified():
+            part_path.unlink(missing_ok=True)
+            raise ValueError(f"Checksum mismatch for {filename}")
+
+        await loop.run_in_executor(None, os.replace, part_path, filepath)
+        if part.hasher:
+            await loop.run_in_executor(None, self.store.put, *part.checksum, filepath)
+        return filepath
+
+    async def _transfer(self, urls: List[str], part: PartialDownload):
+        headers = {"Range": f"bytes={part.received}-"} if part.received else {}
+        loop = asyncio.get_running_loop()
+
+        requested = time.monotonic()
+        response, url = await self._open(urls, headers)
+        latency = time.monotonic() - requested
+        try:
+            if part.received and response.status == 416:
+                return
+            response.raise_for_status()
+
+            if part.received and response.status != 206:
+                part.reset()
+
+            start, offset = time.monotonic(), part.received
+            with open(part.path, "ab" if part.received else "wb") as f:
+                buffer = bytearray()
+                try:
+                    async for chunk in response.content.iter_chunked(READ_CHUNK_SIZE):
+                        buffer += chunk
+                        part.update(chunk)
+                        if len(buffer) >= WRITE_BUFFER_SIZE:
+                            await loop.run_in_executor(None, f.write, bytes(buffer))
+                            buffer.clear()
+                finally:
+                    # 连接中断时也写出已计入 received 的数据, 保证续传位置正确
+                    f.write(buffer)
+        except RETRY_ERRORS:
+            if self.mirrors:
+                self.mirrors.record_failure(url)
+            raise
+        finally:
+            response.release()
+
+        if self.mirrors:
+            self.mirrors.record_success(url, latency, part.received - offset, time.monotonic() - start)
+
+    async def _open(self, urls: List[str], headers: Dict):
+        """发起请求, 返回 (响应, URL); 首选镜像响应缓慢时向下一个镜像发起对冲请求"""
+        session = self.engine.get_session()
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=config.DOWNLOAD_STALL_TIMEOUT)
+
+        def request(url):
+            return asyncio.ensure_future(session.get(url, headers=headers, timeout=timeout))
+
+        if not self.mirrors or len(urls) < 2:
+            return await request(urls[0]), urls[0]
+
+        tasks = {request(urls[0]): urls[0]}
+        done, _ = await asyncio.wait(tasks, timeout=self.mirrors.hedge_delay_for(urls[0]))
+        if not done:
+            logger.info(f"镜像响应缓慢, 对冲请求: {urls[1]}")
+            tasks[request(urls[1])] = urls[1]
+
+        error = None
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    response = task.result()
+                except RETRY_ERRORS as e:
+                    self.mirrors.record_failure(tasks[task])
+                    error = e
+                    continue
+                for other in tasks:
+                    if other is not task:
+                        other.add_done_callback(_release_response)
+                return response, tasks[task]
+        raise error
+
+
+def _release_response(task: asyncio.Future):
+    if not task.cancelled() and not task.exception():
+        task.result().release()
@@ -0,0 +1,125 @@
+import logging
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
+
+from backend.config import config
+
+logger = logging.getLogger(__name__)
+
+
+def parse_checksum(pkg: dict) -> Optional[Tuple[str, str]]:
+    """从包记录取出 (算法, 摘要): RPM 为 checksum 字段 "sha256:...", DEB 为 SHA256 字段"""
+    checksum = pkg.get("checksum")
+    if checksum:
+        algo, _, digest = checksum.partition(":")
+        if digest:
+            return algo, digest.lower()
+    sha256 = pkg.get("SHA256")
+    if sha256:
+        return "sha256", sha256.lower()
+    return None
+
+
+class BlobStore:
+    """
+    按校验值寻址的包文件仓库, 所有任务共享
+
+    文件存放在 <root>/<算法>/<摘要前两位>/<摘要>, 通过硬链接放入任务目录
+    (跨文件系统时退化为复制)。总大小超过配额时按最近使用时间 (mtime,
+    命中时更新) 淘汰到配额的 LOW_WATER 比例以下, 之后可以再加入一批文件才需要
+    重新扫描目录; 已链接到任务目录的文件不受淘汰影响。
+    """
+
+    LOW_WATER = 0.9
+
+    def __init__(self, root: Path, quota_bytes: int):
+        self.root = Path(root)
+        self.quota_bytes = quota_bytes
+        self._usage: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def path_for(self, algo: str, digest: str) -> Path:
+        return self.root / algo / digest[:2] / digest
+
+    def get(self, algo: str, digest: str) -> Optional[Path]:
+        """查找文件, 命中时更新其使用时间"""
+        path = self.path_for(algo, digest)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, algo: str, digest: str, source: Path) -> Path:
+        """将已校验的文件加入仓库 (链接而非移动, 源文件保持不变)"""
+        path = self.path_for(algo, digest)
+        if path.exists():
+            return path
+
+        # 先统计已有文件, 避免把本次加入的文件计算两次
+        self.usage()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{digest}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self._link_or_copy(Path(source), tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+        with self._lock:
+            self._usage += path.stat().st_size
+            if self._usage > self.quota_bytes:
+                self._evict(keep=path)
+        return path
+
+    def link(self, blob: Path, dest: Path):
+        """将仓库中的文件放入任务目录"""
+        dest = Path(dest)
+        dest.unlink(missing_ok=True)
+        self._link_or_copy(blob, dest)
+
+    def usage(self) -> int:
+        with self._lock:
+            self._ensure_usage()
+            return self._usage
+
+    @staticmethod
+    def _link_or_copy(source: Path, dest: Path):
+        try:
+            os.link(source, dest)
+        except OSError:
+            shutil.copyfile(source, dest)
+
+    def _blobs(self):
+        return (path for path in self.root.glob("*/*/*") if not path.name.endswith(".tmp"))
+
+    def _ensure_usage(self):
+        if self._usage is None:
+            self._usage = sum(path.stat().st_size for path in self._blobs())
+
+    def _evict(self, keep: Path):
+        """按 mtime 从旧到新删除, 直到低于配额的 LOW_WATER 比例"""
+        entries = []
+        for path in self._blobs():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()
+        target = int(self.quota_bytes * self.LOW_WATER)
+        for _, size, path in entries:
+            if self._usage <= target:
+                break
+            if path == keep:
+                continue
+            path.unlink(missing_ok=True)
+            self._usage -= size
+            logger.info(f"淘汰缓存包文件: {path.name}")
+
+
+blob_store = BlobStore(config.BLOB_STORE_DIR, config.BLOB_STORE_QUOTA_MB * 1024 * 1024)
@@ -1,64 +1,286 @@
+import hashlib
+import logging
 import os
+import queue
+import threading
+import time
 import requests
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Dict, Callable, Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterable, List, Dict, Callable, Optional, Tuple
+
+from backend.config import config
+from backend.downloaders.blob_store import BlobStore, blob_store, parse_checksum
+from backend.downloaders.mirrors import MirrorGroup
+from backend.singleflight import inflight
+
+logger = logging.getLogger(__name__)
+
+
+class IncompleteDownloadError(requests.RequestException):
+    """连接正常结束但收到的数据少于仓库元数据中的大小"""
+
+
+def _close_response(future):
+    if not future.exception():
+        future.result().close()
 
 
 class PackageDownloader:
     """多线程包下载器"""
 
-    def __init__(self, max_workers: int = 5):
+    def __init__(
+        self,
+        max_workers: int = 5,
+        store: Optional[BlobStore] = None,
+        retries: int = config.DOWNLOAD_RETRIES,
+        retry_delay: float = 1.0,
+        mirrors: Optional[MirrorGroup] = None,
+    ):
         self.max_workers = max_workers
         self.session = requests.Session()
+        self.store = store or blob_store
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.mirrors = mirrors
+        # 配置了镜像组时发起对冲请求的线程池, 按需创建
+        self._request_pool: Optional[ThreadPoolExecutor] = None
+        self._request_pool_lock = threading.Lock()
 
     def download_packages(
         self,
-        packages: List[Dict],
+        packages: Iterable[Dict],
         output_dir: Path,
         progress_callback: Optional[Callable] = None,
     ) -> Dict:
-        """批量下载包"""
+        """
+        批量下载包, 共享仓库中已有的包直接链接而不走网络
+
+        packages 可以是生成器 (例如边解析边产出的下载项): 每取到一个包立即提交
+        下载, 按 URL 去重; 进度回调的 total 为目前已知的包数, 取完后即为总数。
+        回调总在调用线程中执行。
+        """
         output_dir = Path(output_dir)
         output_dir.mkdir(parents=True, exist_ok=True)
 
-        results = {"success": [], "failed": [], "total": len(packages)}
+        results = {"success": [], "failed": [], "total": 0, "cache_hits": 0}
+        futures = {}
+        completed = queue.SimpleQueue()
+        seen = set()
+        done = 0
+
+        def handle(future):
+            nonlocal done
+            pkg = futures.pop(future)
+            done += 1
+            try:
+                filepath, cache_hit = future.result()
+                results["success"].append(filepath)
+                if cache_hit:
+                    results["cache_hits"] += 1
+                if progress_callback:
+                    progress_callback(done, results["total"], pkg)
+            except Exception as e:
+                results["failed"].append({"package": pkg, "error": str(e)})
 
         with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            futures = {
-                executor.submit(self._download_single, pkg, output_dir): pkg
-                for pkg in packages
-            }
+            try:
+                for pkg in packages:
+                    url = pkg.get("url")
+                    if url in seen:
+                        continue
+                    if url:
+                        seen.add(url)
+                    results["total"] += 1
+                    future = executor.submit(self._fetch, pkg, output_dir)
+                    futures[future] = pkg
+                    future.add_done_callback(completed.put)
+                    # 取下一个包之前先处理已完成的下载
+                    while not completed.empty():
+                        handle(completed.get())
+            except BaseException:
+                # 包列表产出失败 (例如解析出错): 放弃尚未开始的下载
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
 
-            for i, future in enumerate(as_completed(futures), 1):
-                pkg = futures[future]
-                try:
-                    filepath = future.result()
-                    results["success"].append(filepath)
+            while futures:
+                handle(completed.get())
 
-                    if progress_callback:
-                        progress_callback(i, len(packages), pkg)
+        return results
 
-                except Exception as e:
-                    results["failed"].append({"package": pkg, "error": str(e)})
+    def _fetch(self, pkg: Dict, output_dir: Path) -> Tuple[Path, bool]:
+        """返回 (文件路径, 是否未经网络取得: 命中共享仓库或共享了其他任务的下载)"""
+        checksum = parse_checksum(pkg)
+        if checksum:
+            blob = self.store.get(*checksum)
+            if blob:
+                filepath = output_dir / os.path.basename(pkg["url"])
+                self.store.link(blob, filepath)
+                return filepath, True
 
-        return results
+        # 其他任务正在下载同一个包时等待其完成, 再链接到本任务目录
+        filepath, shared = inflight.do(
+            ("package", checksum or pkg.get("url")),
+            lambda: self._download_single(pkg, output_dir),
+            retry_on_error=True,
+        )
+        if not shared:
+            return filepath, False
+        dest = output_dir / filepath.name
+        if dest != filepath:
+            self.store.link(filepath, dest)
+        return dest, True
 
     def _download_single(self, pkg: Dict, output_dir: Path) -> Path:
-        """下载单个包"""
+        """
+        下载单个包
+
+        先写入 <文件名>.part, 中断后以 HTTP Range 从已收到的位置续传; 校验值随数据流
+        增量计算, 一致后才原子改名为正式文件并加入共享仓库。配置了镜像组时,
+        每次重试换到下一个镜像继续。
+        """
         url = pkg.get("url")
         if not url:
             raise ValueError(f"Package {pkg.get('name')} has no URL")
 
         filename = os.path.basename(url)
         filepath = output_dir / filename
+        part_path = output_dir / f"{filename}.part"
+
+        part = PartialDownload(part_path, parse_checksum(pkg))
+        expected_size = int(pkg.get("size") or pkg.get("Size") or 0)
+        urls = self.mirrors.candidates(url) if self.mirrors else [url]
 
-        response = self.session.get(url, stream=True, timeout=30)
-        response.raise_for_status()
+        for attempt in range(self.retries + 1):
+            try:
+                self._transfer(urls, part)
+                if expected_size and part.received < expected_size:
+                    raise IncompleteDownloadError(
+                        f"Incomplete download for {filename}: {part.received}/{expected_size} bytes"
+                    )
+                break
+            except requests.RequestException as e:
+                if attempt == self.retries:
+                    raise
+                logger.warning(f"下载中断, 将从 {part.received} 字节处续传 {filename}: {e}")
+                urls = urls[1:] + urls[:1]
+                time.sleep(self.retry_delay * 2**attempt)
 
-        with open(filepath, "wb") as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
+        if not part.verified():
+            part_path.unlink(missing_ok=True)
+            raise ValueError(f"Checksum mismatch for {filename}")
 
+        os.replace(part_path, filepath)
+        if part.hasher:
+            self.store.put(*part.checksum, filepath)
         return filepath
+
+    def _transfer(self, urls: List[str], part: "PartialDownload"):
+        """从已收到的位置请求并追加到部分文件"""
+        headers = {"Range": f"bytes={part.received}-"} if part.received else {}
+        response, url = self._open(urls, headers)
+        if part.received and response.status_code == 416:
+            # 部分文件已经完整; 释放连接回连接池
+            response.close()
+            return
+        try:
+            response.raise_for_status()
+
+            if part.received and response.status_code != 206:
+                # 服务器不支持 Range, 从头开始
+                part.reset()
+
+            start, offset = time.monotonic(), part.received
+            with open(part.path, "ab" if part.received else "wb") as f:
+                for chunk in response.iter_content(chunk_size=8192):
+                    if chunk:
+                        f.write(chunk)
+                        part.update(chunk)
+        except requests.RequestException:
+            if self.mirrors:
+                self.mirrors.record_failure(url)
+            raise
+
+        if self.mirrors:
+            self.mirrors.record_success(
+                url,
+                response.elapsed.total_seconds(),
+                part.received - offset,
+                time.monotonic() - start,
+            )
+
+    def _open(self, urls: List[str], headers: Dict):
+        """
+        发起请求, 返回 (响应, URL)
+
+        首选镜像在对冲延迟内没有响应时, 同时向下一个镜像发起请求, 取先返回的一个。
+        """
+        if not self.mirrors or len(urls) < 2:
+            return self._get(urls[0], headers), urls[0]
+
+        pool = self._requests()
+        futures = {pool.submit(self._get, urls[0], headers): urls[0]}
+        done, _ = wait(futures, timeout=self.mirrors.hedge_delay_for(urls[0]))
+        if not done:
+            logger.info(f"镜像响应缓慢, 对冲请求: {urls[1]}")
+            futures[pool.submit(self._get, urls[1], headers)] = urls[1]
+
+        error = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except requests.RequestException as e:
+                    self.mirrors.record_failure(futures[future])
+                    error = e
+                    continue
+                for other in futures:
+                    if other is not future:
+                        other.add_done_callback(_close_response)
+                return response, futures[future]
+        raise error
+
+    def _requests(self) -> ThreadPoolExecutor:
+        """对冲请求的线程池: 每个下载线程同时最多有首选与对冲两个请求, 按下载并发数确定大小"""
+        with self._request_pool_lock:
+            if self._request_pool is None:
+                self._request_pool = ThreadPoolExecutor(
+                    max_workers=2 * self.max_workers, thread_name_prefix="hedge"
+                )
+            return self._request_pool
+
+    def _get(self, url: str, headers: Dict):
+        return self.session.get(
+            url, stream=True, timeout=(10, config.DOWNLOAD_STALL_TIMEOUT), headers=headers
+        )
+
+
+class PartialDownload:
+    """下载中的 .part 文件: 已收到的字节数与增量摘要状态"""
+
+    def __init__(self, path: Path, checksum: Optional[Tuple[str, str]]):
+        self.path = path
+        self.checksum = checksum
+        self.reset()
+        if path.exists():
+            # 之前中断留下的部分文件, 只在续传时读一遍以恢复摘要状态
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    self.update(chunk)
+
+    def reset(self):
+        self.received = 0
+        self.hasher = None
+        if self.checksum and self.checksum[0] in hashlib.algorithms_available:
+            self.hasher = hashlib.new(self.checksum[0])
+
+    def update(self, chunk: bytes):
+        self.received += len(chunk)
+        if self.hasher:
+            self.hasher.update(chunk)
+
+    def verified(self) -> bool:
+        """未知校验值 (或算法不支持) 时视为通过"""
+        return self.hasher is None or self.hasher.hexdigest() == self.checksum[1]
@@ -0,0 +1,136 @@
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+from backend.config import config
+
+# 指数加权平均的权重
+EWMA_ALPHA = 0.3
+
+
+class MirrorStats:
+    """单个镜像的健康统计 (所有任务共享)"""
+
+    __slots__ = ("latency", "throughput", "failures", "down_until")
+
+    def __init__(self):
+        self.latency: Optional[float] = None  # 首字节时间 (秒)
+        self.throughput: Optional[float] = None  # 字节/秒
+        self.failures = 0  # 连续失败次数
+        self.down_until = 0.0
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.down_until
+
+
+_stats: Dict[str, MirrorStats] = {}
+_stats_lock = threading.RLock()
+
+
+class MirrorGroup:
+    """
+    一个发行版的多个等价镜像
+
+    包 URL 以首个镜像为前缀, 按各镜像的健康状况改写为候选 URL 列表: 首选镜像在
+    健康镜像中按吞吐量加权随机选出 (把负载分散到各镜像), 其余按吞吐量排序作为
+    故障转移与对冲请求的后备; 连续失败的镜像暂时下线, 下线时间指数增长。
+    """
+
+    def __init__(self, bases: List[str], hedge_delay: float = None):
+        self.bases = [base.rstrip("/") + "/" for base in bases]
+        self.hedge_delay = config.MIRROR_HEDGE_DELAY if hedge_delay is None else hedge_delay
+
+    def candidates(self, url: str) -> List[str]:
+        """返回按优先级排列的候选 URL"""
+        base = self._base_of(url)
+        if base is None:
+            return [url]
+        relative = url[len(base):]
+        return [mirror + relative for mirror in self.ranked()]
+
+    def ranked(self) -> List[str]:
+        now = time.monotonic()
+        healthy = [base for base in self.bases if self.stats(base).healthy(now)]
+        down = sorted(
+            (base for base in self.bases if base not in healthy),
+            key=lambda base: self.stats(base).down_until,
+        )
+        if not healthy:
+            return down
+
+        weights = self._weights(healthy)
+        first = random.choices(healthy, weights=[weights[base] for base in healthy])[0]
+        rest = sorted((base for base in healthy if base != first), key=lambda base: -weights[base])
+        return [first] + rest + down
+
+    def hedge_delay_for(self, url: str) -> float:
+        """首选镜像超过该时间仍未响应则向下一个镜像发起对冲请求"""
+        base = self._base_of(url)
+        latency = self.stats(base).latency if base else None
+        if latency is None:
+            return self.hedge_delay
+        return min(self.hedge_delay, max(0.2, 3 * latency))
+
+    def record_success(self, url: str, latency: float, nbytes: int, elapsed: float):
+        base = self._base_of(url)
+        if base is None:
+            return
+        with _stats_lock:
+            stats = self.stats(base)
+            stats.failures = 0
+            stats.down_until = 0.0
+            stats.latency = _ewma(stats.latency, latency)
+            if nbytes and elapsed > 0:
+                stats.throughput = _ewma(stats.throughput, nbytes / elapsed)
+
+    def record_failure(self, url: str):
+        base = self._base_of(url)
+        if base is None:
+            return
+        with _stats_lock:
+            stats = self.stats(base)
+            stats.failures += 1
+            stats.down_until = time.monotonic() + min(300, 5 * 2 ** (stats.failures - 1))
+
+    @staticmethod
+    def stats(base: str) -> MirrorStats:
+        stats = _stats.get(base)
+        if stats is None:
+            with _stats_lock:
+                stats = _stats.setdefault(base, MirrorStats())
+        return stats
+
+    def _weights(self, bases: List[str]) -> Dict[str, float]:
+        # 尚无数据的镜像按已知最快的计, 保证它们能被探测到
+        known = [self.stats(base).throughput for base in bases if self.stats(base).throughput]
+        default = max(known) if known else 1.0
+        return {base: self.stats(base).throughput or default for base in bases}
+
+    def _base_of(self, url: str) -> Optional[str]:
+        for base in self.bases:
+            if url.startswith(base):
+                return base
+        return None
+
+
+def _ewma(current: Optional[float], sample: float) -> float:
+    return sample if current is None else (1 - EWMA_ALPHA) * current + EWMA_ALPHA * sample
+
+
+def mirror_group_for(dist_config: dict) -> Optional[MirrorGroup]:
+    """
+    由发行版配置的 mirrors 列表构建镜像组, 未配置或只有一个镜像时返回 None
+
+    mirrors 中的地址与 baseos/main 形式相同 (未列出时自动加入 baseos/main);
+    DEB 包路径相对于 /dists/ 之前的归档根目录。
+    """
+    primary = dist_config.get("baseos") or dist_config.get("main")
+    mirrors = list(dist_config.get("mirrors") or [])
+    if primary and primary not in mirrors:
+        mirrors.insert(0, primary)
+    if len(mirrors) < 2:
+        return None
+    if dist_config.get("type") == "deb":
+        mirrors = [mirror.split("/dists/")[0] for mirror in mirrors]
+    return MirrorGroup(mirrors)
@@ -0,0 +1,85 @@
+import asyncio
+import threading
+from typing import Dict, Optional, Set
+
+
+class Subscription:
+    """
+    一个订阅者 (通常是一条 SSE 连接)
+
+    发布方可能在任意线程, 变化先合并到 pending (同一任务的多次更新合并为一个
+    增量, 只保留各字段的最新值), 再唤醒订阅者所在的事件循环; 订阅者处理得慢时
+    只会收到更少、更大的增量, 内存占用不随更新次数增长。
+    """
+
+    def __init__(self, task_id: Optional[str], loop: asyncio.AbstractEventLoop):
+        self.task_id = task_id  # None 表示订阅所有任务
+        self.pending: Dict[str, dict] = {}
+        self._loop = loop
+        self._ready = asyncio.Event()
+        self._lock = threading.Lock()
+
+    def push(self, task_id: str, delta: dict):
+        with self._lock:
+            wake = not self.pending
+            self.pending.setdefault(task_id, {}).update(delta)
+        if wake:
+            self._loop.call_soon_threadsafe(self._ready.set)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, dict]]:
+        """等待下一批变化 (任务 ID -> 合并后的增量), 超时返回 None"""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        with self._lock:
+            self._ready.clear()
+            changes, self.pending = self.pending, {}
+        return changes
+
+
+class TaskEventBroker:
+    """进程内的任务变化发布/订阅; 没有订阅者时发布只是一次字典查找"""
+
+    def __init__(self):
+        self._subscribers: Dict[Optional[str], Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, task_id: Optional[str] = None) -> Subscription:
+        """在事件循环中调用; task_id 为 None 时订阅所有任务"""
+        subscription = Subscription(task_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.setdefault(task_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.task_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.task_id]
+
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def subscribed_tasks(self) -> Set[str]:
+        """单独订阅了的任务 ID"""
+        with self._lock:
+            return {task_id for task_id in self._subscribers if task_id is not None}
+
+    def publish(self, task_id: str, delta: dict):
+        """发布任务字段的变化, 可在任意线程调用"""
+        if not self._subscribers:
+            return
+        with self._lock:
+            subscribers = [*self._subscribers.get(task_id, ()), *self._subscribers.get(None, ())]
+        for subscription in subscribers:
+            try:
+                subscription.push(task_id, delta)
+            except RuntimeError:
+                # 订阅者的事件循环已关闭
+                self.unsubscribe(subscription)
+
+
+task_events = TaskEventBroker()
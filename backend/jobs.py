@@ -0,0 +1,202 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from backend.config import config
+from backend.scheduler import QueueFull
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    client TEXT NOT NULL DEFAULT '',
+    priority INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'queued',
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_queued ON jobs (state, priority DESC, seq);
+CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs (state, lease_until);
+"""
+
+
+@dataclass
+class ClaimedJob:
+    task_id: str
+    payload: str
+    attempts: int  # 包括本次在内的认领次数
+
+
+class JobQueue:
+    """
+    跨进程共享的任务队列接口
+
+    API 进程 submit(), worker 进程 claim() 认领任务并在执行期间定期 heartbeat()
+    续租; 租约过期 (worker 崩溃或失联) 的任务可被其他 worker 重新认领。原 worker
+    下次续租时得知租约已丢失, 应放弃该任务; complete() 只移除仍由自己持有的任务。
+    position()/cancel()/stats() 与 DownloadScheduler 的同名方法含义相同。
+    """
+
+    def submit(self, task_id: str, payload: str, client: str = "", priority: int = 0):
+        raise NotImplementedError
+
+    def claim(self, worker: str, lease: float) -> Optional[ClaimedJob]:
+        raise NotImplementedError
+
+    def heartbeat(self, worker: str, task_ids: Iterable[str], lease: float) -> List[str]:
+        raise NotImplementedError
+
+    def complete(self, task_id: str, worker: str):
+        raise NotImplementedError
+
+    def cancel(self, task_id: str) -> bool:
+        raise NotImplementedError
+
+    def position(self, task_id: str) -> Optional[int]:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+
+class SQLiteJobQueue(JobQueue):
+    """
+    SQLite 实现, 供同一主机上的 API 进程与多个 worker 进程共用
+
+    WAL 模式依赖同一主机上的共享内存, 数据库文件必须放在本机磁盘上, 不能放在
+    NFS/SMB 等网络文件系统上 (锁不可靠, 可能同一任务被多次认领或损坏数据库);
+    因此 worker 不能跨主机部署。认领在 BEGIN IMMEDIATE 事务中完成, 多个 worker
+    进程同时认领也不会拿到同一个任务。按 (优先级降序, 提交顺序) 出队; 客户端间的公平轮转只在单进程
+    调度器中提供。
+    """
+
+    def __init__(self, db_path, max_queued: int = 0):
+        self.max_queued = max_queued  # 0 表示不限
+        if str(db_path) != ":memory:":
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        # 自行管理事务; timeout 为等待其他进程写锁的时间
+        self._db = sqlite3.connect(str(db_path), timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def submit(self, task_id: str, payload: str, client: str = "", priority: int = 0):
+        """加入队列; 排队任务达到上限时抛出 QueueFull"""
+        with self._lock, self._transaction():
+            if self.max_queued:
+                (queued,) = self._db.execute("SELECT COUNT(*) FROM jobs WHERE state = 'queued'").fetchone()
+                if queued >= self.max_queued:
+                    raise QueueFull(f"排队任务已达上限 ({self.max_queued})")
+            self._db.execute(
+                "INSERT INTO jobs (task_id, payload, client, priority) VALUES (?, ?, ?, ?)",
+                (task_id, payload, client, priority),
+            )
+
+    def claim(self, worker: str, lease: float) -> Optional[ClaimedJob]:
+        """认领下一个任务: 优先取排队中的任务, 其次是租约已过期的任务"""
+        now = time.time()
+        with self._lock, self._transaction():
+            row = self._db.execute(
+                "SELECT seq, task_id, payload, attempts FROM jobs WHERE state = 'queued' "
+                "ORDER BY priority DESC, seq LIMIT 1"
+            ).fetchone()
+            if row is None:
+                row = self._db.execute(
+                    "SELECT seq, task_id, payload, attempts FROM jobs "
+                    "WHERE state = 'claimed' AND lease_until < ? ORDER BY seq LIMIT 1",
+                    (now,),
+                ).fetchone()
+            if row is None:
+                return None
+            seq, task_id, payload, attempts = row
+            self._db.execute(
+                "UPDATE jobs SET state = 'claimed', worker = ?, lease_until = ?, attempts = ? WHERE seq = ?",
+                (worker, now + lease, attempts + 1, seq),
+            )
+        return ClaimedJob(task_id, payload, attempts + 1)
+
+    def heartbeat(self, worker: str, task_ids: Iterable[str], lease: float) -> List[str]:
+        """为本 worker 仍在执行的任务续租, 返回租约已丢失 (已被其他 worker 认领或已删除) 的任务"""
+        lost = []
+        lease_until = time.time() + lease
+        with self._lock, self._transaction():
+            for task_id in task_ids:
+                cursor = self._db.execute(
+                    "UPDATE jobs SET lease_until = ? WHERE task_id = ? AND worker = ? AND state = 'claimed'",
+                    (lease_until, task_id, worker),
+                )
+                if cursor.rowcount == 0:
+                    lost.append(task_id)
+        return lost
+
+    def complete(self, task_id: str, worker: str):
+        """任务结束后移出队列; 已被其他 worker 重新认领的任务不受影响"""
+        with self._lock, self._transaction():
+            self._db.execute("DELETE FROM jobs WHERE task_id = ? AND worker = ?", (task_id, worker))
+
+    def cancel(self, task_id: str) -> bool:
+        """移出队列 (任务被删除时调用); 已被认领的任务由其 worker 下次续租时得知租约丢失并放弃执行"""
+        with self._lock, self._transaction():
+            cursor = self._db.execute("DELETE FROM jobs WHERE task_id = ?", (task_id,))
+        return cursor.rowcount > 0
+
+    def position(self, task_id: str) -> Optional[int]:
+        """排队位置 (从 1 开始), 不在队列中返回 None"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT seq, priority FROM jobs WHERE task_id = ? AND state = 'queued'", (task_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            seq, priority = row
+            (ahead,) = self._db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE state = 'queued' "
+                "AND (priority > ? OR (priority = ? AND seq < ?))",
+                (priority, priority, seq),
+            ).fetchone()
+        return ahead + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT state, COUNT(*), COUNT(DISTINCT worker) FROM jobs GROUP BY state"
+            ).fetchall()
+        counts = {state: (count, workers) for state, count, workers in rows}
+        return {
+            "running": counts.get("claimed", (0, 0))[0],
+            "queued": counts.get("queued", (0, 0))[0],
+            "max_queued": self.max_queued,
+            "workers": counts.get("claimed", (0, 0))[1],
+        }
+
+    @contextmanager
+    def _transaction(self):
+        """写事务: 开始时即取得写锁, 出现异常时回滚"""
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+
+def create_job_queue(url: str = None) -> Optional[JobQueue]:
+    """
+    按 JOB_QUEUE 配置创建共享任务队列; 未配置时返回 None, 任务在 API 进程内
+    由 download_scheduler 执行
+
+    sqlite:///<路径> : 本机磁盘上的 SQLite 文件 (API 与 worker 需在同一主机; 绝对路径为 sqlite:////...)
+    """
+    url = config.JOB_QUEUE if url is None else url
+    if not url:
+        return None
+    if url.startswith("sqlite:///"):
+        return SQLiteJobQueue(url[len("sqlite:///"):], max_queued=config.MAX_QUEUED_TASKS)
+    raise ValueError(f"不支持的任务队列: {url}")
@@ -0,0 +1,212 @@
+import bz2
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import requests
+
+from backend.config import config
+from backend.singleflight import inflight
+
+
+# repomd.xml 中的校验类型名 -> hashlib 算法名
+CHECKSUM_ALIASES = {"sha": "sha1"}
+
+# 压缩文件扩展名 -> 流式解压打开函数
+DECOMPRESSORS = {".gz": gzip.open, ".xz": lzma.open, ".bz2": bz2.open}
+
+
+def open_decompressed(path: Path, name: str):
+    """按原始文件名的扩展名, 以二进制流方式打开 (并增量解压) 缓存文件"""
+    for suffix, opener in DECOMPRESSORS.items():
+        if name.endswith(suffix):
+            return opener(path, "rb")
+    return open(path, "rb")
+
+
+@dataclass
+class CachedFile:
+    """缓存中的元数据文件"""
+
+    url: str
+    path: Path
+    revision: str  # 文件内容摘要, 作为仓库版本标识
+    changed: bool  # 本次获取是否更新了本地文件
+
+
+class MetadataCache:
+    """仓库元数据磁盘缓存
+
+    以 URL 为键保存原始文件, 在 TTL 过期后使用 ETag/Last-Modified
+    发起条件请求重新验证, 未变化 (304) 时直接复用本地文件。
+
+    每次使用条目都会更新其元信息文件的修改时间; 仓库更新后旧版本的文件
+    (URL 带版本摘要) 不再被使用, 由 prune() 按未使用时长清理。
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        ttl: int = 300,
+        session: Optional[requests.Session] = None,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.session = session or requests.Session()
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def fetch(
+        self,
+        url: str,
+        checksum: Optional[Tuple[str, str]] = None,
+        timeout: int = 60,
+    ) -> CachedFile:
+        """
+        获取 URL 对应的本地缓存文件
+
+        Args:
+            url: 元数据文件 URL
+            checksum: 已知的 (算法, 摘要), 例如 repomd.xml 中记录的值。
+                缓存命中时不发起任何请求, 下载后校验不一致则抛出 ValueError
+        """
+        # 同一文件的并发请求合并为一次, 后到者共享结果
+        result, _ = inflight.do(
+            ("metadata", str(self.cache_dir), url, checksum), lambda: self._fetch(url, checksum, timeout)
+        )
+        return result
+
+    def _fetch(self, url: str, checksum: Optional[Tuple[str, str]], timeout: int) -> CachedFile:
+        algo = "sha256"
+        if checksum:
+            algo = CHECKSUM_ALIASES.get(checksum[0], checksum[0])
+
+        with self._lock_for(url):
+            data_path, meta_path = self._paths(url)
+            meta = self._read_meta(meta_path) if data_path.exists() else None
+
+            if meta and meta.get("algo") == algo:
+                if checksum and meta.get("revision") == checksum[1]:
+                    self._touch(meta_path)
+                    return CachedFile(url, data_path, meta["revision"], False)
+                if not checksum and time.time() - meta.get("checked_at", 0) < self.ttl:
+                    self._touch(meta_path)
+                    return CachedFile(url, data_path, meta["revision"], False)
+
+            headers = {}
+            if meta and meta.get("algo") == algo:
+                if meta.get("etag"):
+                    headers["If-None-Match"] = meta["etag"]
+                if meta.get("last_modified"):
+                    headers["If-Modified-Since"] = meta["last_modified"]
+
+            response = self.session.get(url, headers=headers, stream=True, timeout=timeout)
+            try:
+                if response.status_code == 304 and headers:
+                    meta["checked_at"] = time.time()
+                    self._write_meta(meta_path, meta)
+                    return CachedFile(url, data_path, meta["revision"], False)
+
+                response.raise_for_status()
+                revision = self._store(response, data_path, algo)
+            finally:
+                response.close()
+
+            if checksum and revision != checksum[1]:
+                data_path.unlink(missing_ok=True)
+                meta_path.unlink(missing_ok=True)
+                raise ValueError(f"Checksum mismatch for {url}")
+
+            self._write_meta(
+                meta_path,
+                {
+                    "url": url,
+                    "algo": algo,
+                    "revision": revision,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "checked_at": time.time(),
+                },
+            )
+            changed = not meta or meta.get("revision") != revision
+            return CachedFile(url, data_path, revision, changed)
+
+    def prune(self, max_age: float) -> int:
+        """删除超过 max_age 秒未使用的条目, 返回删除的条目数"""
+        cutoff = time.time() - max_age
+        removed = 0
+        for meta_path in self.cache_dir.glob("*.json"):
+            meta = self._read_meta(meta_path)
+            if not meta or "url" not in meta:
+                continue
+            with self._lock_for(meta["url"]):
+                try:
+                    if meta_path.stat().st_mtime >= cutoff:
+                        continue
+                except FileNotFoundError:
+                    continue
+                data_path, _ = self._paths(meta["url"])
+                data_path.unlink(missing_ok=True)
+                meta_path.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+    def _store(self, response, data_path: Path, algo: str) -> str:
+        """流式写入临时文件并计算摘要, 完成后原子替换"""
+        digest = hashlib.new(algo)
+        tmp_path = data_path.with_name(
+            f"{data_path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=self.CHUNK_SIZE):
+                    if chunk:
+                        digest.update(chunk)
+                        f.write(chunk)
+            os.replace(tmp_path, data_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        return digest.hexdigest()
+
+    def _paths(self, url: str) -> Tuple[Path, Path]:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.cache_dir / key, self.cache_dir / f"{key}.json"
+
+    def _read_meta(self, meta_path: Path) -> Optional[dict]:
+        try:
+            return json.loads(meta_path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _touch(meta_path: Path):
+        try:
+            os.utime(meta_path)
+        except OSError:
+            pass
+
+    def _write_meta(self, meta_path: Path, meta: dict):
+        tmp_path = meta_path.with_name(
+            f"{meta_path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        tmp_path.write_text(json.dumps(meta))
+        os.replace(tmp_path, meta_path)
+
+    def _lock_for(self, url: str) -> threading.Lock:
+        with self._locks_lock:
+            if url not in self._locks:
+                self._locks[url] = threading.Lock()
+            return self._locks[url]
+
+
+metadata_cache = MetadataCache(config.CACHE_DIR / "metadata", ttl=config.METADATA_CACHE_TTL)
@@ -10,6 +10,15 @@ class PackageRequest(BaseModel):
     distribution: str = Field(..., min_length=1, description="发行版")
     arch: str = Field(default="auto", description="架构")
     deep_download: bool = Field(default=False, description="是否递归下载")
+    priority: int = Field(default=0, ge=0, le=9, description="调度优先级, 越大越先开始")
+    bundle_format: Optional[str] = Field(
+        default=None, pattern=r"^(tar|tar\.gz|tar\.zst)$", description="打包格式, 默认取服务端配置"
+    )
+    installed: List[str] = Field(
+        default_factory=list,
+        max_length=50000,
+        description="目标机已有的包 (rpm -qa / dpkg -l 输出、包名=版本或校验值, 每行一项), 只下载缺少的包",
+    )
 
 
 class TaskStatus(BaseModel):
@@ -21,12 +30,51 @@ class TaskStatus(BaseModel):
     message: str
     packages: Optional[List[str]] = None  # 添加包列表字段
     packages_count: int = 0
+    cache_hits: int = 0  # 直接取自共享仓库的包数
     total_size: str = "0 MB"
     system_type: Optional[str] = None  # 添加系统类型
     distribution: Optional[str] = None  # 添加发行版
     arch: Optional[str] = None  # 添加架构
     current_step: Optional[str] = None  # 添加当前步骤
+    queue_position: Optional[int] = None  # 排队位置, 仅 pending 状态有值
+    bundle_format: str = "tar.gz"
     created_at: str
     completed_at: Optional[str] = None
     download_url: Optional[str] = None
     error: Optional[str] = None
+
+
+class PlannedPackage(BaseModel):
+    """解析计划中的单个包"""
+
+    name: str
+    version: str
+    arch: Optional[str] = None
+    url: str
+    size: int = 0
+
+
+class UnresolvedRequirement(BaseModel):
+    """无法满足的依赖"""
+
+    package: str
+    requirement: str
+
+
+class ResolvePlan(BaseModel):
+    """只解析不下载的结果"""
+
+    distribution: str
+    system_type: str
+    arch: str
+    revision: Optional[str] = None
+    packages: List[PlannedPackage]
+    packages_count: int
+    total_size: int
+    unresolved: List[UnresolvedRequirement] = []
+
+
+class ConcurrencyUpdate(BaseModel):
+    """调整下载并发槽位数"""
+
+    concurrency: int = Field(..., ge=1, le=64)
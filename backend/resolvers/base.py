@@ -0,0 +1,114 @@
+import logging
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class BaseDependencyResolver:
+    """
+    依赖解析器基类: 基于工作队列的广度优先遍历
+
+    子类实现 _dependencies(pkg), 产出 (依赖项, 提供该依赖的包名), 找不到提供者时包名为 None。
+    所有已发现的包共用一个输出列表, 同时作为遍历队列, 不产生递归与列表复制。
+
+    多个包可满足同一依赖时, 选择只取决于仓库索引与解析前给定的 installed 集合,
+    不取决于遍历顺序 (已解析了哪些包); 因此广度优先遍历与依赖图 (graph.py)
+    对同一请求得到相同的包集合。
+    """
+
+    NAME_FIELD = "name"
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.resolved = set()
+        # 目标机已安装的包: 视为已解析, 多个候选时优先选择
+        self.installed = set()
+        # 包名 -> (引入它的父包名, 依赖项); 根包为 None
+        self.parents = {}
+        # 无法满足的依赖: [(包名, 依赖项)]
+        self.unresolved = []
+
+    def mark_installed(self, package_names: Iterable[str]):
+        """在解析前调用: 这些包不再下载, 也不展开其依赖"""
+        self.installed.update(package_names)
+        self.resolved.update(self.installed)
+
+    def resolve(self, package_name: str) -> list:
+        """
+        解析包及其所有依赖
+
+        返回: 本次新加入的包列表 (包含输入包, 已解析过的包不再重复返回)
+        """
+        return list(self.iter_resolve(package_name))
+
+    def iter_resolve(self, package_name: str) -> Iterator:
+        """与 resolve 相同, 但每发现一个包立即产出, 调用方可以边解析边处理"""
+        if package_name in self.resolved:
+            return
+
+        pkg = self.parser.find_package(package_name)
+        if not pkg:
+            raise ValueError(f"Package '{package_name}' not found")
+
+        self.resolved.add(package_name)
+        self.parents[package_name] = None
+        packages = [pkg]
+        yield pkg
+
+        debug = logger.isEnabledFor(logging.DEBUG)
+        position = 0
+        while position < len(packages):
+            current = packages[position]
+            position += 1
+            current_name = current[self.NAME_FIELD]
+
+            for requirement, provider in self._dependencies(current):
+                if provider in self.resolved:
+                    continue
+
+                dep = self.parser.find_package(provider) if provider else None
+                if not dep:
+                    self.unresolved.append((current_name, requirement))
+                    if debug:
+                        logger.debug("  提供者包不存在: %s (%s)", provider, requirement)
+                    continue
+
+                self.resolved.add(provider)
+                self.parents[provider] = (current_name, requirement)
+                packages.append(dep)
+                yield dep
+                if debug:
+                    logger.debug("  %s -> %s (%s)", current_name, provider, requirement)
+
+        logger.info("解析包: %s, 新增 %d 个包", package_name, len(packages))
+
+    def explain(self, package_name: str) -> List[Tuple[str, Optional[str]]]:
+        """
+        返回包被引入的依赖链, 从根包开始
+
+        例如: [("nginx", None), ("nginx-core", "nginx-core"), ("openssl-libs", "libssl.so.3()(64bit)")]
+        """
+        if package_name not in self.parents:
+            return []
+
+        chain = []
+        name = package_name
+        while True:
+            parent = self.parents[name]
+            chain.append((name, parent[1] if parent else None))
+            if parent is None:
+                break
+            name = parent[0]
+        chain.reverse()
+        return chain
+
+    def get_download_list(self, packages: Iterable) -> list:
+        """获取去重的下载列表"""
+        return list(self.iter_download_list(packages))
+
+    def iter_download_list(self, packages: Iterable) -> Iterator[dict]:
+        """逐个产出去重后带 url 的下载项"""
+        raise NotImplementedError
+
+    def _dependencies(self, pkg) -> Iterator[Tuple[str, str]]:
+        raise NotImplementedError
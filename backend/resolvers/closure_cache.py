@@ -0,0 +1,70 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from backend.config import config
+
+
+class ClosureCache:
+    """
+    进程内的依赖闭包缓存
+
+    以 (发行版, 架构, 仓库版本, 包名) 为键保存单个根包的完整闭包 (DependencyGraph 位图),
+    超出容量时淘汰最久未使用的条目。某个发行版出现新的仓库版本时,
+    其旧版本的条目全部失效。
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, int]" = OrderedDict()
+        self._revisions: Dict[Tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(
+        self, distribution: str, arch: str, revision: str, package: str
+    ) -> Optional[int]:
+        """获取缓存的闭包, 未命中返回 None"""
+        key = (distribution, arch, revision, package)
+        with self._lock:
+            self._check_revision(distribution, arch, revision)
+            closure = self._entries.get(key)
+            if closure is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return closure
+
+    def put(self, distribution: str, arch: str, revision: str, package: str, closure: int):
+        """保存闭包"""
+        key = (distribution, arch, revision, package)
+        with self._lock:
+            self._check_revision(distribution, arch, revision)
+            self._entries[key] = closure
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, distribution: str, arch: str):
+        """清除某个发行版/架构的全部条目"""
+        with self._lock:
+            self._revisions.pop((distribution, arch), None)
+            self._purge(distribution, arch)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def _check_revision(self, distribution: str, arch: str, revision: str):
+        if self._revisions.get((distribution, arch)) != revision:
+            self._purge(distribution, arch)
+            self._revisions[(distribution, arch)] = revision
+
+    def _purge(self, distribution: str, arch: str):
+        for key in [k for k in self._entries if k[0] == distribution and k[1] == arch]:
+            del self._entries[key]
+
+
+closure_cache = ClosureCache(config.CLOSURE_CACHE_SIZE)
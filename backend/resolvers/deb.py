@@ -1,56 +1,118 @@
-import requests
-import gzip
+from typing import BinaryIO, Dict, Iterable, Iterator
 from urllib.parse import urljoin
 import re
 
+import requests
+
+from backend.metadata_cache import CachedFile, MetadataCache, metadata_cache, open_decompressed
+from backend.resolvers.base import BaseDependencyResolver
+from backend.resolvers.index import PackageIndex, deb_depends_clauses
+
+# 按优先级尝试的索引文件: xz 体积最小, gz 兼容旧镜像
+PACKAGES_FILES = ("Packages.xz", "Packages.gz", "Packages.bz2")
+
+# 解析时保留的字段, 其余字段 (Description 等) 直接跳过
+KEEP_FIELDS = frozenset(
+    {"Package", "Version", "Architecture", "Depends", "Provides", "Filename", "Size", "SHA256"}
+)
+
+CONTINUATION_RE = re.compile(rb"\n[ \t]+")
+
+
+def iter_stanzas(
+    stream: BinaryIO, fields: frozenset = KEEP_FIELDS, block_size: int = 1024 * 1024
+) -> Iterator[Dict[str, str]]:
+    """
+    从 (已解压的) 二进制流中逐个产出 Packages 段落
+
+    按块读取并以空行切分段落, 用正则只提取 fields 中的字段 (含续行),
+    其余字段不做任何解码。
+    """
+    names = b"|".join(re.escape(field.encode("ascii")) for field in sorted(fields))
+    field_re = re.compile(rb"^(" + names + rb"):[ \t]*(.*(?:\n[ \t].*)*)", re.M)
+
+    pending = b""
+    while True:
+        chunk = stream.read(block_size)
+        if chunk:
+            pending += chunk
+            blocks = pending.split(b"\n\n")
+            pending = blocks.pop()
+        else:
+            blocks = [pending]
+
+        for block in blocks:
+            stanza = {}
+            for match in field_re.finditer(block):
+                value = match.group(2)
+                if b"\n" in value:
+                    # 续行: 去掉行首缩进后以换行拼接
+                    value = CONTINUATION_RE.sub(b"\n", value)
+                stanza[match.group(1).decode("ascii")] = value.strip().decode("utf-8", "replace")
+            if "Package" in stanza:
+                yield stanza
+
+        if not chunk:
+            break
+
 
 class DEBPackageParser:
-    """DEB Packages.gz 解析器"""
+    """DEB Packages 索引解析器"""
 
-    def __init__(self, mirror_url: str, arch: str = "amd64"):
+    def __init__(self, mirror_url: str, arch: str = "amd64", cache: MetadataCache = None):
         """
         Args:
             mirror_url: Debian 镜像的基础 URL (例如: http://archive.ubuntu.com/ubuntu/dists/noble/main/)
             arch: 架构 (amd64, arm64, etc.)
+            cache: 元数据缓存, 默认使用全局缓存
         """
         self.mirror_url = mirror_url.rstrip("/") + "/"
         self.arch = arch
-        self.package_cache = {}
+        self.cache = cache or metadata_cache
+        self.packages_file = None
+        self.revision = None
+        self.package_cache = PackageIndex("deb", self.mirror_url)
+
+    def _fetch_packages(self) -> CachedFile:
+        """获取 binary-<arch>/Packages.{xz,gz,bz2}, 记住镜像实际提供的格式"""
+        candidates = (self.packages_file,) if self.packages_file else PACKAGES_FILES
+
+        for i, filename in enumerate(candidates):
+            url = urljoin(self.mirror_url, f"binary-{self.arch}/{filename}")
+            try:
+                entry = self.cache.fetch(url)
+            except requests.HTTPError:
+                if i == len(candidates) - 1:
+                    raise
+                continue
+            self.packages_file = filename
+            return entry
+
+    def probe_revision(self) -> str:
+        """重新验证 Packages 索引, 返回当前仓库版本 (文件摘要)"""
+        return self._fetch_packages().revision
 
     def load_packages(self):
-        """下载并解析 Packages.gz"""
-        # DEB 包的 Packages.gz 文件位于 binary-<arch>/Packages.gz
-        packages_url = urljoin(self.mirror_url, f"binary-{self.arch}/Packages.gz")
-
-        response = requests.get(packages_url, timeout=60)
-        response.raise_for_status()
-
-        # 解压
-        decompressed = gzip.decompress(response.content).decode("utf-8")
-
-        # 解析包信息
-        self._parse_packages_text(decompressed)
-
-    def _parse_packages_text(self, text: str):
-        """解析 Packages 文本格式"""
-        current_package = {}
-
-        for line in text.split("\n"):
-            if line.strip() == "":
-                # 空行表示包信息结束
-                if current_package and "Package" in current_package:
-                    name = current_package["Package"]
-                    self.package_cache[name] = current_package
-                    current_package = {}
-            elif line.startswith(" "):
-                # 续行
-                if current_package:
-                    last_key = list(current_package.keys())[-1]
-                    current_package[last_key] += "\n" + line.strip()
-            elif ":" in line:
-                # 新字段
-                key, value = line.split(":", 1)
-                current_package[key.strip()] = value.strip()
+        """下载并解析 Packages 索引"""
+        packages = self._fetch_packages()
+        self.revision = packages.revision
+
+        with open_decompressed(packages.path, self.packages_file) as stream:
+            self.parse_stream(stream)
+
+    def parse_stream(self, stream: BinaryIO):
+        """从 (已解压的) 二进制流解析包信息"""
+        for stanza in iter_stanzas(stream):
+            self.package_cache.add(
+                name=stanza["Package"],
+                version=stanza.get("Version", ""),
+                arch=stanza.get("Architecture", ""),
+                location=stanza.get("Filename", ""),
+                size=int(stanza.get("Size") or 0),
+                requires=deb_depends_clauses(stanza.get("Depends", "")),
+                provides=deb_depends_clauses(stanza.get("Provides", "")),
+                checksum=f"sha256:{stanza['SHA256']}" if stanza.get("SHA256") else "",
+            )
 
     def find_package(self, name: str):
         """查找特定包"""
@@ -71,62 +133,36 @@ class DEBPackageParser:
         return f"{base_url}/{filename}"
 
 
-class DEBDependencyResolver:
+class DEBDependencyResolver(BaseDependencyResolver):
     """DEB 依赖解析器"""
 
-    def __init__(self, parser: DEBPackageParser):
-        self.parser = parser
-        self.resolved = set()
-
-    def resolve(self, package_name: str) -> list:
-        """递归解析包及其所有依赖"""
-        if package_name in self.resolved:
-            return []
-
-        pkg = self.parser.find_package(package_name)
-        if not pkg:
-            raise ValueError(f"Package '{package_name}' not found")
-
-        packages = [pkg]
-        self.resolved.add(package_name)
+    NAME_FIELD = "Package"
 
-        # 解析 Depends 字段
-        depends_str = pkg.get("Depends", "")
-        dependencies = self._parse_depends(depends_str)
-
-        for dep in dependencies:
-            try:
-                dep_packages = self.resolve(dep)
-                packages.extend(dep_packages)
-            except ValueError:
-                continue
-
-        return packages
-
-    def _parse_depends(self, depends_str: str) -> list:
-        """解析 Depends 字段"""
-        if not depends_str:
-            return []
-
-        dependencies = []
-
-        # 分割逗号分隔的依赖
-        for part in depends_str.split(","):
-            part = part.strip()
-
-            # 移除版本限制
-            match = re.match(r"^([a-zA-Z0-9+.-]+)", part)
-            if match:
-                dep_name = match.group(1)
-                dependencies.append(dep_name)
-
-        return dependencies
+    def _dependencies(self, pkg):
+        """
+        产出 (依赖子句, 包名)
 
-    def get_download_list(self, packages: list) -> list:
-        """获取去重的下载列表"""
+        对 "a | b" 形式的子句: 已安装的候选视为已满足, 否则取第一个实际存在的包,
+        再否则取提供该虚拟包 (Provides) 的包; 都没有时包名为 None。
+        """
+        index = self.parser.package_cache
+
+        for clause in deb_depends_clauses(pkg.get("Depends", "")):
+            alternatives = clause.split(" | ")
+            provider = next((name for name in alternatives if name in self.installed), None)
+            if provider is None:
+                provider = next((name for name in alternatives if name in index), None)
+            if provider is None:
+                for name in alternatives:
+                    providers = [index.name_of(pkg_id) for pkg_id in index.providers_of(name)]
+                    if providers:
+                        provider = next((p for p in providers if p in self.installed), providers[0])
+                        break
+            yield clause, provider
+
+    def iter_download_list(self, packages: Iterable) -> Iterator[dict]:
+        """按包名去重, 并添加下载 URL"""
         seen = set()
-        download_list = []
-
         for pkg in packages:
             name = pkg.get("Package")
             if not name or name in seen:
@@ -134,9 +170,6 @@ class DEBDependencyResolver:
 
             seen.add(name)
 
-            # 添加下载 URL
             pkg_with_url = pkg.copy()
             pkg_with_url["url"] = self.parser.get_package_url(name)
-            download_list.append(pkg_with_url)
-
-        return download_list
+            yield pkg_with_url
@@ -0,0 +1,155 @@
+import threading
+import weakref
+from typing import Dict, Iterable, List, Tuple
+
+from backend.resolvers.base import BaseDependencyResolver
+
+
+class DependencyGraph:
+    """
+    依赖图的强连通分量 (SCC) 缩合
+
+    以包 ID 为节点, 每个包的依赖边由解析器的 _dependencies 给出; 提供者的选择
+    只取决于仓库索引 (见 BaseDependencyResolver), 这里的解析器没有 installed
+    集合, 因此边与请求无关, 闭包与广度优先遍历得到的包集合相同。用迭代版 Tarjan 算法按需计算 SCC:
+    分量按完成顺序编号, 依赖方总是排在被依赖方之后。
+
+    每个分量的闭包是一个以分量编号为位的整数位图, 在分量完成时由其后继分量的
+    位图按位或得到, 之后不再变化。任意多个根包的闭包就是各自位图的并集。
+    """
+
+    def __init__(self, parser, resolver_cls):
+        self.parser = parser
+        self.index = parser.package_cache
+        self._resolver: BaseDependencyResolver = resolver_cls(parser)
+        # 包 ID -> 分量编号
+        self.component_of: Dict[int, int] = {}
+        # 分量编号 -> 成员包 ID / 闭包位图
+        self.members: List[List[int]] = []
+        self.closures: List[int] = []
+        # 包 ID -> 无法满足的依赖项
+        self.unresolved: Dict[int, List[str]] = {}
+        self._successors: Dict[int, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def closure(self, package_names: Iterable[str]) -> int:
+        """返回多个根包的闭包位图; 包不存在时抛出 ValueError"""
+        bits = 0
+        for name in package_names:
+            pkg_id = self.index.id_of(name)
+            if pkg_id is None:
+                raise ValueError(f"Package '{name}' not found")
+            if pkg_id not in self.component_of:
+                with self._lock:
+                    if pkg_id not in self.component_of:
+                        self._strongconnect(pkg_id)
+            bits |= self.closures[self.component_of[pkg_id]]
+        return bits
+
+    def package_ids(self, bits: int) -> List[int]:
+        """展开闭包位图, 依赖方在前 (根包通常排在最前)"""
+        pkg_ids = []
+        top = bits.bit_length() - 1
+        # bin() 一次性展开位图, 逐位移位在大整数上是平方复杂度
+        for position, bit in enumerate(bin(bits)[2:]):
+            if bit == "1":
+                pkg_ids.extend(self.members[top - position])
+        return pkg_ids
+
+    def packages(self, bits: int) -> list:
+        """展开闭包位图为包记录列表"""
+        return [self.index.record(pkg_id) for pkg_id in self.package_ids(bits)]
+
+    def unresolved_in(self, bits: int) -> List[Tuple[str, str]]:
+        """闭包中无法满足的依赖: [(包名, 依赖项)]"""
+        return [
+            (self.index.name_of(pkg_id), requirement)
+            for pkg_id in self.package_ids(bits)
+            for requirement in self.unresolved.get(pkg_id, ())
+        ]
+
+    def build(self):
+        """预先计算全部包的分量 (默认按需计算)"""
+        with self._lock:
+            for pkg_id in list(self.index.by_name.values()):
+                if pkg_id not in self.component_of:
+                    self._strongconnect(pkg_id)
+
+    def _edges(self, pkg_id: int) -> List[int]:
+        edges = self._successors.get(pkg_id)
+        if edges is None:
+            edges = []
+            for requirement, provider in self._resolver._dependencies(self.index.record(pkg_id)):
+                target = self.index.id_of(provider) if provider else None
+                if target is None:
+                    self.unresolved.setdefault(pkg_id, []).append(requirement)
+                elif target != pkg_id:
+                    edges.append(target)
+            self._successors[pkg_id] = edges
+        return edges
+
+    def _strongconnect(self, root: int):
+        """迭代版 Tarjan; 之前已归入分量的节点视为已完成"""
+        order = {root: 0}
+        low = {root: 0}
+        stack = [root]
+        on_stack = {root}
+        work = [(root, iter(self._edges(root)))]
+
+        while work:
+            node, successors = work[-1]
+            for succ in successors:
+                if succ in self.component_of:
+                    continue
+                if succ not in order:
+                    order[succ] = low[succ] = len(order)
+                    stack.append(succ)
+                    on_stack.add(succ)
+                    work.append((succ, iter(self._edges(succ))))
+                    break
+                if succ in on_stack:
+                    low[node] = min(low[node], order[succ])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == order[node]:
+                    members = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        members.append(member)
+                        if member == node:
+                            break
+                    self._add_component(members)
+
+    def _add_component(self, members: List[int]):
+        component = len(self.members)
+        member_set = set(members)
+
+        bits = 1 << component
+        for member in members:
+            for succ in self._successors.pop(member):
+                if succ not in member_set:
+                    bits |= self.closures[self.component_of[succ]]
+
+        # closure() 不加锁读取 component_of: 先写入分量, 最后才登记成员所属的分量
+        self.members.append(members)
+        self.closures.append(bits)
+        for member in members:
+            self.component_of[member] = component
+
+
+_graphs = weakref.WeakKeyDictionary()
+_graphs_lock = threading.Lock()
+
+
+def dependency_graph(parser, resolver_cls) -> DependencyGraph:
+    """获取解析器对应的依赖图; 仓库版本变化时注册表会换用新的 parser, 图随之重建"""
+    with _graphs_lock:
+        graph = _graphs.get(parser)
+        if graph is None or graph.index is not parser.package_cache:
+            graph = DependencyGraph(parser, resolver_cls)
+            _graphs[parser] = graph
+        return graph
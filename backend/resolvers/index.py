@@ -0,0 +1,285 @@
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urljoin
+import re
+
+
+# DEB 依赖子句中的包名 (去掉版本限制与 :any 等架构限定)
+DEB_NAME_RE = re.compile(r"^\s*([a-zA-Z0-9+.-]+)")
+
+
+class StringTable:
+    """字符串驻留表: 相同字符串只保存一份, 以整数 ID 引用"""
+
+    __slots__ = ("strings", "ids")
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self.ids: Dict[str, int] = {}
+
+    def intern(self, value: str) -> int:
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.strings.append(value)
+            self.ids[value] = string_id
+        return string_id
+
+    def lookup(self, value: str) -> Optional[int]:
+        return self.ids.get(value)
+
+    def __getitem__(self, string_id: int) -> str:
+        return self.strings[string_id]
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+
+class TextColumn:
+    """几乎不重复的文本列 (版本号、文件路径), 拼接存放在一块字节缓冲中"""
+
+    __slots__ = ("data", "offsets")
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array("Q", [0])
+
+    def append(self, value: str):
+        self.data += value.encode("utf-8")
+        self.offsets.append(len(self.data))
+
+    def __getitem__(self, row: int) -> str:
+        return str(self.data[self.offsets[row] : self.offsets[row + 1]], "utf-8")
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+
+class PackageRecord(Mapping):
+    """索引中一个包的只读字典视图, 字段按需从列中取出"""
+
+    __slots__ = ("_index", "_id")
+
+    def __init__(self, index: "PackageIndex", pkg_id: int):
+        self._index = index
+        self._id = pkg_id
+
+    @property
+    def pkg_id(self) -> int:
+        return self._id
+
+    def __getitem__(self, key: str):
+        getter = self._index.getters.get(key)
+        if getter is None:
+            raise KeyError(key)
+        return getter(self._id)
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self._index.getters:
+            if key in self:
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __contains__(self, key) -> bool:
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def copy(self) -> dict:
+        return dict(self)
+
+    def __repr__(self) -> str:
+        return f"PackageRecord({dict(self)!r})"
+
+
+class PackageIndex(Mapping):
+    """
+    列式存储的仓库索引: 包名 -> PackageRecord
+
+    名称、架构与依赖/能力字符串驻留在 StringTable 中, 版本号和文件路径拼接存放,
+    每个包的 requires/provides 以 CSR 形式存为整数数组。
+    """
+
+    def __init__(self, kind: str, base_url: str):
+        self.kind = kind
+        self.base_url = base_url
+        self.strings = StringTable()
+
+        self.names = array("I")
+        self.arches = array("I")
+        self.versions = TextColumn()
+        # 完整版本 [epoch:]version-release, 用于比较是否为同一构建 (DEB 的 Version 本身即完整版本)
+        self.evrs = TextColumn()
+        self.locations = TextColumn()
+        self.sizes = array("Q")
+        # "算法:十六进制摘要", 例如 "sha256:ab12..."; 未知时为空
+        self.checksums = TextColumn()
+
+        self.requires_offsets = array("I", [0])
+        self.requires = array("I")
+        self.provides_offsets = array("I", [0])
+        self.provides = array("I")
+
+        self.by_name: Dict[str, int] = {}
+        self._providers: Optional[Dict[int, List[int]]] = None
+        self.getters = self._rpm_getters() if kind == "rpm" else self._deb_getters()
+
+    def add(
+        self,
+        name: str,
+        version: str,
+        arch: str,
+        location: str,
+        size: int = 0,
+        requires: Iterable[str] = (),
+        provides: Iterable[str] = (),
+        checksum: str = "",
+        evr: str = "",
+    ) -> int:
+        """追加一个包, 同名包以后出现的为准; evr 省略时与 version 相同"""
+        pkg_id = len(self.names)
+        intern = self.strings.intern
+
+        self.names.append(intern(name))
+        self.arches.append(intern(arch))
+        self.versions.append(version)
+        self.evrs.append(evr or version)
+        self.locations.append(location)
+        self.sizes.append(size)
+        self.checksums.append(checksum)
+
+        self.requires.extend(intern(req) for req in requires)
+        self.requires_offsets.append(len(self.requires))
+        self.provides.extend(intern(prov) for prov in provides)
+        self.provides_offsets.append(len(self.provides))
+
+        self.by_name[self.strings[self.names[pkg_id]]] = pkg_id
+        self._providers = None
+        return pkg_id
+
+    # Mapping 接口: 包名 -> 记录
+
+    def __getitem__(self, name: str) -> PackageRecord:
+        return PackageRecord(self, self.by_name[name])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.by_name)
+
+    def __len__(self) -> int:
+        return len(self.by_name)
+
+    def __contains__(self, name) -> bool:
+        return name in self.by_name
+
+    # 按包 ID 访问
+
+    def id_of(self, name: str) -> Optional[int]:
+        return self.by_name.get(name)
+
+    def record(self, pkg_id: int) -> PackageRecord:
+        return PackageRecord(self, pkg_id)
+
+    def name_of(self, pkg_id: int) -> str:
+        return self.strings[self.names[pkg_id]]
+
+    def requires_of(self, pkg_id: int) -> List[str]:
+        start, end = self.requires_offsets[pkg_id], self.requires_offsets[pkg_id + 1]
+        return [self.strings[i] for i in self.requires[start:end]]
+
+    def provides_of(self, pkg_id: int) -> List[str]:
+        start, end = self.provides_offsets[pkg_id], self.provides_offsets[pkg_id + 1]
+        return [self.strings[i] for i in self.provides[start:end]]
+
+    def providers_of(self, capability: str) -> List[int]:
+        """提供该能力的包 ID 列表 (反向索引首次调用时构建)"""
+        string_id = self.strings.lookup(capability)
+        if string_id is None:
+            return []
+        return self.provider_map().get(string_id, [])
+
+    def provider_map(self) -> Dict[int, List[int]]:
+        """能力字符串 ID -> 提供者包 ID 列表, 只包含有效 (未被同名覆盖) 的包"""
+        if self._providers is None:
+            providers = {}
+            for pkg_id in self.by_name.values():
+                start, end = self.provides_offsets[pkg_id], self.provides_offsets[pkg_id + 1]
+                for string_id in self.provides[start:end]:
+                    providers.setdefault(string_id, []).append(pkg_id)
+            self._providers = providers
+        return self._providers
+
+    def evr_of(self, pkg_id: int) -> str:
+        return self.evrs[pkg_id]
+
+    def checksum_of(self, pkg_id: int) -> str:
+        checksum = self.checksums[pkg_id]
+        if not checksum:
+            raise KeyError("checksum")
+        return checksum
+
+    # 按发行版类型保持原有的字段名
+
+    def _rpm_getters(self) -> dict:
+        return {
+            "name": self.name_of,
+            "version": lambda i: self.versions[i],
+            "arch": lambda i: self.strings[self.arches[i]],
+            "url": lambda i: urljoin(self.base_url, self.locations[i]),
+            "size": lambda i: self.sizes[i],
+            "checksum": self.checksum_of,
+            "requires": self.requires_of,
+            "provides": self.provides_of,
+        }
+
+    def _deb_getters(self) -> dict:
+        def depends(i):
+            requires = self.requires_of(i)
+            if not requires:
+                raise KeyError("Depends")
+            return ", ".join(requires)
+
+        def provides(i):
+            provides = self.provides_of(i)
+            if not provides:
+                raise KeyError("Provides")
+            return ", ".join(provides)
+
+        def sha256(i):
+            algo, _, digest = self.checksums[i].partition(":")
+            if algo != "sha256":
+                raise KeyError("SHA256")
+            return digest
+
+        return {
+            "Package": self.name_of,
+            "Version": lambda i: self.versions[i],
+            "Architecture": lambda i: self.strings[self.arches[i]],
+            "Depends": depends,
+            "Provides": provides,
+            "Filename": lambda i: self.locations[i],
+            "Size": lambda i: str(self.sizes[i]),
+            "SHA256": sha256,
+        }
+
+
+def deb_depends_clauses(depends: str) -> List[str]:
+    """
+    将 Depends 字段拆分为去掉版本限制的依赖子句
+
+    例如 "libc6 (>= 2.34), a (>= 1) | b:any" -> ["libc6", "a | b"]
+    """
+    clauses = []
+    for part in depends.split(","):
+        alternatives = []
+        for alt in part.split("|"):
+            match = DEB_NAME_RE.match(alt)
+            if match:
+                alternatives.append(match.group(1))
+        if alternatives:
+            clauses.append(" | ".join(alternatives))
+    return clauses
@@ -0,0 +1,117 @@
+import re
+from typing import Dict, Iterable, Optional, Set
+
+# dpkg -l 的一行: 状态两位 (第二位 i 表示已安装), 包名[:架构], 版本
+DPKG_LINE_RE = re.compile(r"^([uihrp])([ncHUFWti])[ R]?\s+(\S+)\s+(\S+)")
+# rpm -qa 的一行: name-version-release.arch
+RPM_NEVRA_RE = re.compile(
+    r"^(?P<name>.+)-(?P<version>[^-]+)-(?P<release>[^-]+)\."
+    r"(?P<arch>x86_64|noarch|i686|i386|aarch64|ppc64le|s390x|armv7hl|src)$"
+)
+# dpkg -l 的表头
+DPKG_HEADER_PREFIXES = ("Desired=", "|", "+++")
+CHECKSUM_RE = re.compile(r"^(md5|sha1|sha224|sha256|sha384|sha512):([0-9a-f]+)$", re.IGNORECASE)
+SHA256_RE = re.compile(r"^[0-9a-fA-F]{64}$")
+PACKAGE_NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9+._-]*$")
+
+
+class InstalledManifest:
+    """
+    目标机器上已有的包
+
+    每行一项, 可混用以下格式:
+      - rpm -qa 输出: openssl-libs-1.1.1k-5.el8_5.x86_64 (版本记为 1.1.1k-5.el8_5)
+      - dpkg -l 输出: ii  libc6:amd64  2.31-0ubuntu9.9  amd64  GNU C Library (非 ii 状态与表头忽略)
+      - 包名=版本 或 "包名 版本"; 只写包名表示任意版本。RPM 只写 version 不写
+        release (如 zlib=1.2.11) 时视为该 version 的任意 release
+      - 校验值: sha256:<hex> (或直接写 64 位 sha256 摘要)
+    """
+
+    def __init__(self):
+        # 包名 -> 已安装的版本; 值为 None 表示版本未知
+        self.versions: Dict[str, Optional[Set[str]]] = {}
+        self.checksums: Set[str] = set()
+
+    @classmethod
+    def parse(cls, lines: Iterable[str]) -> "InstalledManifest":
+        manifest = cls()
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#") or line.startswith(DPKG_HEADER_PREFIXES):
+                continue
+
+            match = CHECKSUM_RE.match(line)
+            if match:
+                manifest.checksums.add(f"{match.group(1).lower()}:{match.group(2).lower()}")
+                continue
+            if SHA256_RE.match(line):
+                manifest.checksums.add(f"sha256:{line.lower()}")
+                continue
+
+            match = DPKG_LINE_RE.match(line)
+            if match:
+                if match.group(2) == "i":
+                    manifest.add(match.group(3).split(":")[0], match.group(4))
+                continue
+
+            match = RPM_NEVRA_RE.match(line)
+            if match:
+                manifest.add(match.group("name"), f"{match.group('version')}-{match.group('release')}")
+                continue
+
+            name, _, version = line.replace("=", " ").partition(" ")
+            if PACKAGE_NAME_RE.match(name):
+                manifest.add(name, version.strip() or None)
+        return manifest
+
+    def add(self, name: str, version: Optional[str] = None):
+        if version is None:
+            self.versions[name] = None
+        elif name not in self.versions or self.versions[name] is not None:
+            self.versions.setdefault(name, set()).add(version)
+
+    def __len__(self) -> int:
+        return len(self.versions) + len(self.checksums)
+
+    def satisfied(self, index, roots: Iterable[str]) -> Set[str]:
+        """
+        返回可以视为已解析的包名
+
+        依赖项只看包名 (解析器本身不比较版本), 目标机已有该包即认为依赖已满足,
+        其依赖也不再展开; 用户显式请求的根包只有在版本或校验值完全一致时才跳过,
+        版本不同时仍然下载 (即增量更新)。
+        """
+        names = set()
+        if self.checksums:
+            for name, pkg_id in index.by_name.items():
+                try:
+                    if index.checksum_of(pkg_id).lower() in self.checksums:
+                        names.add(name)
+                except KeyError:
+                    continue
+
+        roots = set(roots)
+        for name, versions in self.versions.items():
+            pkg_id = index.id_of(name)
+            if pkg_id is None:
+                continue
+            if name not in roots or (versions is not None and _matches(versions, index.evr_of(pkg_id))):
+                names.add(name)
+        return names
+
+
+def _matches(installed: Set[str], evr: str) -> bool:
+    """
+    已安装的版本是否与仓库中的构建相同
+
+    比较完整的 [epoch:]version-release: 大多数安全更新只提升 release, 只比较
+    version 会把需要更新的根包当作已安装。已安装版本未写 epoch 时 (rpm -qa
+    默认输出) 忽略仓库版本的 epoch; 未写 release 时只比较 version。
+    """
+    if evr in installed:
+        return True
+    without_epoch = evr.partition(":")[2] or evr
+    if without_epoch in installed:
+        return True
+    version = without_epoch.rpartition("-")[0]
+    return bool(version) and version in installed
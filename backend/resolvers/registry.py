@@ -0,0 +1,268 @@
+import hashlib
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from backend.config import config
+from backend.metadata_cache import MetadataCache, metadata_cache
+from backend.resolvers.rpm import RPMRepodataParser
+from backend.resolvers.deb import DEBPackageParser
+from backend.resolvers.snapshot import open_snapshot, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotWriteError(Exception):
+    """解析进程无法写出索引快照 (与下载元数据的网络错误区分开)"""
+
+
+class ParserRegistry:
+    """进程内共享的已解析仓库索引
+
+    以 (类型, 镜像 URL, 架构) 为键, 指向同一镜像的发行版 (如 centos-7 与 rhel-7)
+    共用一份索引。每次获取时重新验证仓库版本, 版本变化才重新加载。
+
+    解析结果写入按版本命名的快照文件并以 mmap 打开, 进程重启或新 worker
+    启动时直接映射快照, 无需重新解析。
+
+    parse_workers > 0 时, 下载与解析元数据在独立的进程池中完成 (子进程写出
+    快照, 本进程只映射结果): 解析大仓库时占满的是其他核, 不再持有本进程的
+    GIL, API 请求与正在运行的任务不受影响。
+
+    start_refresher() 启动后台线程: 先预热配置的发行版, 之后定期重新验证所有
+    已加载的仓库。此后获取索引不再重新验证也不会等待加载, 直接返回当前索引;
+    新版本在旁边构建完成后整体替换, 已取得旧索引的任务继续使用旧索引直到结束。
+    """
+
+    def __init__(self, cache: MetadataCache = None, snapshot_dir: Path = None, parse_workers: int = 0):
+        self.cache = cache or metadata_cache
+        self.snapshot_dir = Path(snapshot_dir or config.CACHE_DIR / "index")
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        self.parse_workers = parse_workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._parsers: Dict[Tuple, object] = {}
+        # 键 -> 镜像 URL, 后台刷新时使用
+        self._sources: Dict[Tuple, str] = {}
+        self._locks: Dict[Tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._refresher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def get_rpm_parser(self, mirror_url: str) -> RPMRepodataParser:
+        """获取 (必要时加载) RPM 仓库索引"""
+        return self._get(("rpm", self._normalize(mirror_url), None), mirror_url)
+
+    def get_deb_parser(self, mirror_url: str, arch: str) -> DEBPackageParser:
+        """获取 (必要时加载) DEB 仓库索引"""
+        return self._get(("deb", self._normalize(mirror_url), arch), mirror_url)
+
+    def warm_up(self, distributions: dict):
+        """加载配置中各发行版的仓库索引 (共用镜像的发行版只加载一次), 失败的仓库跳过"""
+        targets = {}
+        for name, dist in distributions.items():
+            if dist["type"] == "rpm":
+                key = ("rpm", self._normalize(dist["baseos"]), None)
+                targets.setdefault(key, (name, dist["baseos"]))
+            else:
+                key = ("deb", self._normalize(dist["main"]), dist.get("arch", "amd64"))
+                targets.setdefault(key, (name, dist["main"]))
+
+        workers = max(1, self.parse_workers)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="index-warmup") as pool:
+            futures = {pool.submit(self._load_latest, key, url): name for key, (name, url) in targets.items()}
+            for future in as_completed(futures):
+                try:
+                    parser = future.result()
+                    logger.info(f"已预热 {futures[future]} 的仓库索引 ({len(parser.package_cache)} 个包)")
+                except Exception as e:
+                    logger.warning(f"预热 {futures[future]} 的仓库索引失败: {e}")
+
+    def refresh(self):
+        """重新验证所有已加载的仓库, 有新版本的在旁边构建后替换"""
+        for key, mirror_url in list(self._sources.items()):
+            if self._stop.is_set():
+                return
+            try:
+                self._load_latest(key, mirror_url)
+            except Exception as e:
+                logger.warning(f"刷新仓库索引失败 {mirror_url}, 继续使用当前版本: {e}")
+
+    def start_refresher(self, distributions: dict, interval: float):
+        """在后台预热 distributions 并每 interval 秒刷新一次"""
+        with self._lock:
+            if self._refresher is not None:
+                return
+            self._refresher = threading.Thread(
+                target=self._refresh_loop, args=(distributions, interval), name="index-refresh", daemon=True
+            )
+        self._refresher.start()
+
+    def shutdown(self):
+        """停止后台刷新并关闭解析进程池"""
+        self._stop.set()
+        self._reset_pool()
+
+    def _reset_pool(self):
+        """丢弃当前解析进程池, 下次解析时重新创建; 不影响后台刷新"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _create(self, key: Tuple, mirror_url: str):
+        kind, _, arch = key
+        if kind == "rpm":
+            return RPMRepodataParser(mirror_url, cache=self.cache)
+        return DEBPackageParser(mirror_url, arch=arch, cache=self.cache)
+
+    @staticmethod
+    def _load(parser):
+        if isinstance(parser, RPMRepodataParser):
+            parser.load_metadata()
+            parser.parse_packages()
+        else:
+            parser.load_packages()
+
+    def _get(self, key: Tuple, mirror_url: str):
+        if self._refresher is not None:
+            # 由后台线程负责刷新, 请求路径直接使用当前索引
+            current = self._parsers.get(key)
+            if current is not None:
+                return current
+        return self._load_latest(key, mirror_url)
+
+    def _load_latest(self, key: Tuple, mirror_url: str):
+        """重新验证仓库版本, 有变化时加载新版本并替换当前索引"""
+        with self._lock_for(key):
+            current = self._parsers.get(key)
+            parser = self._create(key, mirror_url)
+            revision = parser.probe_revision()
+            if current is not None and revision == current.revision:
+                return current
+
+            index = self._open_snapshot(key, revision)
+            if index is None and self.parse_workers > 0:
+                index, revision = self._parse_in_pool(key, mirror_url, revision)
+            if index is None:
+                self._load(parser)
+                revision = parser.revision
+                index = self._save_snapshot(key, parser.package_cache, revision)
+
+            parser.package_cache = index
+            parser.revision = revision
+            # 整体替换: 已取得旧 parser 的任务不受影响
+            self._parsers[key] = parser
+            self._sources[key] = mirror_url
+            return parser
+
+    def _refresh_loop(self, distributions: dict, interval: float):
+        self.warm_up(distributions)
+        while not self._stop.wait(interval):
+            self.refresh()
+
+    def _parse_in_pool(self, key: Tuple, mirror_url: str, revision: str):
+        """
+        在解析进程中加载仓库并写出快照, 返回 (映射的索引, 版本)
+
+        子进程无法写出快照或进程池异常退出时返回 (None, revision), 由调用方
+        退回到本进程内解析 (进程池会在下次解析时重建); 元数据本身的错误 (下载
+        失败、格式错误) 照常抛出。
+        """
+        try:
+            revision = self._parse_pool().submit(
+                _build_snapshot, key, mirror_url, self.cache.cache_dir, self.cache.ttl, self.snapshot_dir
+            ).result()
+        except BrokenProcessPool:
+            logger.warning("解析进程异常退出, 改为在本进程内解析")
+            self._reset_pool()
+            return None, revision
+        except SnapshotWriteError as e:
+            logger.warning(f"解析进程写入索引快照失败, 改为在本进程内解析: {e}")
+            return None, revision
+
+        index = self._open_snapshot(key, revision)
+        if index is not None:
+            self._prune_snapshots(key, self._snapshot_path(key, revision))
+        return index, revision
+
+    def _parse_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn: 子进程不继承本进程的线程与锁
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.parse_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    def _snapshot_path(self, key: Tuple, revision: str) -> Path:
+        return self.snapshot_dir / f"{self._snapshot_prefix(key)}-{revision[:16]}.idx"
+
+    def _snapshot_prefix(self, key: Tuple) -> str:
+        kind, url, arch = key
+        digest = hashlib.sha256(f"{url}|{arch}".encode("utf-8")).hexdigest()[:16]
+        return f"{kind}-{digest}"
+
+    def _open_snapshot(self, key: Tuple, revision: str):
+        path = self._snapshot_path(key, revision)
+        if not path.exists():
+            return None
+        try:
+            index = open_snapshot(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"忽略无法使用的索引快照 {path}: {e}")
+            return None
+        return index if index.revision == revision else None
+
+    def _save_snapshot(self, key: Tuple, index, revision: str):
+        """写入快照并改用映射版本, 同时清理该仓库的旧版本快照"""
+        path = self._snapshot_path(key, revision)
+        try:
+            write_snapshot(index, path, revision)
+            mapped = open_snapshot(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"写入索引快照失败 {path}: {e}")
+            return index
+
+        self._prune_snapshots(key, path)
+        return mapped
+
+    def _prune_snapshots(self, key: Tuple, keep: Path):
+        """清理该仓库的旧版本快照, 同时清理长期未使用的元数据缓存 (旧版本的元数据文件)"""
+        for old in self.snapshot_dir.glob(f"{self._snapshot_prefix(key)}-*.idx"):
+            if old != keep:
+                old.unlink(missing_ok=True)
+        try:
+            self.cache.prune(config.METADATA_CACHE_MAX_AGE)
+        except OSError as e:
+            logger.warning(f"清理元数据缓存失败: {e}")
+
+    def _lock_for(self, key: Tuple) -> threading.Lock:
+        with self._lock:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    @staticmethod
+    def _normalize(mirror_url: str) -> str:
+        return mirror_url.rstrip("/") + "/"
+
+
+def _build_snapshot(key: Tuple, mirror_url: str, cache_dir: Path, ttl: int, snapshot_dir: Path) -> str:
+    """在解析进程中执行: 下载并解析仓库元数据, 写出快照, 返回仓库版本"""
+    registry = ParserRegistry(MetadataCache(cache_dir, ttl=ttl), snapshot_dir)
+    parser = registry._create(key, mirror_url)
+    registry._load(parser)
+    path = registry._snapshot_path(key, parser.revision)
+    try:
+        write_snapshot(parser.package_cache, path, parser.revision)
+    except OSError as e:
+        # requests 的网络错误也是 OSError 的子类, 只有写快照的错误才退回本进程解析
+        raise SnapshotWriteError(f"{path}: {e}") from None
+    return parser.revision
+
+
+parser_registry = ParserRegistry(parse_workers=config.PARSE_WORKERS)
@@ -1,273 +1,261 @@
 import xml.etree.ElementTree as ET
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Set
 from urllib.parse import urljoin
-import requests
-import gzip
+import logging
+import threading
+
+from backend.metadata_cache import CHECKSUM_ALIASES, MetadataCache, metadata_cache, open_decompressed
+from backend.resolvers.base import BaseDependencyResolver
+from backend.resolvers.index import PackageIndex
+
+logger = logging.getLogger(__name__)
+
+REPO_NS = {"repo": "http://linux.duke.edu/metadata/repo"}
+COMMON_NS = "{http://linux.duke.edu/metadata/common}"
+RPM_NS = "{http://linux.duke.edu/metadata/rpm}"
+FILELISTS_NS = "{http://linux.duke.edu/metadata/filelists}"
+
+PACKAGE_TAG = f"{COMMON_NS}package"
+NAME_TAG = f"{COMMON_NS}name"
+ARCH_TAG = f"{COMMON_NS}arch"
+VERSION_TAG = f"{COMMON_NS}version"
+LOCATION_TAG = f"{COMMON_NS}location"
+SIZE_TAG = f"{COMMON_NS}size"
+CHECKSUM_TAG = f"{COMMON_NS}checksum"
+FORMAT_TAG = f"{COMMON_NS}format"
+REQUIRES_TAG = f"{RPM_NS}requires"
+PROVIDES_TAG = f"{RPM_NS}provides"
+FILE_TAG = f"{COMMON_NS}file"
+FILELISTS_PACKAGE_TAG = f"{FILELISTS_NS}package"
 
 
 class RPMRepodataParser:
     """RPM repodata 解析器"""
 
-    def __init__(self, mirror_url: str):
+    def __init__(self, mirror_url: str, cache: MetadataCache = None):
         self.mirror_url = mirror_url.rstrip("/") + "/"
-        self.primary_xml = None
-        self.package_cache = {}
+        self.cache = cache or metadata_cache
+        self.primary_path = None
+        self.primary_href = None
+        self.revision = None
+        self.package_cache = PackageIndex("rpm", self.mirror_url)
+        self._file_providers: Optional[Dict[str, List[str]]] = None
+        self._filelists_lock = threading.Lock()
+
+    def probe_revision(self) -> str:
+        """重新验证 repomd.xml, 返回当前仓库版本 (repomd.xml 的摘要)"""
+        return self.cache.fetch(urljoin(self.mirror_url, "repodata/repomd.xml")).revision
+
+    def _find_repodata(self, data_type: str):
+        """
+        在 repomd.xml 中查找指定类型的元数据
 
-    def load_metadata(self):
-        """加载 repomd.xml 并获取 primary.xml.gz"""
-        repomd_url = urljoin(self.mirror_url, "repodata/repomd.xml")
+        返回: (repomd 缓存条目, 文件 href, (校验算法, 摘要) 或 None)
+        """
+        repomd = self.cache.fetch(urljoin(self.mirror_url, "repodata/repomd.xml"))
 
-        response = requests.get(repomd_url, timeout=30)
-        response.raise_for_status()
+        root = ET.parse(repomd.path).getroot()
 
-        root = ET.fromstring(response.content)
+        for data_elem in root.findall(f".//repo:data[@type='{data_type}']", REPO_NS):
+            location = data_elem.find("repo:location", REPO_NS)
+            if location is None:
+                continue
 
-        # 查找 primary 数据
-        ns = {"repo": "http://linux.duke.edu/metadata/repo"}
-        primary_elements = root.findall(".//repo:data[@type='primary']", ns)
+            # 元数据文件名随内容变化, 按 repomd 中的校验值命中缓存
+            checksum = None
+            checksum_elem = data_elem.find("repo:checksum", REPO_NS)
+            if checksum_elem is not None and checksum_elem.text:
+                checksum = (checksum_elem.get("type", "sha256"), checksum_elem.text.strip())
 
-        if not primary_elements:
-            raise ValueError("Primary metadata not found in repomd.xml")
+            return repomd, location.get("href"), checksum
 
-        for primary_elem in primary_elements:
-            location = primary_elem.find("repo:location", ns)
-            if location is not None:
-                primary_path = location.get("href")
-                self.primary_xml = self._download_and_decompress(
-                    urljoin(self.mirror_url, primary_path)
-                )
-                break
+        raise ValueError(f"{data_type.capitalize()} metadata not found in repomd.xml")
 
-    def _download_and_decompress(self, url: str) -> str:
-        """下载并解压 XML 文件"""
-        response = requests.get(url, timeout=60)
-        response.raise_for_status()
+    def load_metadata(self):
+        """加载 repomd.xml 并获取 primary.xml.gz"""
+        repomd, primary_path, checksum = self._find_repodata("primary")
 
-        if url.endswith(".gz"):
-            decompressed = gzip.decompress(response.content)
-            return decompressed.decode("utf-8")
-        else:
-            return response.content.decode("utf-8")
+        primary = self.cache.fetch(urljoin(self.mirror_url, primary_path), checksum=checksum)
+        self.primary_path = primary.path
+        self.primary_href = primary_path
+        self.revision = repomd.revision
 
     def parse_packages(self):
         """解析所有包信息"""
-        if not self.primary_xml:
+        if self.primary_path is None:
             raise ValueError("Metadata not loaded. Call load_metadata() first.")
 
-        root = ET.fromstring(self.primary_xml)
-
-        ns = {
-            "common": "http://linux.duke.edu/metadata/common",
-            "rpm": "http://linux.duke.edu/metadata/rpm",
-        }
-
-        for pkg in root.findall(".//common:package", ns):
-            try:
-                name_elem = pkg.find("common:name", ns)
-                if name_elem is None:
-                    continue
+        with open_decompressed(self.primary_path, self.primary_href) as stream:
+            self.parse_stream(stream)
 
-                name = name_elem.text
-                if not name:
-                    continue
-
-                arch_elem = pkg.find("common:arch", ns)
-                arch = arch_elem.text if arch_elem is not None else "x86_64"
+    def parse_stream(self, stream: BinaryIO):
+        """
+        从 (已解压的) 二进制流增量解析 primary.xml
 
-                version_elem = pkg.find("common:version", ns)
-                version = (
-                    version_elem.get("ver") if version_elem is not None else "unknown"
-                )
+        每处理完一个 package 元素即从树中清除, 内存占用以单个元素为上限。
+        """
+        context = ET.iterparse(stream, events=("start", "end"))
+        _, root = next(context)
 
-                location_elem = pkg.find("common:location", ns)
-                if location_elem is None:
-                    continue
+        for event, elem in context:
+            if event != "end" or elem.tag != PACKAGE_TAG:
+                continue
 
-                href = location_elem.get("href")
-                url = urljoin(self.mirror_url, href)
-
-                # requires 和 provides 在 format 元素内部
-                format_elem = pkg.find("common:format", ns)
-
-                # 解析依赖
-                requires = []
-                if format_elem is not None:
-                    requires_elem = format_elem.find("rpm:requires", ns)
-                    if requires_elem is not None:
-                        for req in requires_elem.findall("rpm:entry", ns):
-                            req_name = req.get("name")
-                            if req_name and not req_name.startswith("rpmlib("):
-                                requires.append(req_name)
-
-                    # 解析 provides - 用于处理库文件依赖
-                    provides = []
-                    provides_elem = format_elem.find("rpm:provides", ns)
-                    if provides_elem is not None:
-                        for prov in provides_elem.findall("rpm:entry", ns):
-                            prov_name = prov.get("name")
-                            if prov_name:
-                                provides.append(prov_name)
-                else:
-                    provides = []
-
-                self.package_cache[name] = {
-                    "name": name,
-                    "version": version,
-                    "arch": arch,
-                    "url": url,
-                    "requires": requires,
-                    "provides": provides,
-                }
+            try:
+                pkg = self._parse_package(elem)
+                if pkg:
+                    self.package_cache.add(**pkg)
             except Exception as e:
                 # 跳过解析失败的包
-                import logging
-                logging.warning(f"Failed to parse package {name_elem.text if name_elem else 'unknown'}: {e}")
-                continue
+                logger.warning(f"Failed to parse package {elem.findtext(NAME_TAG, 'unknown')}: {e}")
+
+            root.clear()
+
+    def _parse_package(self, pkg: ET.Element):
+        """解析单个 package 元素为 PackageIndex.add 的参数, 缺少必要字段时返回 None"""
+        name = pkg.findtext(NAME_TAG)
+        if not name:
+            return None
+
+        arch = pkg.findtext(ARCH_TAG, "x86_64")
+
+        version_elem = pkg.find(VERSION_TAG)
+        version = version_elem.get("ver") if version_elem is not None else "unknown"
+        evr = version
+        if version_elem is not None:
+            release, epoch = version_elem.get("rel"), version_elem.get("epoch")
+            if release:
+                evr = f"{version}-{release}"
+            if epoch and epoch != "0":
+                evr = f"{epoch}:{evr}"
+
+        location_elem = pkg.find(LOCATION_TAG)
+        if location_elem is None:
+            return None
+
+        size_elem = pkg.find(SIZE_TAG)
+        size = int(size_elem.get("package") or 0) if size_elem is not None else 0
+
+        checksum_elem = pkg.find(CHECKSUM_TAG)
+        checksum = ""
+        if checksum_elem is not None and checksum_elem.text:
+            algo = checksum_elem.get("type", "sha256")
+            checksum = f"{CHECKSUM_ALIASES.get(algo, algo)}:{checksum_elem.text.strip()}"
+
+        # requires 和 provides 在 format 元素内部
+        requires = []
+        provides = []
+        format_elem = pkg.find(FORMAT_TAG)
+        if format_elem is not None:
+            for section in format_elem:
+                if section.tag == REQUIRES_TAG:
+                    for req in section:
+                        req_name = req.get("name")
+                        if req_name and not req_name.startswith("rpmlib("):
+                            requires.append(req_name)
+                elif section.tag == PROVIDES_TAG:
+                    # 解析 provides - 所有能力 (库、perl()/python3dist() 等)
+                    for prov in section:
+                        prov_name = prov.get("name")
+                        if prov_name:
+                            provides.append(prov_name)
+                elif section.tag == FILE_TAG and section.text:
+                    # primary.xml 已列出的常用文件 (/usr/bin, /etc 等) 作为文件能力
+                    provides.append(section.text)
+
+        return {
+            "name": name,
+            "version": version,
+            "arch": arch,
+            "location": location_elem.get("href"),
+            "size": size,
+            "requires": requires,
+            "provides": provides,
+            "checksum": checksum,
+            "evr": evr,
+        }
 
     def find_package(self, name: str):
         """查找特定包"""
         return self.package_cache.get(name)
 
-
-class RPMDependencyResolver:
-    """RPM 依赖解析器"""
-
-    def __init__(self, parser: RPMRepodataParser):
-        self.parser = parser
-        self.resolved = set()
-        # 构建 provides 映射: 库名 -> 包名
-        self.provides_map = {}
-        self._build_provides_map()
-
-    def _build_provides_map(self):
-        """构建库文件到包的映射"""
-        for pkg_name, pkg_info in self.parser.package_cache.items():
-            for prov in pkg_info.get("provides", []):
-                # 只记录库文件 (包含 .so)
-                if ".so" in prov:
-                    self.provides_map[prov] = pkg_name
-
-    def resolve(self, package_name: str) -> list:
+    def file_providers(self) -> Dict[str, List[str]]:
         """
-        递归解析包及其所有依赖
+        文件路径 -> 提供者包名, 仅包含 primary.xml 未列出的路径依赖
 
-        返回: 包列表 (包含输入包和所有依赖)
+        首次调用时流式解析 filelists.xml, 只记录仓库中确有包依赖的路径。
         """
-        import logging
-        logger = logging.getLogger(__name__)
+        with self._filelists_lock:
+            if self._file_providers is None:
+                index = self.package_cache
+                wanted = set()
+                for string_id in set(index.requires):
+                    path = index.strings[string_id]
+                    if path.startswith("/") and not index.providers_of(path):
+                        wanted.add(path)
+                self._file_providers = self._load_filelists(wanted) if wanted else {}
+            return self._file_providers
+
+    def _load_filelists(self, wanted: Set[str]) -> Dict[str, List[str]]:
+        _, href, checksum = self._find_repodata("filelists")
+        filelists = self.cache.fetch(urljoin(self.mirror_url, href), checksum=checksum)
+
+        providers = {}
+        with open_decompressed(filelists.path, href) as stream:
+            context = ET.iterparse(stream, events=("start", "end"))
+            _, root = next(context)
+
+            for event, elem in context:
+                if event != "end" or elem.tag != FILELISTS_PACKAGE_TAG:
+                    continue
 
-        if package_name in self.resolved:
-            logger.debug(f"跳过已解析的包: {package_name}")
-            return []
+                name = elem.get("name")
+                for file_elem in elem:
+                    if file_elem.text in wanted:
+                        providers.setdefault(file_elem.text, []).append(name)
+                root.clear()
 
-        pkg = self.parser.find_package(package_name)
-        if not pkg:
-            logger.debug(f"包不存在: {package_name}")
-            raise ValueError(f"Package '{package_name}' not found")
+        logger.info(f"filelists 加载完成: {len(providers)}/{len(wanted)} 个路径依赖找到提供者")
+        return providers
 
-        logger.info(f"解析包: {package_name}, 依赖数量: {len(pkg.get('requires', []))}")
-        packages = [pkg]
-        self.resolved.add(package_name)
 
-        # 递归解析依赖
-        for req in pkg.get("requires", []):
-            if not req:
-                continue
+class RPMDependencyResolver(BaseDependencyResolver):
+    """RPM 依赖解析器"""
 
-            # 跳过 rpmlib 依赖
-            if req.startswith("rpmlib("):
-                logger.debug(f"  跳过 rpmlib 依赖: {req}")
-                continue
+    def _dependencies(self, pkg):
+        """产出 (依赖项, 提供者包名), 依赖项按能力索引查找, 路径依赖回退到 filelists; 无提供者时为 None"""
+        index = self.parser.package_cache
 
-            # 跳过以 / 开头的文件路径依赖
-            # 这些通常由基础包提供,不在仓库中
-            if req.startswith("/"):
-                logger.debug(f"  跳过文件路径依赖: {req}")
+        for req in pkg.get("requires", []):
+            # 跳过 rpmlib 依赖
+            if not req or req.startswith("rpmlib("):
                 continue
 
-            logger.debug(f"  处理依赖: {req}")
-
-            # 尝试解析依赖
-            try:
-                # 首先尝试直接解析为包名
-                dep_packages = self.resolve(req)
-                packages.extend(dep_packages)
-                logger.debug(f"    ✓ 找到包: {req}")
-            except ValueError:
-                # 如果找不到包,尝试作为库文件查找
-                # 提取库名 (例如: libgpm.so.2()(64bit) -> libgpm.so.2)
-                lib_name = self._extract_lib_name(req)
-                if lib_name:
-                    logger.debug(f"    作为库文件查找: {req} -> {lib_name}")
-                    if lib_name in self.provides_map:
-                        # 找到提供这个库的包
-                        provider_pkg = self.provides_map[lib_name]
-                        logger.debug(f"    ✓ 库由以下包提供: {provider_pkg}")
-                        try:
-                            dep_packages = self.resolve(provider_pkg)
-                            packages.extend(dep_packages)
-                        except ValueError:
-                            logger.warning(f"    ✗ 提供者包不存在: {provider_pkg}")
-                            continue
-                    else:
-                        logger.debug(f"    ✗ 库不在 provides_map 中: {lib_name}")
-                        # 尝试直接查找 (可能库名稍有不同)
-                        if lib_name.split('.')[0] in self.provides_map:
-                            provider_pkg = self.provides_map[lib_name.split('.')[0]]
-                            logger.debug(f"    ✓ 使用简化库名找到: {provider_pkg}")
-                            try:
-                                dep_packages = self.resolve(provider_pkg)
-                                packages.extend(dep_packages)
-                            except ValueError:
-                                continue
-                else:
-                    logger.debug(f"    ✗ 找不到对应的包或库: {req}")
-                    # 找不到对应的包,跳过
-                    continue
-
-        return packages
-
-    def _extract_lib_name(self, req: str) -> str:
-        """
-        从依赖字符串中提取库名
-
-        例如:
-        - "libgpm.so.2()(64bit)" -> "libgpm.so.2()(64bit)"
-        - "libperl.so()(64bit)" -> "libperl.so()(64bit)"
-        - "libc.so.6(GLIBC_2.2.5)(64bit)" -> "libc.so.6()(64bit)"
-        """
-        import re
-        # 匹配库文件名，包括架构标记
-        # 例如: libgpm.so.2()(64bit) 或 libperl.so()(64bit)
-        match = re.match(r'([a-z0-9._+-]+\.so[\d.]*\(?\)?(\([A-Z0-9_]+\))?\(\d+bit\))', req)
-        if match:
-            return match.group(1)
-
-        # 如果上面不匹配，尝试简化版本：库名 + ()(64bit)
-        match = re.match(r'([a-z0-9._+-]+\.so[\d.]*)\(\)\(64bit\)', req)
-        if match:
-            base_name = match.group(1)
-            return f"{base_name}()(64bit)"
-
-        # 最后尝试：提取库名.so.版本
-        match = re.match(r'([a-z0-9._+-]+\.so[\d.]*)', req)
-        if match:
-            return match.group(1)
-
-        return None
-
-    def get_download_list(self, packages: list) -> list:
-        """
-        获取去重的下载列表
-
-        返回: 去重后的包列表
-        """
+            providers = [index.name_of(pkg_id) for pkg_id in index.providers_of(req)]
+            if not providers:
+                if req in index:
+                    providers = [req]
+                elif req.startswith("/"):
+                    providers = self.parser.file_providers().get(req, [])
+
+            yield req, self._choose_provider(req, providers)
+
+    def _choose_provider(self, req: str, providers: List[str]) -> Optional[str]:
+        """多个包提供同一能力时: 已安装的优先 (无需再引入), 其次同名包, 再次名称最短的包"""
+        if not providers:
+            return None
+        for name in providers:
+            if name in self.installed:
+                return name
+        if req in providers:
+            return req
+        return min(providers, key=lambda name: (len(name), name))
+
+    def iter_download_list(self, packages: Iterable) -> Iterator[dict]:
+        """按 url 去重"""
         seen = set()
-        download_list = []
-
         for pkg in packages:
             url = pkg.get("url")
             if url and url not in seen:
                 seen.add(url)
-                download_list.append(pkg)
-
-        return download_list
+                yield pkg
@@ -0,0 +1,295 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from backend.resolvers.index import PackageIndex, TextColumn
+
+
+MAGIC = b"PKGSNAP\x00"
+SNAPSHOT_VERSION = 4
+
+# 文件头: MAGIC + 版本号 + JSON 头长度, 之后是 JSON 头和 8 字节对齐的各数据段
+PREAMBLE = struct.Struct("<8sII")
+ALIGN = 8
+
+
+def _bisect(count: int, key_at, target) -> int:
+    """在升序序列中查找 target, 返回位置或 -1"""
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        key = key_at(mid)
+        if key < target:
+            lo = mid + 1
+        elif key > target:
+            hi = mid
+        else:
+            return mid
+    return -1
+
+
+class MappedStringTable:
+    """映射文件中的字符串表, 通过文件内的开放寻址哈希表查找"""
+
+    __slots__ = ("data", "offsets", "slots", "mask")
+
+    def __init__(self, data: memoryview, offsets: memoryview, slots: memoryview):
+        self.data = data
+        self.offsets = offsets
+        self.slots = slots
+        self.mask = len(slots) - 1
+
+    def lookup(self, value: str) -> Optional[int]:
+        raw = value.encode("utf-8")
+        pos = zlib.crc32(raw) & self.mask
+        while True:
+            slot = self.slots[pos]
+            if slot == 0:
+                return None
+            string_id = slot - 1
+            if self.data[self.offsets[string_id] : self.offsets[string_id + 1]] == raw:
+                return string_id
+            pos = (pos + 1) & self.mask
+
+    def __getitem__(self, string_id: int) -> str:
+        return str(self.data[self.offsets[string_id] : self.offsets[string_id + 1]], "utf-8")
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+
+def _hash_slots(encoded) -> array:
+    """构建字符串哈希表: 槽位保存 字符串 ID + 1, 0 表示空, 装载因子不超过 1/2"""
+    size = 1
+    while size < 2 * len(encoded):
+        size *= 2
+    mask = size - 1
+    slots = array("I", bytes(4 * size))
+    for string_id, raw in enumerate(encoded):
+        pos = zlib.crc32(raw) & mask
+        while slots[pos]:
+            pos = (pos + 1) & mask
+        slots[pos] = string_id + 1
+    return slots
+
+
+class MappedNameIndex:
+    """映射文件中的 包名 -> 包 ID 索引 (按名称字符串 ID 排序)"""
+
+    __slots__ = ("strings", "name_ids", "pkg_ids")
+
+    def __init__(self, strings: MappedStringTable, name_ids: memoryview, pkg_ids: memoryview):
+        self.strings = strings
+        self.name_ids = name_ids
+        self.pkg_ids = pkg_ids
+
+    def get(self, name: str, default=None) -> Optional[int]:
+        string_id = self.strings.lookup(name)
+        if string_id is None:
+            return default
+        pos = _bisect(len(self.name_ids), self.name_ids.__getitem__, string_id)
+        return self.pkg_ids[pos] if pos >= 0 else default
+
+    def __getitem__(self, name: str) -> int:
+        pkg_id = self.get(name)
+        if pkg_id is None:
+            raise KeyError(name)
+        return pkg_id
+
+    def __contains__(self, name) -> bool:
+        return self.get(name) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return (self.strings[string_id] for string_id in self.name_ids)
+
+    def __len__(self) -> int:
+        return len(self.name_ids)
+
+    def values(self) -> Iterator[int]:
+        return iter(self.pkg_ids)
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        return zip(self, self.pkg_ids)
+
+
+class MappedPackageIndex(PackageIndex):
+    """
+    通过 mmap 打开的只读 PackageIndex
+
+    所有列直接指向映射的页面, 打开时不做解析; 多个进程映射同一文件时
+    共享操作系统页缓存。
+    """
+
+    def __init__(self, header: dict, buffer: mmap.mmap, sections: Dict[str, memoryview]):
+        self.kind = header["kind"]
+        self.base_url = header["base_url"]
+        self.revision = header["revision"]
+        self.buffer = buffer
+
+        self.strings = MappedStringTable(
+            sections["str_data"], sections["str_offsets"], sections["str_slots"]
+        )
+        self.names = sections["names"]
+        self.arches = sections["arches"]
+        self.versions = TextColumn.__new__(TextColumn)
+        self.versions.data, self.versions.offsets = sections["ver_data"], sections["ver_offsets"]
+        self.evrs = TextColumn.__new__(TextColumn)
+        self.evrs.data, self.evrs.offsets = sections["evr_data"], sections["evr_offsets"]
+        self.locations = TextColumn.__new__(TextColumn)
+        self.locations.data, self.locations.offsets = sections["loc_data"], sections["loc_offsets"]
+        self.sizes = sections["sizes"]
+        self.checksums = TextColumn.__new__(TextColumn)
+        self.checksums.data, self.checksums.offsets = sections["chk_data"], sections["chk_offsets"]
+
+        self.requires_offsets = sections["requires_offsets"]
+        self.requires = sections["requires"]
+        self.provides_offsets = sections["provides_offsets"]
+        self.provides = sections["provides"]
+
+        self.by_name = MappedNameIndex(self.strings, sections["name_keys"], sections["name_pkgs"])
+        self.cap_keys = sections["cap_keys"]
+        self.cap_offsets = sections["cap_offsets"]
+        self.cap_pkgs = sections["cap_pkgs"]
+        self._providers = None
+        self.getters = self._rpm_getters() if self.kind == "rpm" else self._deb_getters()
+
+    def add(self, *args, **kwargs):
+        raise TypeError("MappedPackageIndex is read-only")
+
+    def providers_of(self, capability: str) -> List[int]:
+        string_id = self.strings.lookup(capability)
+        if string_id is None:
+            return []
+        pos = _bisect(len(self.cap_keys), self.cap_keys.__getitem__, string_id)
+        if pos < 0:
+            return []
+        return list(self.cap_pkgs[self.cap_offsets[pos] : self.cap_offsets[pos + 1]])
+
+    def provider_map(self) -> Dict[int, List[int]]:
+        if self._providers is None:
+            self._providers = {
+                string_id: list(self.cap_pkgs[self.cap_offsets[i] : self.cap_offsets[i + 1]])
+                for i, string_id in enumerate(self.cap_keys)
+            }
+        return self._providers
+
+
+def write_snapshot(index: PackageIndex, path: Path, revision: str):
+    """将索引序列化为快照文件 (先写临时文件再原子替换)"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    strings = index.strings
+
+    # 字符串按 UTF-8 字节序重新编号, 包名与能力索引按 ID 排序即为按名称排序
+    encoded = [strings[i].encode("utf-8") for i in range(len(strings))]
+    order = sorted(range(len(encoded)), key=encoded.__getitem__)
+    remap = array("I", bytes(4 * len(order)))
+    str_data = bytearray()
+    str_offsets = array("Q", [0])
+    for new_id, old_id in enumerate(order):
+        remap[old_id] = new_id
+        str_data += encoded[old_id]
+        str_offsets.append(len(str_data))
+    str_slots = _hash_slots([encoded[old_id] for old_id in order])
+
+    live = sorted(index.by_name.values(), key=lambda pkg_id: remap[index.names[pkg_id]])
+
+    providers: Dict[int, List[int]] = {}
+    for pkg_id in sorted(live):
+        start, end = index.provides_offsets[pkg_id], index.provides_offsets[pkg_id + 1]
+        for string_id in index.provides[start:end]:
+            providers.setdefault(remap[string_id], []).append(pkg_id)
+    cap_keys = array("I", sorted(providers))
+    cap_offsets = array("I", [0])
+    cap_pkgs = array("I")
+    for string_id in cap_keys:
+        cap_pkgs.extend(providers[string_id])
+        cap_offsets.append(len(cap_pkgs))
+
+    sections = {
+        "str_data": (str_data, "B"),
+        "str_offsets": (str_offsets, "Q"),
+        "str_slots": (str_slots, "I"),
+        "names": (array("I", (remap[i] for i in index.names)), "I"),
+        "arches": (array("I", (remap[i] for i in index.arches)), "I"),
+        "ver_data": (index.versions.data, "B"),
+        "ver_offsets": (index.versions.offsets, "Q"),
+        "evr_data": (index.evrs.data, "B"),
+        "evr_offsets": (index.evrs.offsets, "Q"),
+        "loc_data": (index.locations.data, "B"),
+        "loc_offsets": (index.locations.offsets, "Q"),
+        "sizes": (index.sizes, "Q"),
+        "chk_data": (index.checksums.data, "B"),
+        "chk_offsets": (index.checksums.offsets, "Q"),
+        "requires_offsets": (index.requires_offsets, "I"),
+        "requires": (array("I", (remap[i] for i in index.requires)), "I"),
+        "provides_offsets": (index.provides_offsets, "I"),
+        "provides": (array("I", (remap[i] for i in index.provides)), "I"),
+        "name_keys": (array("I", (remap[index.names[pkg_id]] for pkg_id in live)), "I"),
+        "name_pkgs": (array("I", live), "I"),
+        "cap_keys": (cap_keys, "I"),
+        "cap_offsets": (cap_offsets, "I"),
+        "cap_pkgs": (cap_pkgs, "I"),
+    }
+
+    layout = {}
+    position = 0
+    for name, (data, typecode) in sections.items():
+        length = len(memoryview(data).cast("B"))
+        layout[name] = [position, length, typecode]
+        position += length + (-length % ALIGN)
+
+    header = json.dumps(
+        {
+            "kind": index.kind,
+            "base_url": index.base_url,
+            "revision": revision,
+            "byteorder": sys.byteorder,
+            "sections": layout,
+        }
+    ).encode("utf-8")
+
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(PREAMBLE.pack(MAGIC, SNAPSHOT_VERSION, len(header)))
+            f.write(header)
+            f.write(b"\0" * (-(PREAMBLE.size + len(header)) % ALIGN))
+            for data, _ in sections.values():
+                raw = memoryview(data).cast("B")
+                f.write(raw)
+                f.write(b"\0" * (-len(raw) % ALIGN))
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def open_snapshot(path: Path) -> MappedPackageIndex:
+    """以 mmap 打开快照文件; 格式或版本不匹配时抛出 ValueError"""
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, header_len = PREAMBLE.unpack_from(buffer, 0)
+    if magic != MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot format: {path}")
+
+    header = json.loads(buffer[PREAMBLE.size : PREAMBLE.size + header_len])
+    if header["byteorder"] != sys.byteorder:
+        raise ValueError(f"Snapshot byte order mismatch: {path}")
+
+    data_start = PREAMBLE.size + header_len
+    data_start += -data_start % ALIGN
+    view = memoryview(buffer)
+    sections = {}
+    for name, (offset, length, typecode) in header["sections"].items():
+        start = data_start + offset
+        sections[name] = view[start : start + length].cast(typecode)
+
+    return MappedPackageIndex(header, buffer, sections)
@@ -0,0 +1,155 @@
+import heapq
+import itertools
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from backend.config import config
+from backend.events import task_events
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """排队任务数已达上限"""
+
+
+@dataclass(order=True)
+class Job:
+    """排队中的下载任务; 按 (优先级降序, 提交顺序) 排序"""
+
+    sort_key: tuple
+    task_id: str = field(compare=False)
+    client: str = field(compare=False)
+    priority: int = field(compare=False)
+    run: Callable[[], None] = field(compare=False)
+
+
+class DownloadScheduler:
+    """
+    全局下载调度器
+
+    同时运行的任务数不超过 concurrency (运行时可调), 其余任务排队:
+    优先级高的先启动; 同一优先级下在各客户端之间轮转, 每个客户端内部按提交顺序,
+    避免单个客户端的突发请求占满所有槽位。
+
+    排队任务数不超过 max_queued, 队列满时拒绝提交, 过载时请求快速失败而不是
+    无限堆积。
+    """
+
+    def __init__(self, concurrency: int, max_queued: int = 0):
+        self.concurrency = concurrency
+        self.max_queued = max_queued  # 0 表示不限
+        self._queues: Dict[str, List[Job]] = {}
+        # 客户端 -> 最近一次被调度的序号, 用于同优先级下的轮转
+        self._last_served: Dict[str, int] = {}
+        self._running: Dict[str, Job] = {}
+        self._seq = itertools.count()
+        self._served = 0
+        self._lock = threading.Lock()
+
+    def submit(self, task_id: str, run: Callable[[], None], client: str = "", priority: int = 0):
+        """提交任务, 有空闲槽位时立即在新线程中启动; 队列已满时抛出 QueueFull"""
+        job = Job((-priority, next(self._seq)), task_id, client, priority, run)
+        with self._lock:
+            if self.max_queued and len(self._running) >= self.concurrency and self._queued() >= self.max_queued:
+                raise QueueFull(f"排队任务已达上限 ({self.max_queued})")
+            heapq.heappush(self._queues.setdefault(client, []), job)
+            self._pump()
+            self._publish_positions()
+
+    def cancel(self, task_id: str) -> bool:
+        """移除排队中的任务, 已开始运行的任务不受影响"""
+        with self._lock:
+            for client, queue in self._queues.items():
+                for i, job in enumerate(queue):
+                    if job.task_id == task_id:
+                        queue.pop(i)
+                        heapq.heapify(queue)
+                        if not queue:
+                            del self._queues[client]
+                        self._publish_positions()
+                        return True
+        return False
+
+    def set_concurrency(self, concurrency: int):
+        """调整并发槽位数; 调小时已运行的任务继续, 新任务等待槽位释放"""
+        with self._lock:
+            self.concurrency = concurrency
+            self._pump()
+            self._publish_positions()
+
+    def position(self, task_id: str) -> Optional[int]:
+        """排队位置 (从 1 开始), 不在队列中返回 None"""
+        with self._lock:
+            for position, job in enumerate(self._dispatch_order(), 1):
+                if job.task_id == task_id:
+                    return position
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "concurrency": self.concurrency,
+                "running": len(self._running),
+                "queued": self._queued(),
+                "max_queued": self.max_queued,
+                "clients": len(self._queues),
+            }
+
+    def _queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _pump(self):
+        """在持有锁时调用: 按调度顺序启动任务直到占满槽位"""
+        while len(self._running) < self.concurrency and self._queues:
+            client = self._next_client(self._queues, self._last_served)
+            job = heapq.heappop(self._queues[client])
+            if not self._queues[client]:
+                del self._queues[client]
+            self._served += 1
+            self._last_served[client] = self._served
+            self._running[job.task_id] = job
+            threading.Thread(target=self._run, args=(job,), name=f"task-{job.task_id}", daemon=True).start()
+
+    def _run(self, job: Job):
+        try:
+            job.run()
+        except Exception:
+            logger.exception(f"任务 {job.task_id} 异常退出")
+        finally:
+            with self._lock:
+                self._running.pop(job.task_id, None)
+                self._pump()
+                self._publish_positions()
+
+    def _publish_positions(self):
+        """在持有锁时调用: 队列变化后推送各排队任务的新位置 (无订阅者时跳过)"""
+        if not task_events.has_subscribers():
+            return
+        for position, job in enumerate(self._dispatch_order(), 1):
+            task_events.publish(job.task_id, {"queue_position": position})
+
+    @staticmethod
+    def _next_client(queues: Dict[str, List[Job]], last_served: Dict[str, int]) -> str:
+        """队首优先级最高的客户端; 同优先级时选最久未被调度的"""
+        return min(queues, key=lambda client: (queues[client][0].sort_key[0], last_served.get(client, 0)))
+
+    def _dispatch_order(self) -> List[Job]:
+        """在副本上模拟调度, 得到排队任务的启动顺序"""
+        queues = {client: list(queue) for client, queue in self._queues.items()}
+        last_served = dict(self._last_served)
+        served = self._served
+        order = []
+        while queues:
+            client = self._next_client(queues, last_served)
+            order.append(heapq.heappop(queues[client]))
+            if not queues[client]:
+                del queues[client]
+            served += 1
+            last_served[client] = served
+        return order
+
+
+download_scheduler = DownloadScheduler(config.MAX_CONCURRENT_DOWNLOADS, config.MAX_QUEUED_TASKS)
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    合并相同 key 的并发调用
+
+    第一个调用者执行 fn, 执行期间到达的相同 key 调用等待并共享其结果 (或异常),
+    不重复发起请求。执行结束后 key 即被移除, 之后的调用重新执行。
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def do(
+        self, key: Hashable, fn: Callable[[], Any], retry_on_error: bool = False
+    ) -> Tuple[Any, bool]:
+        """
+        返回 (结果, 是否共享了其他调用者的结果)
+
+        retry_on_error: 执行者失败时等待者不共享异常, 而是自己重新执行
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                else:
+                    self.shared += 1
+
+            if leader:
+                break
+
+            call.event.wait()
+            if call.error is None:
+                return call.result, True
+            if not retry_on_error:
+                raise call.error
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result, False
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight 的 asyncio 版本, 只能在同一个事件循环中使用
+
+    执行者所在的任务被取消 (例如其所属下载任务放弃) 时, 等待者自身并未被取消,
+    此时不共享取消, 而是由等待者重新执行。
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.shared = 0
+
+    async def do(
+        self, key: Hashable, fn: Callable[[], Awaitable], retry_on_error: bool = False
+    ) -> Tuple[Any, bool]:
+        while True:
+            future = self._calls.get(key)
+            if future is None:
+                break
+            self.shared += 1
+            try:
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                # 等待者自己被取消时照常抛出; 只是执行者被取消时重新执行
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+            except Exception:
+                if not retry_on_error:
+                    raise
+
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            del self._calls[key]
+        return result, False
+
+
+# 元数据加载与包下载共用的进行中请求表
+inflight = SingleFlight()
@@ -1,19 +1,75 @@
+import json
 import uuid
+import sqlite3
 import threading
 from datetime import datetime
-from typing import Dict, Optional
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 from backend.models import TaskStatus, PackageRequest
 from backend.config import config
+from backend.events import task_events
+
+# 进入这些状态后任务不再更新
+TERMINAL_STATUSES = ("completed", "failed")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    status TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_created ON tasks (created_at, task_id);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, created_at, task_id);
+"""
+
+
+class TaskAbandoned(Exception):
+    """任务已不由本进程更新 (被删除, 或租约丢失后由其他 worker 接管)"""
 
 
 class TaskManager:
-    """任务管理器"""
+    """
+    任务管理器
+
+    任务持久化在 SQLite (WAL 模式) 中, 按 created_at 与 status 建索引, 列表按
+    (created_at, task_id) 游标分页, 开销与历史任务数无关。
 
-    def __init__(self):
+    未结束的任务同时保存在内存 (tasks) 中: 进度更新只修改内存并标记为脏, 由后台
+    线程每 flush_interval 秒批量写入; 创建任务与进入终态时立即写入, 写入后终态
+    任务移出内存。
+
+    任务的每次变化同时发布到 task_events, 供 SSE 连接推送给前端。
+
+    使用共享任务队列时, API 进程与 worker 进程共用同一个数据库: API 进程创建
+    任务后 detach(), 由认领任务的 worker attach() 后更新; 此时不能在启动时把
+    未结束的任务判为中断 (recover=False), 中断的任务由队列租约过期后重新认领。
+    """
+
+    def __init__(self, db_path=":memory:", flush_interval: float = None, recover: bool = True):
+        # 未结束 (或尚未写入) 的任务
         self.tasks: Dict[str, TaskStatus] = {}
         self.lock = threading.Lock()
         self.active_downloads = 0
+        self.flush_interval = config.TASK_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self._dirty = set()
+        # attach() 载入的任务: 落盘时只更新已有的行, 不会写回已被其他进程删除的任务
+        self._attached = set()
+
+        if str(db_path) != ":memory:":
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        # 保证写入顺序与快照顺序一致: 先取得该锁, 再在 lock 下取快照
+        self._db_lock = threading.Lock()
+        if recover:
+            self._recover_interrupted()
+
+        self._stop = threading.Event()
+        threading.Thread(target=self._flush_loop, name="task-flush", daemon=True).start()
 
     def create_task(self, request: PackageRequest) -> TaskStatus:
         """创建新任务"""
@@ -28,33 +84,169 @@ class TaskManager:
             system_type=request.system_type,
             distribution=request.distribution,
             arch=request.arch,
+            bundle_format=request.bundle_format or config.BUNDLE_FORMAT,
             created_at=datetime.now().isoformat(),
         )
 
         with self.lock:
             self.tasks[task_id] = task
+            self._dirty.add(task_id)
+        self.flush()
+        task_events.publish(task_id, task.model_dump())
 
         return task
 
     def get_task(self, task_id: str) -> Optional[TaskStatus]:
         """获取任务"""
-        return self.tasks.get(task_id)
+        task = self.tasks.get(task_id)
+        if task is not None:
+            return task
+        with self._db_lock:
+            row = self._db.execute("SELECT data FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return TaskStatus.model_validate_json(row[0]) if row else None
 
     def update_task(self, task_id: str, **kwargs):
-        """更新任务状态"""
+        """更新任务状态 (写入内存, 终态立即落盘, 其余由后台线程批量落盘)"""
+        with self.lock:
+            task = self.tasks.get(task_id)
+            if task is None:
+                return
+            delta = {key: value for key, value in kwargs.items() if hasattr(task, key)}
+            for key, value in delta.items():
+                setattr(task, key, value)
+            self._dirty.add(task_id)
+            terminal = task.status in TERMINAL_STATUSES
+            # 在锁内发布, 保证订阅者看到的顺序与状态变化顺序一致
+            task_events.publish(task_id, delta)
+
+        if terminal:
+            self.flush()
+
+    def attach(self, task_id: str) -> Optional[TaskStatus]:
+        """把其他进程创建的任务载入内存, 之后由本进程更新"""
+        task = self.get_task(task_id)
+        if task is None:
+            return None
         with self.lock:
-            if task_id in self.tasks:
-                task = self.tasks[task_id]
-                for key, value in kwargs.items():
-                    if hasattr(task, key):
-                        setattr(task, key, value)
-
-    def list_tasks(self, limit: int = 50) -> list:
-        """列出任务"""
+            self._attached.add(task_id)
+            return self.tasks.setdefault(task_id, task)
+
+    def detach(self, task_id: str):
+        """写入数据库后移出内存, 任务交由其他进程更新"""
+        self.flush()
         with self.lock:
-            tasks = list(self.tasks.values())
-            tasks.sort(key=lambda t: t.created_at, reverse=True)
-            return tasks[:limit]
+            if task_id not in self._dirty:
+                self.tasks.pop(task_id, None)
+                self._attached.discard(task_id)
+
+    def abandon(self, task_id: str):
+        """租约丢失时调用: 丢弃内存中的任务且不写入数据库, 之后本进程的更新为空操作"""
+        with self._db_lock:
+            with self.lock:
+                self.tasks.pop(task_id, None)
+                self._dirty.discard(task_id)
+                self._attached.discard(task_id)
+
+    def owns(self, task_id: str) -> bool:
+        """任务是否仍由本进程更新"""
+        return task_id in self.tasks
+
+    def watch_external(self, interval: float = None):
+        """
+        跟踪其他进程 (worker) 写入的任务变化并发布到 task_events
+
+        只在有订阅者时定期读取未结束及被订阅的任务, 与上次读到的内容比较后
+        发布变化的字段; 延迟约为 worker 的落盘间隔加上 interval。
+        """
+        interval = self.flush_interval if interval is None else interval
+        threading.Thread(target=self._watch_loop, args=(interval,), name="task-watch", daemon=True).start()
+
+    def delete_task(self, task_id: str) -> bool:
+        with self._db_lock:
+            with self.lock:
+                self.tasks.pop(task_id, None)
+                self._dirty.discard(task_id)
+                self._attached.discard(task_id)
+            with self._db:
+                cursor = self._db.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+        task_events.publish(task_id, {"deleted": True})
+        return cursor.rowcount > 0
+
+    def list_tasks(
+        self, limit: int = 50, before: Optional[Tuple[str, str]] = None, status: Optional[str] = None
+    ) -> List[TaskStatus]:
+        """
+        按创建时间倒序列出任务
+
+        before: 上一页最后一个任务的 (created_at, task_id), 返回其后的任务
+        """
+        conditions, params = [], []
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if before:
+            conditions.append("(created_at, task_id) < (?, ?)")
+            params.extend(before)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        # 新建任务已立即写入; 尚未落盘的进度变化由下方内存中的对象补上
+        with self._db_lock:
+            rows = self._db.execute(
+                f"SELECT task_id, data FROM tasks {where} "
+                "ORDER BY created_at DESC, task_id DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+
+        # 内存中的任务对象与存储内容一致, 直接复用
+        return [self.tasks.get(task_id) or TaskStatus.model_validate_json(data) for task_id, data in rows]
+
+    def count(self) -> int:
+        with self._db_lock:
+            return self._db.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def flush(self):
+        """把内存中的脏任务写入数据库, 已结束的任务写入后移出内存"""
+        with self._db_lock:
+            with self.lock:
+                if not self._dirty:
+                    return
+                rows = [
+                    (task_id, task.created_at, task.status, task.model_dump_json())
+                    for task_id, task in ((task_id, self.tasks.get(task_id)) for task_id in self._dirty)
+                    if task is not None
+                ]
+                self._dirty.clear()
+
+                attached = self._attached.copy()
+
+            deleted = []
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO tasks (task_id, created_at, status, data) VALUES (?, ?, ?, ?)",
+                    [row for row in rows if row[0] not in attached],
+                )
+                for task_id, _, status, data in rows:
+                    if task_id in attached:
+                        cursor = self._db.execute(
+                            "UPDATE tasks SET status = ?, data = ? WHERE task_id = ?", (status, data, task_id)
+                        )
+                        if cursor.rowcount == 0:
+                            deleted.append(task_id)
+
+            with self.lock:
+                for task_id, _, status, _ in rows:
+                    if status in TERMINAL_STATUSES and task_id not in self._dirty:
+                        self.tasks.pop(task_id, None)
+                        self._attached.discard(task_id)
+                # 已被 API 进程删除的任务: 不再由本进程更新 (owns() 随之为 False)
+                for task_id in deleted:
+                    self.tasks.pop(task_id, None)
+                    self._dirty.discard(task_id)
+                    self._attached.discard(task_id)
+
+    def close(self):
+        self._stop.set()
+        self.flush()
 
     def can_start_download(self) -> bool:
         """检查是否可以开始新下载"""
@@ -71,5 +263,57 @@ class TaskManager:
         with self.lock:
             self.active_downloads -= 1
 
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def _watch_loop(self, interval: float):
+        seen: Dict[str, dict] = {}
+        while not self._stop.wait(interval):
+            if not task_events.has_subscribers():
+                seen.clear()
+                continue
+
+            subscribed = task_events.subscribed_tasks()
+            ids = list(seen.keys() | subscribed)
+            with self._db_lock:
+                rows = self._db.execute(
+                    "SELECT task_id, data FROM tasks WHERE status IN ('pending', 'running') "
+                    f"OR task_id IN ({','.join('?' * len(ids))})",
+                    ids,
+                ).fetchall()
+
+            current = {}
+            for task_id, data in rows:
+                data = json.loads(data)
+                old = seen.get(task_id)
+                # 第一次读到的任务发布全部字段, 订阅者据此补上快照之后的变化
+                delta = data if old is None else {k: v for k, v in data.items() if old.get(k) != v}
+                if delta:
+                    task_events.publish(task_id, delta)
+                if data["status"] not in TERMINAL_STATUSES or task_id in subscribed:
+                    current[task_id] = data
+            for task_id in seen.keys() - {task_id for task_id, _ in rows}:
+                task_events.publish(task_id, {"deleted": True})
+            seen = current
+
+    def _recover_interrupted(self):
+        """上次进程退出时未结束的任务已无法继续, 标记为失败"""
+        rows = self._db.execute(
+            "SELECT data FROM tasks WHERE status IN ('pending', 'running')"
+        ).fetchall()
+        if not rows:
+            return
+        with self._db:
+            for (data,) in rows:
+                task = TaskStatus.model_validate_json(data)
+                task.status = "failed"
+                task.message = task.error = "服务重启, 任务已中断"
+                self._db.execute(
+                    "UPDATE tasks SET status = ?, data = ? WHERE task_id = ?",
+                    (task.status, task.model_dump_json(), task.task_id),
+                )
+
 
-task_manager = TaskManager()
+# 使用共享任务队列时, 未结束的任务由队列负责恢复
+task_manager = TaskManager(config.TASK_DB_PATH, recover=not config.JOB_QUEUE)
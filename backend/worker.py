@@ -0,0 +1,171 @@
+"""
+下载任务 worker
+
+从共享任务队列 (JOB_QUEUE) 认领任务并执行, 可在同一主机上启动多个进程;
+API 进程只负责创建任务与查询状态, 与 worker 共用 DOWNLOAD_DIR 与 TASK_DB_PATH。
+队列与任务数据库是 WAL 模式的 SQLite, 必须位于本机磁盘 (不能是 NFS 等网络
+文件系统), 因此 worker 不能部署到其他主机。
+
+用法: JOB_QUEUE=sqlite:////var/lib/package-dep/jobs.db python -m backend.worker [--concurrency N]
+"""
+
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+from typing import Callable, Dict
+
+from backend.config import config
+from backend.jobs import ClaimedJob, JobQueue, create_job_queue
+from backend.models import PackageRequest
+from backend.resolvers.registry import parser_registry
+from backend.task_manager import task_manager
+
+logger = logging.getLogger(__name__)
+
+# 队列为空或槽位已满时, 再次尝试认领前的等待时间 (秒)
+POLL_INTERVAL = 1.0
+
+
+def run_job(task_id: str, request: PackageRequest):
+    """执行一个下载任务 (与单进程模式下 API 进程执行的逻辑相同)"""
+    from backend.api_routes import run_download_task
+
+    run_download_task(task_id, request)
+
+
+class Worker:
+    """
+    认领并执行任务的 worker
+
+    同时执行的任务数不超过 concurrency; 执行期间每 lease/3 秒为所有任务续租。
+    worker 崩溃或停顿时租约过期, 任务由其他 worker 重新认领并从头执行 (已下载
+    的包在共享包仓库中, 不会重复下载); 认领次数超过 JOB_MAX_ATTEMPTS 的任务
+    标记为失败。原 worker 恢复后续租时得知租约已丢失, 随即放弃该任务: 不再写入
+    任务状态, 也不再提交新的下载。
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        worker_id: str = None,
+        concurrency: int = None,
+        lease: float = None,
+        run: Callable[[str, PackageRequest], None] = run_job,
+        poll_interval: float = POLL_INTERVAL,
+    ):
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.concurrency = concurrency or config.MAX_CONCURRENT_DOWNLOADS
+        self.lease = lease or config.JOB_LEASE_SECONDS
+        self.run = run
+        self.poll_interval = poll_interval
+        self._running: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def serve(self):
+        """认领并执行任务直到 stop(); 返回前等待正在执行的任务结束"""
+        finished = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat_loop, args=(finished,), name="worker-heartbeat", daemon=True
+        )
+        heartbeat.start()
+        logger.info(f"worker {self.worker_id} 已启动, 并发 {self.concurrency}")
+
+        try:
+            while not self._stop.is_set():
+                if self.active() >= self.concurrency or not self._claim_one():
+                    self._stop.wait(self.poll_interval)
+
+            with self._lock:
+                threads = list(self._running.values())
+            for thread in threads:
+                thread.join()
+        finally:
+            finished.set()
+            heartbeat.join()
+
+    def stop(self):
+        self._stop.set()
+
+    def active(self) -> int:
+        with self._lock:
+            return len(self._running)
+
+    def _claim_one(self) -> bool:
+        job = self.queue.claim(self.worker_id, self.lease)
+        if job is None:
+            return False
+        thread = threading.Thread(target=self._execute, args=(job,), name=f"task-{job.task_id}", daemon=True)
+        with self._lock:
+            self._running[job.task_id] = thread
+        thread.start()
+        return True
+
+    def _execute(self, job: ClaimedJob):
+        try:
+            # 任务由 API 进程创建, 载入内存后才能由本进程更新; 已删除的任务直接丢弃
+            if task_manager.attach(job.task_id) is None:
+                return
+            if job.attempts > config.JOB_MAX_ATTEMPTS:
+                message = f"任务已中断 {job.attempts - 1} 次, 不再重试"
+                task_manager.update_task(job.task_id, status="failed", message=message, error=message)
+                return
+            if job.attempts > 1:
+                logger.warning(f"重新执行中断的任务 {job.task_id} (第 {job.attempts} 次)")
+            self.run(job.task_id, PackageRequest.model_validate_json(job.payload))
+        except Exception:
+            logger.exception(f"任务 {job.task_id} 异常退出")
+        finally:
+            self.queue.complete(job.task_id, self.worker_id)
+            with self._lock:
+                self._running.pop(job.task_id, None)
+
+    def _heartbeat_loop(self, finished: threading.Event):
+        while not finished.wait(self.lease / 3):
+            with self._lock:
+                task_ids = list(self._running)
+            if not task_ids:
+                continue
+            try:
+                lost = self.queue.heartbeat(self.worker_id, task_ids, self.lease)
+            except Exception:
+                logger.exception("续租失败")
+                continue
+            for task_id in lost:
+                logger.warning(f"任务 {task_id} 的租约已丢失 (已由其他 worker 认领或已删除), 放弃执行")
+                task_manager.abandon(task_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="下载任务 worker")
+    parser.add_argument(
+        "--concurrency", type=int, default=config.MAX_CONCURRENT_DOWNLOADS, help="同时执行的任务数"
+    )
+    parser.add_argument("--id", dest="worker_id", help="worker 标识, 默认为 主机名-进程号")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    queue = create_job_queue()
+    if queue is None:
+        parser.error("未配置 JOB_QUEUE")
+
+    if config.INDEX_REFRESH_INTERVAL > 0:
+        parser_registry.start_refresher(config.DISTRIBUTIONS, config.INDEX_REFRESH_INTERVAL)
+
+    worker = Worker(queue, worker_id=args.worker_id, concurrency=args.concurrency)
+    # 收到 SIGTERM/SIGINT 后不再认领新任务, 等待正在执行的任务完成
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: worker.stop())
+    try:
+        worker.serve()
+    finally:
+        parser_registry.shutdown()
+        task_manager.close()
+
+
+if __name__ == "__main__":
+    main()
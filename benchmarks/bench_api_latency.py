@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+解析大仓库期间的 API 延迟: 在任务线程内解析 vs 在解析进程中解析
+
+在本进程中启动服务 (uvicorn), 从本地镜像加载一个合成的大仓库, 加载期间持续
+请求 /api/health 并统计响应延迟; 同时列出空闲时的延迟作为基准。
+
+用法: python -m benchmarks.bench_api_latency [包数量]
+"""
+
+import asyncio
+import gzip
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import aiohttp
+import uvicorn
+
+from backend.app import app
+from backend.config import config
+from backend.metadata_cache import MetadataCache
+from backend.resolvers.registry import ParserRegistry
+from benchmarks.bench_rpm_parser import generate_primary
+from benchmarks.local_mirror import LocalMirror
+
+REPOMD = b"""<?xml version="1.0" encoding="UTF-8"?>
+<repomd xmlns="http://linux.duke.edu/metadata/repo">
+  <data type="primary"><location href="repodata/primary.xml.gz"/></data>
+</repomd>
+"""
+
+
+def start_server() -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+async def probe(api_url: str, running) -> list:
+    """持续请求健康检查接口, 返回各次延迟 (毫秒)"""
+    latencies = []
+    async with aiohttp.ClientSession() as session:
+        while running():
+            start = time.perf_counter()
+            async with session.get(f"{api_url}/api/health") as response:
+                await response.read()
+            latencies.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(0.01)
+    return latencies
+
+
+def measure(api_url: str, load=None, duration: float = 2.0):
+    """load 为 None 时测量空闲延迟, 否则在后台线程执行 load 期间测量"""
+    if load is None:
+        deadline = time.monotonic() + duration
+        return asyncio.run(probe(api_url, lambda: time.monotonic() < deadline)), 0.0
+
+    worker = threading.Thread(target=load)
+    start = time.perf_counter()
+    worker.start()
+    latencies = asyncio.run(probe(api_url, worker.is_alive))
+    worker.join()
+    return latencies, time.perf_counter() - start
+
+
+def report(name: str, latencies: list, elapsed: float):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"  {name:<16} 请求 {len(latencies):5d}  p50 {statistics.median(latencies):7.1f} ms"
+        f"  p99 {p99:8.1f} ms  max {latencies[-1]:8.1f} ms"
+        + (f"  加载 {elapsed:6.2f} s" if elapsed else "")
+    )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    files = {
+        "/os/repodata/repomd.xml": REPOMD,
+        "/os/repodata/primary.xml.gz": gzip.compress(generate_primary(count)),
+    }
+    print(f"合成仓库: {count} 个包")
+
+    # 只测量下方显式触发的加载, 不做启动预热
+    config.INDEX_REFRESH_INTERVAL = 0
+    api_url = start_server()
+    with LocalMirror(files) as mirror, tempfile.TemporaryDirectory() as tmp:
+        report("空闲", *measure(api_url))
+        for name, workers in (("任务线程内解析", 0), ("解析进程", 1)):
+            workdir = Path(tmp) / name
+            registry = ParserRegistry(
+                MetadataCache(workdir / "meta"), snapshot_dir=workdir / "index", parse_workers=workers
+            )
+            try:
+                report(name, *measure(api_url, lambda: registry.get_rpm_parser(f"{mirror.url}/os/")))
+            finally:
+                registry.shutdown()
+
+
+if __name__ == "__main__":
+    main()
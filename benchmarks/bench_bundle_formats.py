@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+打包格式对比: 打包耗时与文件大小
+
+默认对一个已完成任务的包目录打包 (真实的 .rpm/.deb); 不指定目录时生成合成
+数据: 大部分为随机字节 (模拟已压缩的包内容), 少量为可压缩的文本。
+旧实现 (tarfile "w:gz", 单线程) 作为基准一并列出。tar.zst 需要安装可选依赖
+zstandard (pip install zstandard), 未安装时跳过。
+
+用法: [BUNDLE_COMPRESS_THREADS=N] python -m benchmarks.bench_bundle_formats [包目录]
+"""
+
+import argparse
+import os
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+
+from backend.archive import LiveArchive, create_compressor
+
+
+def pack_tarfile_gz(files, output: Path):
+    with tarfile.open(output, "w:gz") as tar:
+        for path in files:
+            tar.add(path, arcname=f"packages/{path.name}")
+
+
+def pack_live(bundle_format):
+    def pack(files, output: Path):
+        archive = LiveArchive(output, ["packages"], create_compressor(bundle_format))
+        for path in files:
+            archive.add(path, f"packages/{path.name}")
+        archive.close()
+
+    return pack
+
+
+def synthesize(workdir: Path, count=100, size_kb=2048):
+    files = []
+    for i in range(count):
+        path = workdir / f"pkg{i}.rpm"
+        payload = os.urandom(size_kb * 1024 * 9 // 10)
+        header = (f"name: pkg{i}\nrequires: glibc libssl.so.1.1()(64bit)\n" * 2000).encode()
+        path.write_bytes(header[: size_kb * 1024 // 10] + payload)
+        files.append(path)
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs="?", help="包目录, 例如 downloads/<task_id>/packages")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        if args.directory:
+            files = sorted(path for path in Path(args.directory).iterdir() if path.is_file())
+        else:
+            files = synthesize(workdir)
+        total = sum(path.stat().st_size for path in files)
+        print(f"{len(files)} 个包, 共 {total / 1024 / 1024:.1f} MB")
+
+        formats = [
+            ("tarfile w:gz (旧实现)", "tar.gz", pack_tarfile_gz),
+            ("tar", "tar", pack_live("tar")),
+            ("tar.gz (并行)", "tar.gz", pack_live("tar.gz")),
+        ]
+        try:
+            create_compressor("tar.zst")
+            formats.append(("tar.zst", "tar.zst", pack_live("tar.zst")))
+        except ValueError as e:
+            print(f"跳过 tar.zst: {e} (pip install zstandard)")
+
+        for name, suffix, pack in formats:
+            output = workdir / f"bundle.{suffix}"
+            start = time.perf_counter()
+            pack(files, output)
+            elapsed = time.perf_counter() - start
+            size = output.stat().st_size
+            print(
+                f"  {name:<22} {elapsed:6.2f} s  {total / elapsed / 1024 / 1024:8.1f} MB/s"
+                f"  {size / 1024 / 1024:8.1f} MB ({size / total:6.1%})"
+            )
+            output.unlink()
+
+
+if __name__ == "__main__":
+    main()
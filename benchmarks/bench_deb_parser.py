@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Packages 解析性能对比: 整体解压 + 按行切分 vs 流式段落解析 (gz / xz)
+
+用法: python -m benchmarks.bench_deb_parser [包数量]
+"""
+
+import gzip
+import lzma
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from backend.resolvers.deb import DEBPackageParser
+from backend.metadata_cache import open_decompressed
+
+
+def generate_packages(count: int) -> bytes:
+    """生成包含 count 个包的合成 Packages 文件, Description 较长"""
+    parts = []
+    for i in range(count):
+        description = "".join(f" Long description line {j} of package {i}.\n" for j in range(30))
+        parts.append(
+            f"Package: pkg{i}\n"
+            "Architecture: amd64\n"
+            f"Version: 1.{i}-1\n"
+            "Priority: optional\n"
+            "Section: utils\n"
+            "Maintainer: Synthetic <synthetic@example.com>\n"
+            f"Installed-Size: {i % 1000}\n"
+            f"Depends: libc6 (>= 2.34), pkg{(i + 1) % count}, pkg{(i + 7) % count} | pkg{(i + 3) % count}\n"
+            f"Filename: pool/main/p/pkg{i}/pkg{i}_1.{i}-1_amd64.deb\n"
+            f"Size: {10000 + i}\n"
+            f"MD5sum: {i:032x}\n"
+            f"SHA256: {i:064x}\n"
+            f"Description: synthetic package {i}\n{description}\n"
+        )
+    return "".join(parts).encode("utf-8")
+
+
+def legacy_parse(path: Path) -> int:
+    """旧实现: 整体解压为字符串, 按行切分, 续行通过 list(keys())[-1] 定位字段"""
+    text = gzip.decompress(path.read_bytes()).decode("utf-8")
+    package_cache = {}
+    current_package = {}
+
+    for line in text.split("\n"):
+        if line.strip() == "":
+            if current_package and "Package" in current_package:
+                package_cache[current_package["Package"]] = current_package
+                current_package = {}
+        elif line.startswith(" "):
+            if current_package:
+                last_key = list(current_package.keys())[-1]
+                current_package[last_key] += "\n" + line.strip()
+        elif ":" in line:
+            key, value = line.split(":", 1)
+            current_package[key.strip()] = value.strip()
+    return len(package_cache)
+
+
+def streaming_parse(path: Path) -> int:
+    parser = DEBPackageParser("http://example.com/debian/dists/bookworm/main/")
+    with open_decompressed(path, path.name) as stream:
+        parser.parse_stream(stream)
+    return len(parser.package_cache)
+
+
+def measure(func, path: Path):
+    """分别测量耗时与峰值内存 (tracemalloc 会拖慢解析, 因此单独运行)"""
+    start = time.perf_counter()
+    count = func(path)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    data = generate_packages(count)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        gz_path = Path(tmp) / "Packages.gz"
+        xz_path = Path(tmp) / "Packages.xz"
+        gz_path.write_bytes(gzip.compress(data))
+        xz_path.write_bytes(lzma.compress(data))
+        print(
+            f"Packages: {count} 个包, 原始 {len(data) / 1024 / 1024:.1f} MB, "
+            f"gz {gz_path.stat().st_size / 1024 / 1024:.1f} MB, "
+            f"xz {xz_path.stat().st_size / 1024 / 1024:.1f} MB"
+        )
+
+        for label, func, path in (
+            ("legacy gz", legacy_parse, gz_path),
+            ("stream gz", streaming_parse, gz_path),
+            ("stream xz", streaming_parse, xz_path),
+        ):
+            parsed, elapsed, peak = measure(func, path)
+            print(
+                f"{label:>10}: {parsed} 个包, {elapsed:.2f} s, "
+                f"{parsed / elapsed:,.0f} 包/s, 峰值内存 {peak / 1024 / 1024:.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
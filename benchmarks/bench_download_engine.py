@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+下载引擎对比: 线程池 (requests, 8 KB 块) vs asyncio (aiohttp, 跨任务复用连接)
+
+本地 HTTP 镜像替身提供合成的包文件, 依次运行若干个 "任务", 每个任务下载
+一批包到新的目录; 不带校验值, 因此不经过共享仓库。
+
+用法: python -m benchmarks.bench_download_engine [包数量] [每包 KB] [任务数]
+"""
+
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from backend.downloaders.async_http import AsyncEngine, AsyncPackageDownloader
+from backend.downloaders.blob_store import BlobStore
+from backend.downloaders.http import PackageDownloader
+from benchmarks.local_mirror import LocalMirror
+
+
+def run(name, make_downloader, packages, tasks, workdir: Path):
+    total = sum(pkg["bytes"] for pkg in packages) * tasks
+    start = time.perf_counter()
+    for task in range(tasks):
+        results = make_downloader().download_packages(packages, workdir / name / str(task))
+        assert not results["failed"], results["failed"][:1]
+    elapsed = time.perf_counter() - start
+    print(f"  {name:<28} {elapsed:6.2f} s  {total / elapsed / 1024 / 1024:8.1f} MB/s")
+    shutil.rmtree(workdir / name)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    size_kb = int(sys.argv[2]) if len(sys.argv) > 2 else 512
+    tasks = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+
+    files = {f"/Packages/pkg{i}.rpm": bytes([i % 256]) * (size_kb * 1024) for i in range(count)}
+    print(f"本地镜像: {count} 个包 x {size_kb} KB, {tasks} 个任务")
+
+    with tempfile.TemporaryDirectory() as tmp, LocalMirror(files) as mirror:
+        workdir = Path(tmp)
+        store = BlobStore(workdir / "blobs", quota_bytes=0)
+        packages = [
+            {"name": path, "url": mirror.url + path, "bytes": len(data)} for path, data in files.items()
+        ]
+
+        run("thread (max_workers=5)", lambda: PackageDownloader(5, store=store), packages, tasks, workdir)
+
+        engine = AsyncEngine(limit=64, limit_per_host=8)
+        run(
+            "async (8 per host)",
+            lambda: AsyncPackageDownloader(8, store=store, engine=engine),
+            packages,
+            tasks,
+            workdir,
+        )
+        engine.close()
+
+
+if __name__ == "__main__":
+    main()
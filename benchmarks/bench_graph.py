@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+多根包闭包: 逐个根包广度优先遍历 vs SCC 缩合位图
+
+合成仓库包含一个相互依赖的核心簇 (类似 glibc/bash/coreutils) 和若干
+依赖核心的上层包, 一次请求 100 个根包 (PackageRequest.packages 的上限)。
+
+用法: python -m benchmarks.bench_graph [包数量]
+"""
+
+import random
+import sys
+import time
+
+from backend.resolvers.graph import DependencyGraph
+from backend.resolvers.rpm import RPMRepodataParser, RPMDependencyResolver
+
+
+def build_parser(count: int, core: int = 400) -> RPMRepodataParser:
+    rng = random.Random(11)
+    parser = RPMRepodataParser("http://example.com/os/")
+    for i in range(count):
+        if i < core:
+            # 核心簇: 环 + 随机回边
+            requires = [f"pkg{(i + 1) % core}", f"pkg{rng.randrange(core)}"]
+        else:
+            requires = [f"pkg{rng.randrange(i)}" for _ in range(4)]
+        parser.package_cache.add(
+            f"pkg{i}", "1.0", "x86_64", f"pkg{i}.rpm", requires=requires, provides=[f"pkg{i}"]
+        )
+    return parser
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    parser = build_parser(count)
+    roots = [f"pkg{i}" for i in random.Random(3).sample(range(count // 2, count), 100)]
+    print(f"合成仓库: {count} 个包, 请求 {len(roots)} 个根包")
+
+    start = time.perf_counter()
+    expected = set()
+    for root in roots:
+        expected.update(pkg["name"] for pkg in RPMDependencyResolver(parser).resolve(root))
+    print(f"  逐个遍历: {len(expected)} 个包, {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    graph = DependencyGraph(parser, RPMDependencyResolver)
+    start = time.perf_counter()
+    bits = graph.closure(roots)
+    print(f"  SCC 位图 (首次, 含分量计算): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    other = [f"pkg{i}" for i in random.Random(5).sample(range(count // 2, count), 100)]
+    graph.closure(other)
+    start = time.perf_counter()
+    for _ in range(10):
+        bits = graph.closure(roots)
+    elapsed = (time.perf_counter() - start) / 10
+    closure = {parser.package_cache.name_of(pkg_id) for pkg_id in graph.package_ids(bits)}
+    assert closure == expected
+    print(f"  SCC 位图 (已计算): {len(closure)} 个包, {elapsed * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+仓库索引内存对比: dict-of-dicts vs 列式 PackageIndex
+
+用法: python -m benchmarks.bench_package_index [包数量]
+"""
+
+import random
+import sys
+import time
+import tracemalloc
+
+from backend.resolvers.index import PackageIndex
+
+
+def generate(count: int):
+    """生成合成包数据; 每次都构造新字符串, 模拟解析器从 XML 读出的独立对象"""
+    rng = random.Random(42)
+    capabilities = [f"lib{i}.so.{i % 7}()(64bit)" for i in range(count // 4)]
+    for i in range(count):
+        yield {
+            "name": f"pkg{i}",
+            "version": f"{i % 13}.{i % 101}.{i}",
+            "arch": "".join(["x86", "_64"]),
+            "location": f"Packages/p/pkg{i}-{i % 13}.{i % 101}.{i}-1.el9.x86_64.rpm",
+            "size": rng.randint(10_000, 50_000_000),
+            "requires": ["".join(rng.choice(capabilities)) for _ in range(rng.randint(3, 25))],
+            "provides": [f"pkg{i}", f"pkg{i}(x86-64)", "".join(capabilities[i % len(capabilities)])],
+        }
+
+
+def build_dicts(packages):
+    cache = {}
+    for pkg in packages:
+        cache[pkg["name"]] = {
+            "name": pkg["name"],
+            "version": pkg["version"],
+            "arch": pkg["arch"],
+            "url": "http://mirror.example.com/os/" + pkg["location"],
+            "size": pkg["size"],
+            "requires": pkg["requires"],
+            "provides": pkg["provides"],
+        }
+    return cache
+
+
+def build_index(packages):
+    index = PackageIndex("rpm", "http://mirror.example.com/os/")
+    for pkg in packages:
+        index.add(**pkg)
+    return index
+
+
+def measure(builder, count: int):
+    """分别测量构建耗时 (含数据生成) 与构建完成后的常驻内存"""
+    start = time.perf_counter()
+    builder(generate(count))
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    result = builder(generate(count))
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, current
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+
+    baseline = None
+    for label, builder in (("dict", build_dicts), ("index", build_index)):
+        result, elapsed, size = measure(builder, count)
+        baseline = baseline or size
+        print(
+            f"{label:>6}: {len(result)} 个包, 构建 {elapsed:.2f} s, "
+            f"常驻 {size / 1024 / 1024:.1f} MB ({size / len(result):.0f} B/包, "
+            f"{size / baseline:.0%})"
+        )
+        del result
+
+
+if __name__ == "__main__":
+    main()
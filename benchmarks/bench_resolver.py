@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+依赖闭包解析对比: 旧的递归实现 vs 工作队列实现
+
+在合成的 RPM 仓库上解析一个依赖数千个包的根包 (类似 gnome-shell/texlive),
+旧实现按原逻辑递归、逐层 extend 列表并在每条边上格式化日志字符串。
+
+用法: python -m benchmarks.bench_resolver [包数量]
+"""
+
+import logging
+import random
+import re
+import sys
+import time
+
+from backend.resolvers.rpm import RPMRepodataParser, RPMDependencyResolver
+
+logger = logging.getLogger("bench")
+
+
+def build_parser(count: int) -> RPMRepodataParser:
+    """包 i 依赖若干编号更大的库, 外加一条贯穿全部包的长链"""
+    rng = random.Random(7)
+    parser = RPMRepodataParser("http://example.com/os/")
+    for i in range(count):
+        requires = [f"pkg{i + 1}"] if i + 1 < count else []
+        requires += [f"lib{j}.so.1()(64bit)" for j in rng.sample(range(i + 1, count + 1), min(6, count - i))]
+        parser.package_cache.add(
+            f"pkg{i}", "1.0", "x86_64", f"pkg{i}.rpm",
+            requires=[r for r in requires if not r.startswith(f"lib{count}.")],
+            provides=[f"pkg{i}", f"lib{i}.so.1()(64bit)"],
+        )
+    return parser
+
+
+class LegacyResolver:
+    """旧实现的状态: resolved 集合与只含 .so 的 provides 映射"""
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.resolved = set()
+        self.provides_map = {}
+        for pkg_name, pkg_info in parser.package_cache.items():
+            for prov in pkg_info.get("provides", []):
+                if ".so" in prov:
+                    self.provides_map[prov] = pkg_name
+
+    def _extract_lib_name(self, req):
+        match = re.match(r"([a-z0-9._+-]+\.so[\d.]*\(?\)?(\([A-Z0-9_]+\))?\(\d+bit\))", req)
+        return match.group(1) if match else None
+
+
+def legacy_resolve(resolver, package_name):
+    """旧实现的核心: 递归 + extend + 每条边格式化日志"""
+    if package_name in resolver.resolved:
+        logger.debug(f"跳过已解析的包: {package_name}")
+        return []
+    pkg = resolver.parser.find_package(package_name)
+    if not pkg:
+        raise ValueError(f"Package '{package_name}' not found")
+    logger.info(f"解析包: {package_name}, 依赖数量: {len(pkg.get('requires', []))}")
+    packages = [pkg]
+    resolver.resolved.add(package_name)
+    for req in pkg.get("requires", []):
+        logger.debug(f"  处理依赖: {req}")
+        try:
+            packages.extend(legacy_resolve(resolver, req))
+        except ValueError:
+            lib_name = resolver._extract_lib_name(req)
+            logger.debug(f"    作为库文件查找: {req} -> {lib_name}")
+            if lib_name in resolver.provides_map:
+                packages.extend(legacy_resolve(resolver, resolver.provides_map[lib_name]))
+    return packages
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    logging.basicConfig(level=logging.WARNING)
+    parser = build_parser(count)
+    print(f"合成仓库: {count} 个包, 依赖链深度 {count}")
+
+    for limit in (sys.getrecursionlimit(), count * 4):
+        resolver = LegacyResolver(parser)
+        sys.setrecursionlimit(limit)
+        start = time.perf_counter()
+        try:
+            closure = legacy_resolve(resolver, "pkg0")
+            print(f"  递归实现 (recursionlimit={limit}): {len(closure)} 个包, {time.perf_counter() - start:.2f} s")
+        except RecursionError:
+            print(f"  递归实现 (recursionlimit={limit}): RecursionError")
+    sys.setrecursionlimit(1000)
+
+    resolver = RPMDependencyResolver(parser)
+    start = time.perf_counter()
+    closure = resolver.resolve("pkg0")
+    print(f"  工作队列实现: {len(closure)} 个包, {time.perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+primary.xml 解析性能对比: 整体加载 (ET.fromstring) vs 流式 iterparse
+
+用法: python -m benchmarks.bench_rpm_parser [包数量]
+"""
+
+import gzip
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from backend.resolvers.rpm import RPMRepodataParser
+
+
+def generate_primary(count: int) -> bytes:
+    """生成包含 count 个包的合成 primary.xml"""
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<metadata xmlns="http://linux.duke.edu/metadata/common" '
+        f'xmlns:rpm="http://linux.duke.edu/metadata/rpm" packages="{count}">\n'
+    ]
+    for i in range(count):
+        requires = "".join(
+            f'<rpm:entry name="libdep{(i + j) % count}.so.1()(64bit)"/>' for j in range(1, 9)
+        )
+        parts.append(
+            f'<package type="rpm"><name>pkg{i}</name><arch>x86_64</arch>'
+            f'<version epoch="0" ver="1.{i}" rel="1"/>'
+            f'<summary>Synthetic package {i}</summary>'
+            f'<description>{"Long description text. " * 20}</description>'
+            f'<location href="Packages/pkg{i}-1.{i}-1.x86_64.rpm"/>'
+            f'<format><rpm:provides><rpm:entry name="pkg{i}"/>'
+            f'<rpm:entry name="libdep{i}.so.1()(64bit)"/></rpm:provides>'
+            f"<rpm:requires>{requires}</rpm:requires></format></package>\n"
+        )
+    parts.append("</metadata>\n")
+    return "".join(parts).encode("utf-8")
+
+
+def legacy_parse(path: Path) -> int:
+    """旧实现: 整体解压为字符串后构建完整元素树, 再逐个提取字段"""
+    ns = {
+        "common": "http://linux.duke.edu/metadata/common",
+        "rpm": "http://linux.duke.edu/metadata/rpm",
+    }
+    text = gzip.decompress(path.read_bytes()).decode("utf-8")
+    root = ET.fromstring(text)
+
+    package_cache = {}
+    for pkg in root.findall(".//common:package", ns):
+        name = pkg.find("common:name", ns).text
+        format_elem = pkg.find("common:format", ns)
+        package_cache[name] = {
+            "name": name,
+            "version": pkg.find("common:version", ns).get("ver"),
+            "arch": pkg.find("common:arch", ns).text,
+            "url": pkg.find("common:location", ns).get("href"),
+            "requires": [
+                e.get("name") for e in format_elem.findall("rpm:requires/rpm:entry", ns)
+            ],
+            "provides": [
+                e.get("name") for e in format_elem.findall("rpm:provides/rpm:entry", ns)
+            ],
+        }
+    return len(package_cache)
+
+
+def streaming_parse(path: Path) -> int:
+    parser = RPMRepodataParser("http://example.com/os/")
+    parser.primary_path = path
+    parser.primary_href = "primary.xml.gz"
+    parser.parse_packages()
+    return len(parser.package_cache)
+
+
+def measure(func, path: Path):
+    """分别测量耗时与峰值内存 (tracemalloc 会拖慢解析, 因此单独运行)"""
+    start = time.perf_counter()
+    count = func(path)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "primary.xml.gz"
+        path.write_bytes(gzip.compress(generate_primary(count)))
+        print(f"primary.xml.gz: {count} 个包, {path.stat().st_size / 1024 / 1024:.1f} MB")
+
+        for label, func in (("legacy", legacy_parse), ("streaming", streaming_parse)):
+            parsed, elapsed, peak = measure(func, path)
+            print(
+                f"{label:>10}: {parsed} 个包, {elapsed:.2f} s, "
+                f"{parsed / elapsed:,.0f} 包/s, 峰值内存 {peak / 1024 / 1024:.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+索引快照: 写入耗时、mmap 打开耗时与映射缓冲上的查找速度
+
+用法: python -m benchmarks.bench_snapshot [包数量]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from backend.resolvers.snapshot import open_snapshot, write_snapshot
+from benchmarks.bench_package_index import build_index, generate
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    index = build_index(generate(count))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "index.idx"
+
+        start = time.perf_counter()
+        write_snapshot(index, path, "bench")
+        print(f" 写入快照: {time.perf_counter() - start:.2f} s, {path.stat().st_size / 1024 / 1024:.1f} MB")
+
+        start = time.perf_counter()
+        mapped = open_snapshot(path)
+        print(f" 打开快照: {(time.perf_counter() - start) * 1000:.2f} ms, {len(mapped)} 个包")
+
+        names = [f"pkg{i}" for i in range(0, count, max(1, count // 10000))]
+        for label, idx in (("内存索引", index), ("映射索引", mapped)):
+            start = time.perf_counter()
+            for name in names:
+                idx[name]["requires"]
+            elapsed = time.perf_counter() - start
+            print(f" {label}: 按名查找+读取 requires {elapsed / len(names) * 1e6:.1f} µs/次")
+
+        capabilities = [f"lib{i}.so.{i % 7}()(64bit)" for i in range(0, count // 4, 5)]
+        start = time.perf_counter()
+        for capability in capabilities:
+            mapped.providers_of(capability)
+        elapsed = time.perf_counter() - start
+        print(f" 映射索引: 按能力查找 {elapsed / len(capabilities) * 1e6:.1f} µs/次")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+本地 HTTP 镜像替身: 在后台线程中提供内存中的文件, 支持 Range 与 keep-alive
+
+用于下载引擎的测试与基准, 不依赖外部网络。
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+
+class LocalMirror:
+    """
+    files: URL 路径 -> 文件内容; drop_after: URL 路径 -> 首次请求发送多少字节后断开;
+    delay: 每个请求在响应前等待的秒数 (模拟缓慢的镜像)
+    """
+
+    def __init__(self, files: Dict[str, bytes], drop_after: Dict[str, int] = None, delay: float = 0):
+        self.files = files
+        self.drop_after = dict(drop_after or {})
+        self.delay = delay
+        self.requests = []
+        mirror = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                mirror.requests.append((self.path, self.headers.get("Range")))
+                if mirror.delay:
+                    time.sleep(mirror.delay)
+                data = mirror.files.get(self.path)
+                if data is None:
+                    self.send_error(404)
+                    return
+
+                start = 0
+                range_header = self.headers.get("Range")
+                if range_header:
+                    start = int(range_header.split("=")[1].split("-")[0])
+                    if start >= len(data):
+                        self.send_response(416)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Length", str(len(data) - start))
+                self.end_headers()
+
+                limit = mirror.drop_after.pop(self.path, None)
+                if limit is not None:
+                    self.wfile.write(data[start : start + limit])
+                    self.close_connection = True
+                    return
+                self.wfile.write(data[start:])
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
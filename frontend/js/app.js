@@ -124,6 +124,7 @@ class TaskList {
         this.container = document.getElementById(containerId);
         this.tasks = [];
         this.pollingInterval = null;
+        this.events = null;
 
         if (!this.container) {
             console.error('[TaskList] 找不到容器元素:', containerId);
@@ -167,6 +168,9 @@ class TaskList {
                 'completed': '✅ 已完成',
                 'failed': '❌ 失败'
             }[task.status] || task.status;
+            const queueText = task.status === 'pending' && task.queue_position
+                ? ` (第 ${task.queue_position} 位)`
+                : '';
 
             let downloadButton = '';
             if (task.status === 'completed') {
@@ -175,6 +179,14 @@ class TaskList {
                         📥 下载压缩包
                     </button>
                 `;
+            } else if (task.status === 'running' && task.download_url) {
+                // 已下载的包立即开始传输, 其余包随下载进度继续追加;
+                // 多 worker 模式下运行中的任务没有 download_url, 不显示该按钮
+                downloadButton = `
+                    <button onclick="window.app.downloadFile('${task.task_id}')" class="btn-download">
+                        📥 边下载边获取
+                    </button>
+                `;
             }
 
             return `
@@ -188,7 +200,7 @@ class TaskList {
                             </span>
                         </div>
                         <div class="task-status">
-                            ${statusText}
+                            ${statusText}${queueText}
                             ${downloadButton}
                         </div>
                     </div>
@@ -200,6 +212,41 @@ class TaskList {
         }).join('');
     }
 
+    startLiveUpdates(fallbackIntervalMs = 2000) {
+        // 订阅所有任务的变化; 不支持 SSE 或连接失败时退回定时轮询
+        if (!window.EventSource) {
+            this.startPolling(fallbackIntervalMs);
+            return;
+        }
+
+        console.log('[TaskList] 订阅任务事件');
+        this.events = new EventSource('/api/tasks/events');
+        this.events.addEventListener('task', (event) => this.applyChange(JSON.parse(event.data)));
+        this.events.onerror = () => {
+            console.warn('[TaskList] 任务事件连接中断, 改为轮询');
+            this.events.close();
+            this.events = null;
+            this.startPolling(fallbackIntervalMs);
+        };
+    }
+
+    applyChange(change) {
+        const index = this.tasks.findIndex(task => task.task_id === change.task_id);
+        if (change.deleted) {
+            if (index !== -1) {
+                this.tasks.splice(index, 1);
+                this.render();
+            }
+        } else if (index !== -1) {
+            Object.assign(this.tasks[index], change);
+            this.render();
+        } else if (change.created_at) {
+            // 新建任务: 推送的是完整字段
+            this.tasks.unshift(change);
+            this.render();
+        }
+    }
+
     startPolling(intervalMs = 2000) {
         console.log('[TaskList] 开始轮询,间隔:', intervalMs);
         if (this.pollingInterval) {
@@ -241,6 +288,8 @@ class App {
         this.distributionSelect = document.getElementById('distribution');
         this.archSelect = document.getElementById('arch');
         this.deepDownloadCheckbox = document.getElementById('deep-download');
+        this.bundleFormatSelect = document.getElementById('bundle-format');
+        this.installedManifest = document.getElementById('installed-manifest');
         this.downloadButton = document.getElementById('btn-download');
         this.progressSection = document.getElementById('progress-section');
         this.progressBar = document.getElementById('progress-bar');
@@ -266,6 +315,9 @@ class App {
         // 初始化包名建议
         this.initPackageSuggestions();
 
+        // 按服务端能力补充打包格式选项
+        this.loadCapabilities();
+
         // 绑定下载按钮事件
         console.log('[App] 绑定下载按钮事件');
         this.downloadButton.addEventListener('click', () => {
@@ -274,7 +326,7 @@ class App {
         });
 
         // 启动任务列表轮询
-        this.taskList.startPolling(2000);
+        this.taskList.startLiveUpdates(2000);
         this.taskList.fetchTasks();
 
         // 点击外部隐藏建议框
@@ -290,6 +342,25 @@ class App {
         console.log('[App] 初始化完成');
     }
 
+    async loadCapabilities() {
+        try {
+            const response = await fetch('/api/capabilities');
+            const capabilities = await response.json();
+            if (capabilities.bundle_formats.includes('tar.zst')) {
+                const option = document.createElement('option');
+                option.value = 'tar.zst';
+                option.textContent = 'tar.zst (zstd)';
+                this.bundleFormatSelect.appendChild(option);
+            }
+            if (capabilities.bundle_formats.includes(capabilities.default_bundle_format)) {
+                this.bundleFormatSelect.value = capabilities.default_bundle_format;
+            }
+        } catch (error) {
+            // 获取失败时只提供总是可用的格式
+            console.error('[App] 获取服务端能力失败:', error);
+        }
+    }
+
     updateDistributions() {
         console.log('[App] 更新发行版选项,系统类型:', this.systemTypeSelect.value);
         const systemType = this.systemTypeSelect.value;
@@ -493,7 +564,9 @@ class App {
                 distribution: this.distributionSelect.value,
                 arch: this.archSelect.value,
                 packages: packages,
-                deep_download: this.deepDownloadCheckbox.checked
+                deep_download: this.deepDownloadCheckbox.checked,
+                bundle_format: this.bundleFormatSelect.value,
+                installed: this.installedManifest.value.split('\n').filter(line => line.trim())
             };
 
             console.log('[App] 发送请求:', requestData);
@@ -536,46 +609,91 @@ class App {
     }
 
     startProgressPolling() {
-        console.log('[App] 开始进度轮询, taskId:', this.currentTaskId);
-        if (this.progressPolling) {
+        if (this.progressPolling || this.progressEvents) {
+            return;
+        }
+
+        // 优先用 SSE 接收推送, 浏览器不支持或连接失败时退回轮询
+        if (!window.EventSource) {
+            this.startIntervalPolling();
             return;
         }
 
+        console.log('[App] 订阅进度事件, taskId:', this.currentTaskId);
+        const taskId = this.currentTaskId;
+        const source = new EventSource(`/api/tasks/${taskId}/events`);
+        let task = null;
+        this.progressEvents = source;
+
+        source.addEventListener('snapshot', (event) => {
+            task = JSON.parse(event.data);
+            this.handleTaskUpdate(task);
+        });
+        source.addEventListener('progress', (event) => {
+            if (!task) {
+                return;
+            }
+            Object.assign(task, JSON.parse(event.data));
+            this.handleTaskUpdate(task);
+        });
+        source.onerror = () => {
+            if (this.progressEvents !== source) {
+                return;
+            }
+            console.warn('[App] 进度事件连接中断, 改为轮询');
+            this.stopProgressPolling();
+            if (this.currentTaskId === taskId) {
+                this.startIntervalPolling();
+            }
+        };
+    }
+
+    startIntervalPolling() {
+        console.log('[App] 开始进度轮询, taskId:', this.currentTaskId);
         this.progressPolling = setInterval(async () => {
             try {
                 const response = await fetch(`/api/tasks/${this.currentTaskId}`);
-                const task = await response.json();
-
-                console.log('[App] 任务状态:', task);
-
-                if (task.progress !== undefined) {
-                    this.updateProgress(task.progress, this.getProgressMessage(task));
-                }
-
-                // 任务完成或失败
-                if (task.status === 'completed') {
-                    console.log('[App] 任务完成');
-                    this.stopProgressPolling();
-                    this.updateProgress(100, '✅ 下载完成!');
-                    this.triggerDownload(task.archive_path);
-                    this.taskList.fetchTasks();
-                    this.resetButton();
-                } else if (task.status === 'failed') {
-                    console.log('[App] 任务失败:', task.error);
-                    this.stopProgressPolling();
-                    this.updateProgress(0, `❌ 下载失败: ${task.error}`);
-                    this.taskList.fetchTasks();
-                    this.resetButton();
-                }
-
+                this.handleTaskUpdate(await response.json());
             } catch (error) {
                 console.error('[App] 获取进度失败:', error);
             }
         }, 2000);
     }
 
+    handleTaskUpdate(task) {
+        if (task.deleted) {
+            this.stopProgressPolling();
+            this.resetButton();
+            return;
+        }
+
+        if (task.progress !== undefined) {
+            this.updateProgress(task.progress, this.getProgressMessage(task));
+        }
+
+        // 任务完成或失败
+        if (task.status === 'completed') {
+            console.log('[App] 任务完成');
+            this.stopProgressPolling();
+            this.updateProgress(100, '✅ 下载完成!');
+            this.triggerDownload(task.archive_path, task.bundle_format);
+            this.taskList.fetchTasks();
+            this.resetButton();
+        } else if (task.status === 'failed') {
+            console.log('[App] 任务失败:', task.error);
+            this.stopProgressPolling();
+            this.updateProgress(0, `❌ 下载失败: ${task.error}`);
+            this.taskList.fetchTasks();
+            this.resetButton();
+        }
+    }
+
     stopProgressPolling() {
         console.log('[App] 停止进度轮询');
+        if (this.progressEvents) {
+            this.progressEvents.close();
+            this.progressEvents = null;
+        }
         if (this.progressPolling) {
             clearInterval(this.progressPolling);
             this.progressPolling = null;
@@ -589,20 +707,23 @@ class App {
     }
 
     getProgressMessage(task) {
+        if (task.status === 'pending' && task.queue_position) {
+            return `排队中: 前面还有 ${task.queue_position - 1} 个任务`;
+        }
         if (task.current_step) {
             return `正在执行: ${task.current_step}`;
         }
         return task.message || '处理中...';
     }
 
-    triggerDownload(archivePath) {
+    triggerDownload(archivePath, bundleFormat = 'tar.gz') {
         console.log('[App] 触发下载, archivePath:', archivePath);
         if (!archivePath) {
             console.log('[App] 无archivePath,从taskId下载');
             // 从 taskId 下载
             const link = document.createElement('a');
             link.href = `/api/download/${this.currentTaskId}`;
-            link.download = `packages-${this.currentTaskId}.tar.gz`;
+            link.download = `packages-${this.currentTaskId}.${bundleFormat}`;
             document.body.appendChild(link);
             link.click();
             document.body.removeChild(link);
@@ -0,0 +1,188 @@
+import hashlib
+import os
+import time
+import pytest
+from backend.downloaders.async_http import AsyncEngine, AsyncPackageDownloader
+from backend.downloaders.blob_store import BlobStore
+from backend.downloaders.mirrors import MirrorGroup
+from benchmarks.local_mirror import LocalMirror
+
+
+@pytest.fixture
+def engine():
+    engine = AsyncEngine(limit=8, limit_per_host=2)
+    yield engine
+    engine.close()
+
+
+def make_downloader(engine, tmp_path, **kwargs):
+    store = BlobStore(tmp_path / "blobs", quota_bytes=1 << 30)
+    return AsyncPackageDownloader(max_workers=4, store=store, engine=engine, retry_delay=0, **kwargs)
+
+
+def test_download_packages(engine, tmp_path):
+    """测试批量下载与进度回调"""
+    files = {f"/pkg{i}.rpm": bytes([i]) * 1000 for i in range(5)}
+    progress = []
+
+    with LocalMirror(files) as mirror:
+        packages = [{"name": path[1:-4], "url": mirror.url + path} for path in files]
+        results = make_downloader(engine, tmp_path).download_packages(
+            packages, tmp_path / "out", lambda i, total, pkg: progress.append(i)
+        )
+
+    assert len(results["success"]) == 5
+    assert results["failed"] == []
+    assert sorted(progress) == [1, 2, 3, 4, 5]
+    assert (tmp_path / "out" / "pkg3.rpm").read_bytes() == bytes([3]) * 1000
+
+
+def test_resume_and_cache_hit(engine, tmp_path):
+    """测试连接中断后续传, 校验通过后第二次直接命中共享仓库"""
+    data = b"firmware" * 4096
+    files = {"/linux-firmware.rpm": data}
+
+    with LocalMirror(files, drop_after={"/linux-firmware.rpm": 1000}) as mirror:
+        pkg = {
+            "name": "linux-firmware",
+            "url": mirror.url + "/linux-firmware.rpm",
+            "checksum": f"sha256:{hashlib.sha256(data).hexdigest()}",
+            "size": len(data),
+        }
+        downloader = make_downloader(engine, tmp_path)
+        first = downloader.download_packages([pkg], tmp_path / "task1")
+        second = downloader.download_packages([pkg], tmp_path / "task2")
+
+    assert first["failed"] == []
+    assert mirror.requests == [("/linux-firmware.rpm", None), ("/linux-firmware.rpm", "bytes=1000-")]
+    assert (tmp_path / "task1" / "linux-firmware.rpm").read_bytes() == data
+    assert second["cache_hits"] == 1
+
+
+def test_missing_file_reported_as_failure(engine, tmp_path):
+    """测试 404 计入失败列表"""
+    with LocalMirror({}) as mirror:
+        results = make_downloader(engine, tmp_path, retries=0).download_packages(
+            [{"name": "missing", "url": mirror.url + "/missing.rpm"}], tmp_path / "out"
+        )
+
+    assert results["success"] == []
+    assert "404" in results["failed"][0]["error"]
+
+
+def test_failover_between_mirrors(engine, tmp_path):
+    """测试镜像组: 缺少文件的镜像失败后由其他镜像完成"""
+    data = b"openssl" * 100
+    with LocalMirror({}) as broken, LocalMirror({"/os/openssl.rpm": data}) as good:
+        group = MirrorGroup([broken.url + "/os/", good.url + "/os/"])
+        group.ranked = lambda: group.bases
+        results = make_downloader(engine, tmp_path, mirrors=group).download_packages(
+            [{"name": "openssl", "url": broken.url + "/os/openssl.rpm"}], tmp_path / "out"
+        )
+
+    assert results["failed"] == []
+    assert (tmp_path / "out" / "openssl.rpm").read_bytes() == data
+    assert group.stats(broken.url + "/os/").failures == 1
+
+
+def test_download_from_stream(engine, tmp_path):
+    """测试包列表为生成器时边取边下载, 并按 URL 去重"""
+    files = {"/pkg1.rpm": b"one" * 1000, "/pkg2.rpm": b"two" * 1000}
+
+    with LocalMirror(files) as mirror:
+
+        def stream():
+            yield {"name": "pkg1", "url": mirror.url + "/pkg1.rpm"}
+            for _ in range(500):
+                if (tmp_path / "out" / "pkg1.rpm").exists():
+                    break
+                time.sleep(0.01)
+            assert (tmp_path / "out" / "pkg1.rpm").exists()
+            yield {"name": "pkg2", "url": mirror.url + "/pkg2.rpm"}
+            yield {"name": "pkg1", "url": mirror.url + "/pkg1.rpm"}
+
+        results = make_downloader(engine, tmp_path).download_packages(stream(), tmp_path / "out")
+
+    assert results["total"] == 2
+    assert results["failed"] == []
+    assert len(mirror.requests) == 2
+
+
+def test_stream_error_cancels_downloads(engine, tmp_path):
+    """测试生成器出错时异常传给调用方"""
+
+    def stream():
+        yield {"name": "pkg1", "url": "http://127.0.0.1:9/pkg1.rpm"}
+        raise ValueError("Package 'missing' not found")
+
+    with pytest.raises(ValueError, match="missing"):
+        make_downloader(engine, tmp_path).download_packages(stream(), tmp_path / "out")
+
+
+def test_aborted_task_does_not_cancel_shared_download(engine, tmp_path):
+    """测试发起共享下载的任务放弃后, 等待同一个包的其他任务自行重新下载而不是丢失该包"""
+    import threading
+
+    data = b"glibc" * 1000
+    with LocalMirror({"/glibc.rpm": data}, delay=0.5) as mirror:
+        pkg = {"name": "glibc", "url": mirror.url + "/glibc.rpm"}
+
+        def aborted_stream():
+            yield pkg
+            while engine.flights.shared < 1:
+                time.sleep(0.01)
+            raise ValueError("Package 'missing' not found")
+
+        def other_task():
+            while not engine.flights._calls:
+                time.sleep(0.01)
+            results.append(make_downloader(engine, tmp_path).download_packages([pkg], tmp_path / "b"))
+
+        results = []
+        thread = threading.Thread(target=other_task)
+        thread.start()
+        with pytest.raises(ValueError, match="missing"):
+            make_downloader(engine, tmp_path).download_packages(aborted_stream(), tmp_path / "a")
+        thread.join(10)
+
+    assert results[0]["failed"] == []
+    assert len(results[0]["success"]) == 1
+    assert (tmp_path / "b" / "glibc.rpm").read_bytes() == data
+
+
+def test_file_work_runs_off_event_loop(engine, tmp_path):
+    """测试 .part 摘要恢复、改名与共享仓库的读写都在线程池中执行, 不占用引擎线程"""
+    import threading
+    from unittest.mock import patch
+    from backend.downloaders import async_http
+
+    data = b"kernel" * 1000
+    calls = []
+    downloader = make_downloader(engine, tmp_path)
+    store = downloader.store
+
+    def recording(name, fn):
+        def wrapper(*args):
+            calls.append((name, threading.current_thread().name))
+            return fn(*args)
+
+        return wrapper
+
+    class RecordingPartial(async_http.PartialDownload):
+        def __init__(self, *args):
+            calls.append(("partial", threading.current_thread().name))
+            super().__init__(*args)
+
+    with LocalMirror({"/kernel.rpm": data}) as mirror, patch.object(
+        async_http, "PartialDownload", RecordingPartial
+    ), patch.object(async_http.os, "replace", recording("replace", os.replace)), patch.multiple(
+        store, get=recording("get", store.get), put=recording("put", store.put), link=recording("link", store.link)
+    ):
+        pkg = {"name": "kernel", "url": mirror.url + "/kernel.rpm", "SHA256": hashlib.sha256(data).hexdigest()}
+        first = downloader.download_packages([pkg], tmp_path / "out")
+        second = downloader.download_packages([pkg], tmp_path / "again")
+
+    assert first["failed"] == second["failed"] == []
+    assert second["cache_hits"] == 1
+    assert {name for name, _ in calls} >= {"partial", "replace", "get", "put", "link"}
+    assert all(thread != "download-engine" for _, thread in calls)
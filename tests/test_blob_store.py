@@ -0,0 +1,106 @@
+import hashlib
+import os
+import pytest
+from unittest.mock import Mock, patch
+from backend.downloaders.blob_store import BlobStore, parse_checksum
+from backend.downloaders.http import PackageDownloader
+
+
+def sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_parse_checksum():
+    """测试从 RPM/DEB 记录取出校验值"""
+    assert parse_checksum({"checksum": "sha256:ABCD"}) == ("sha256", "abcd")
+    assert parse_checksum({"SHA256": "abcd"}) == ("sha256", "abcd")
+    assert parse_checksum({"name": "bash"}) is None
+
+
+def test_put_and_link(tmp_path):
+    """测试加入仓库后以硬链接放入任务目录"""
+    store = BlobStore(tmp_path / "blobs", quota_bytes=1024)
+    source = tmp_path / "bash.rpm"
+    source.write_bytes(b"bash")
+    digest = sha256(b"bash")
+
+    blob = store.put("sha256", digest, source)
+    dest = tmp_path / "task" / "bash.rpm"
+    dest.parent.mkdir()
+    store.link(store.get("sha256", digest), dest)
+
+    assert blob == store.path_for("sha256", digest)
+    assert dest.read_bytes() == b"bash"
+    assert os.stat(dest).st_ino == os.stat(blob).st_ino
+    assert store.usage() == 4
+
+
+def test_quota_evicts_least_recently_used(tmp_path):
+    """测试超出配额时淘汰最久未使用的文件, 直到低于配额的 LOW_WATER 比例"""
+    store = BlobStore(tmp_path / "blobs", quota_bytes=10)
+    digests = []
+    for i, data in enumerate((b"aaaa", b"bbbb")):
+        source = tmp_path / f"{i}.rpm"
+        source.write_bytes(data)
+        digests.append(sha256(data))
+        store.put("sha256", digests[-1], source)
+        os.utime(store.path_for("sha256", digests[-1]), (i, i))
+
+    store.get("sha256", digests[0])
+    source = tmp_path / "2.rpm"
+    source.write_bytes(b"cccc")
+    store.put("sha256", sha256(b"cccc"), source)
+
+    assert store.get("sha256", digests[0]) is not None
+    assert store.get("sha256", digests[1]) is None
+    assert store.usage() == 8
+
+
+def test_eviction_leaves_headroom(tmp_path):
+    """测试一次淘汰后留出余量, 之后加入文件不再扫描整个仓库"""
+    store = BlobStore(tmp_path / "blobs", quota_bytes=100)
+    for i in range(12):
+        source = tmp_path / f"{i}.rpm"
+        source.write_bytes(bytes([i]) * 10)
+        with patch.object(store, "_evict", wraps=store._evict) as evict:
+            store.put("sha256", sha256(source.read_bytes()), source)
+        os.utime(store.path_for("sha256", sha256(source.read_bytes())), (i, i))
+        if i == 10:
+            assert evict.call_count == 1
+            assert store.usage() == 90
+        elif i == 11:
+            assert evict.call_count == 0
+            assert store.usage() == 100
+
+
+def test_downloader_cache_hit_skips_network(tmp_path):
+    """测试第二个任务直接从仓库取包, 不发起请求"""
+    store = BlobStore(tmp_path / "blobs", quota_bytes=1 << 20)
+    downloader = PackageDownloader(max_workers=1, store=store)
+    pkg = {"name": "glibc", "url": "http://example.com/glibc.rpm", "checksum": f"sha256:{sha256(b'glibc')}"}
+
+    response = Mock()
+    response.iter_content = lambda chunk_size: [b"glibc"]
+    with patch("requests.Session.get", return_value=response) as get:
+        first = downloader.download_packages([pkg], tmp_path / "task1")
+        second = downloader.download_packages([pkg], tmp_path / "task2")
+
+    assert get.call_count == 1
+    assert first["cache_hits"] == 0
+    assert second["cache_hits"] == 1
+    assert (tmp_path / "task2" / "glibc.rpm").read_bytes() == b"glibc"
+
+
+def test_downloader_skips_store_on_mismatch(tmp_path):
+    """测试校验值不一致的文件不加入仓库"""
+    store = BlobStore(tmp_path / "blobs", quota_bytes=1 << 20)
+    downloader = PackageDownloader(max_workers=1, store=store)
+    pkg = {"name": "glibc", "url": "http://example.com/glibc.rpm", "SHA256": "0" * 64}
+
+    response = Mock()
+    response.iter_content = lambda chunk_size: [b"truncated"]
+    with patch("requests.Session.get", return_value=response):
+        with pytest.raises(ValueError, match="Checksum mismatch"):
+            downloader._download_single(pkg, tmp_path)
+
+    assert store.get("sha256", "0" * 64) is None
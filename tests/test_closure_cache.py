@@ -0,0 +1,120 @@
+from unittest.mock import patch
+from backend.models import PackageRequest
+from backend.resolvers.closure_cache import ClosureCache
+from backend.resolvers.deb import DEBPackageParser
+from backend.resolvers.graph import DependencyGraph
+from backend.resolvers.index import PackageIndex
+from backend.resolvers.rpm import RPMRepodataParser
+from backend import api_routes
+
+
+def test_get_and_put():
+    """测试命中与未命中统计"""
+    cache = ClosureCache(max_entries=4)
+
+    assert cache.get("centos-7", "x86_64", "r1", "nginx") is None
+    cache.put("centos-7", "x86_64", "r1", "nginx", 0b11)
+
+    assert cache.get("centos-7", "x86_64", "r1", "nginx") == 0b11
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1}
+
+
+def test_lru_eviction():
+    """测试超出容量时淘汰最久未使用的条目"""
+    cache = ClosureCache(max_entries=2)
+    cache.put("centos-7", "x86_64", "r1", "a", 1)
+    cache.put("centos-7", "x86_64", "r1", "b", 2)
+    cache.get("centos-7", "x86_64", "r1", "a")
+    cache.put("centos-7", "x86_64", "r1", "c", 4)
+
+    assert cache.get("centos-7", "x86_64", "r1", "a") == 1
+    assert cache.get("centos-7", "x86_64", "r1", "b") is None
+    assert cache.get("centos-7", "x86_64", "r1", "c") == 4
+
+
+def test_new_revision_invalidates_old_entries():
+    """测试仓库版本变化后旧条目失效, 其他发行版不受影响"""
+    cache = ClosureCache()
+    cache.put("centos-7", "x86_64", "r1", "nginx", 1)
+    cache.put("ubuntu-22.04", "amd64", "u1", "nginx", 1)
+
+    assert cache.get("centos-7", "x86_64", "r2", "nginx") is None
+    assert cache.stats()["entries"] == 1
+    assert cache.get("ubuntu-22.04", "amd64", "u1", "nginx") == 1
+
+
+def test_resolve_download_list_uses_cache():
+    """测试相同请求第二次不再遍历依赖图"""
+    parser = RPMRepodataParser("http://example.com/")
+    parser.revision = "r1"
+    index = PackageIndex("rpm", parser.mirror_url)
+    index.add("nginx", "1.0", "x86_64", "Packages/nginx.rpm", requires=["openssl"])
+    index.add("openssl", "1.1", "x86_64", "Packages/openssl.rpm", provides=["openssl"])
+    parser.package_cache = index
+
+    request = PackageRequest(packages=["nginx"], system_type="rpm", distribution="centos-7")
+    cache = ClosureCache()
+
+    with patch.object(api_routes, "closure_cache", cache), patch.object(
+        api_routes.parser_registry, "get_rpm_parser", return_value=parser
+    ):
+        first = api_routes.resolve_download_list(request)
+        with patch.object(DependencyGraph, "closure") as closure:
+            second = api_routes.resolve_download_list(request)
+
+    assert closure.call_count == 0
+    assert [pkg["name"] for pkg in first] == ["nginx", "openssl"]
+    assert [pkg["name"] for pkg in second] == ["nginx", "openssl"]
+
+
+def test_resolve_download_stream_warms_cache():
+    """测试流式解析按发现顺序产出下载项, 产出完毕后填充闭包缓存"""
+    parser = RPMRepodataParser("http://example.com/")
+    parser.revision = "r1"
+    index = PackageIndex("rpm", parser.mirror_url)
+    index.add("nginx", "1.0", "x86_64", "Packages/nginx.rpm", requires=["openssl", "pcre"])
+    index.add("openssl", "1.1", "x86_64", "Packages/openssl.rpm", provides=["openssl"])
+    index.add("pcre", "8.44", "x86_64", "Packages/pcre.rpm", provides=["pcre"])
+    parser.package_cache = index
+
+    request = PackageRequest(packages=["nginx", "openssl"], system_type="rpm", distribution="centos-7")
+    cache = ClosureCache()
+
+    with patch.object(api_routes, "closure_cache", cache), patch.object(
+        api_routes.parser_registry, "get_rpm_parser", return_value=parser
+    ):
+        stream = api_routes.resolve_download_stream(request)
+        assert next(stream)["name"] == "nginx"
+        assert cache.stats()["entries"] == 0
+        rest = [pkg["name"] for pkg in stream]
+        assert cache.stats()["entries"] == 2
+
+        with patch.object(DependencyGraph, "closure") as closure:
+            cached = [pkg["name"] for pkg in api_routes.resolve_download_stream(request)]
+
+    assert sorted(rest) == ["openssl", "pcre"]
+    assert closure.call_count == 0
+    assert sorted(cached) == ["nginx", "openssl", "pcre"]
+
+
+def test_cold_and_warm_stream_agree():
+    """测试缓存未命中 (广度优先遍历) 与命中 (依赖图闭包) 时产出相同的包集合"""
+    parser = DEBPackageParser("http://example.com/ubuntu/dists/jammy/main/")
+    parser.revision = "u1"
+    parser.package_cache.add("app", "1", "amd64", "pool/app.deb", requires=["mawk", "gawk | mawk"])
+    parser.package_cache.add("mawk", "1", "amd64", "pool/mawk.deb")
+    parser.package_cache.add("gawk", "1", "amd64", "pool/gawk.deb", requires=["libbig"])
+    parser.package_cache.add("libbig", "1", "amd64", "pool/libbig.deb")
+
+    request = PackageRequest(packages=["app"], system_type="deb", distribution="ubuntu-22")
+    cache = ClosureCache()
+
+    with patch.object(api_routes, "closure_cache", cache), patch.object(
+        api_routes.parser_registry, "get_deb_parser", return_value=parser
+    ):
+        cold = sorted(pkg["Package"] for pkg in api_routes.resolve_download_stream(request))
+        warm = sorted(pkg["Package"] for pkg in api_routes.resolve_download_stream(request))
+        listed = sorted(pkg["Package"] for pkg in api_routes.resolve_download_list(request))
+
+    assert cache.stats()["hits"] >= 1
+    assert cold == warm == listed == ["app", "gawk", "libbig", "mawk"]
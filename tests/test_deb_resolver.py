@@ -1,5 +1,32 @@
+import gzip
+import io
+import lzma
 import pytest
-from backend.resolvers.deb import DEBPackageParser, DEBDependencyResolver
+import requests
+from unittest.mock import Mock
+from backend.metadata_cache import CachedFile
+from backend.resolvers.deb import DEBPackageParser, DEBDependencyResolver, iter_stanzas
+
+
+SAMPLE_PACKAGES = b"""Package: bash
+Architecture: amd64
+Version: 5.1-6ubuntu1
+Priority: required
+Depends: base-files (>= 2.1.12), debianutils (>= 2.15)
+Filename: pool/main/b/bash/bash_5.1-6ubuntu1_amd64.deb
+Size: 768660
+SHA256: 9f8e7d6c5b4a
+Description: GNU Bourne Again SHell
+ Bash is an sh-compatible command language interpreter.
+ .
+ Bash is ultimately intended to be a conformant implementation.
+
+Package: base-files
+Architecture: amd64
+Version: 12ubuntu4
+Filename: pool/main/b/base-files/base-files_12ubuntu4_amd64.deb
+Size: 62586
+"""
 
 
 @pytest.fixture
@@ -35,3 +62,59 @@ def test_resolve_dependencies(deb_parser):
 
     assert len(packages) > 0
     assert any(p["Package"] == "bash" for p in packages)
+
+
+def test_iter_stanzas_skips_unused_fields():
+    """测试流式段落解析只保留需要的字段"""
+    stanzas = list(iter_stanzas(io.BytesIO(SAMPLE_PACKAGES)))
+
+    assert [s["Package"] for s in stanzas] == ["bash", "base-files"]
+    assert stanzas[0]["Depends"] == "base-files (>= 2.1.12), debianutils (>= 2.15)"
+    assert stanzas[0]["Size"] == "768660"
+    assert "Description" not in stanzas[0]
+    assert "Priority" not in stanzas[0]
+
+
+def test_iter_stanzas_continuation_lines():
+    """测试续行追加到上一个保留字段"""
+    data = b"Package: foo\nDepends: a,\n b\nDescription: x\n y\n"
+    (stanza,) = iter_stanzas(io.BytesIO(data))
+
+    assert stanza["Depends"] == "a,\nb"
+
+
+def test_load_packages_prefers_xz(tmp_path):
+    """测试优先使用 Packages.xz"""
+    path = tmp_path / "packages"
+    path.write_bytes(lzma.compress(SAMPLE_PACKAGES))
+    cache = Mock()
+    cache.fetch.return_value = CachedFile("url", path, "r1", True)
+
+    parser = DEBPackageParser("http://example.com/ubuntu/dists/jammy/main/", cache=cache)
+    parser.load_packages()
+
+    assert cache.fetch.call_args.args[0].endswith("binary-amd64/Packages.xz")
+    assert parser.revision == "r1"
+    assert parser.find_package("bash")["Version"] == "5.1-6ubuntu1"
+    assert parser.find_package("bash")["SHA256"] == "9f8e7d6c5b4a"
+    assert "SHA256" not in parser.find_package("base-files")
+
+
+def test_load_packages_falls_back_to_gz(tmp_path):
+    """测试镜像没有 Packages.xz 时回退到 Packages.gz"""
+    path = tmp_path / "packages"
+    path.write_bytes(gzip.compress(SAMPLE_PACKAGES))
+
+    def fetch(url):
+        if url.endswith(".xz"):
+            raise requests.HTTPError("404")
+        return CachedFile(url, path, "r1", True)
+
+    cache = Mock()
+    cache.fetch.side_effect = fetch
+
+    parser = DEBPackageParser("http://example.com/ubuntu/dists/jammy/main/", cache=cache)
+    parser.load_packages()
+
+    assert parser.packages_file == "Packages.gz"
+    assert len(parser.package_cache) == 2
@@ -0,0 +1,115 @@
+from backend.resolvers.deb import DEBDependencyResolver, DEBPackageParser
+from backend.resolvers.graph import DependencyGraph, dependency_graph
+from backend.resolvers.rpm import RPMRepodataParser, RPMDependencyResolver
+import pytest
+
+
+def make_parser(edges):
+    """edges: 包名 -> 依赖的包名列表"""
+    parser = RPMRepodataParser("http://example.com/")
+    for name, requires in edges.items():
+        parser.package_cache.add(
+            name, "1.0", "x86_64", f"Packages/{name}.rpm", requires=requires, provides=[name]
+        )
+    return parser
+
+
+def names(graph, bits):
+    return sorted(graph.index.name_of(pkg_id) for pkg_id in graph.package_ids(bits))
+
+
+def test_cycle_forms_single_component():
+    """测试环上的包归入同一个分量"""
+    parser = make_parser({
+        "bash": ["glibc"],
+        "glibc": ["glibc-common"],
+        "glibc-common": ["bash", "glibc"],
+        "nginx": ["bash", "openssl"],
+        "openssl": [],
+    })
+    graph = DependencyGraph(parser, RPMDependencyResolver)
+
+    bits = graph.closure(["nginx"])
+
+    assert names(graph, bits) == ["bash", "glibc", "glibc-common", "nginx", "openssl"]
+    component = graph.component_of[parser.package_cache.id_of("bash")]
+    assert component == graph.component_of[parser.package_cache.id_of("glibc")]
+    assert graph.index.name_of(graph.package_ids(bits)[0]) == "nginx"
+
+
+def test_multi_root_closure_matches_resolver():
+    """测试多根包闭包与逐个解析的结果一致"""
+    parser = make_parser({
+        "a": ["b", "c"],
+        "b": ["d"],
+        "c": ["d", "a"],
+        "d": [],
+        "e": ["d"],
+        "f": ["g"],
+        "g": [],
+    })
+    graph = dependency_graph(parser, RPMDependencyResolver)
+
+    for roots in (["a"], ["e"], ["a", "f"], ["e", "f", "g"]):
+        resolver = RPMDependencyResolver(parser)
+        expected = sorted(pkg["name"] for root in roots for pkg in resolver.resolve(root))
+        assert names(graph, graph.closure(roots)) == expected
+
+    assert dependency_graph(parser, RPMDependencyResolver) is graph
+
+
+def test_build_and_missing_package():
+    """测试预计算全部分量, 以及包不存在时报错"""
+    parser = make_parser({"a": ["b"], "b": ["a"], "c": []})
+    graph = DependencyGraph(parser, RPMDependencyResolver)
+    graph.build()
+
+    assert len(graph.members) == 2
+    with pytest.raises(ValueError):
+        graph.closure(["missing"])
+
+
+def test_alternatives_do_not_depend_on_traversal_order():
+    """测试可选依赖的选择与遍历顺序无关: 图闭包与广度优先遍历一致, 已安装的候选优先"""
+    parser = DEBPackageParser("http://example.com/debian/dists/bookworm/main/")
+    parser.package_cache.add("app", "1", "amd64", "app.deb", requires=["mawk", "gawk | mawk"])
+    parser.package_cache.add("mawk", "1", "amd64", "mawk.deb")
+    parser.package_cache.add("gawk", "1", "amd64", "gawk.deb", requires=["libbig"])
+    parser.package_cache.add("libbig", "1", "amd64", "libbig.deb")
+    graph = DependencyGraph(parser, DEBDependencyResolver)
+
+    resolved = sorted(pkg["Package"] for pkg in DEBDependencyResolver(parser).resolve("app"))
+    graph_names = sorted(graph.index.name_of(pkg_id) for pkg_id in graph.package_ids(graph.closure(["app"])))
+    assert resolved == graph_names == ["app", "gawk", "libbig", "mawk"]
+
+    resolver = DEBDependencyResolver(parser)
+    resolver.mark_installed(["mawk"])
+    assert [pkg["Package"] for pkg in resolver.resolve("app")] == ["app"]
+
+
+def test_concurrent_closures():
+    """测试多个线程同时在同一个图上按需计算闭包 (无锁读取不会看到未完成的分量)"""
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    class SlowList(list):
+        """放大写入分量期间的时间窗口"""
+
+        def append(self, item):
+            time.sleep(0.001)
+            super().append(item)
+
+    edges = {f"p{i}": [f"p{i + 1}", f"p{i + 2}"] for i in range(100)}
+    edges.update({"p100": ["p101"], "p101": []})
+    parser = make_parser(edges)
+    reference = DependencyGraph(parser, RPMDependencyResolver)
+    expected = {root: names(reference, reference.closure([root])) for root in edges}
+
+    graph = DependencyGraph(parser, RPMDependencyResolver)
+    graph.closures = SlowList()
+    roots = ["p0"] + [f"p{i}" for i in range(101, -1, -1)] * 3
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        results = list(pool.map(lambda root: (root, graph.closure([root])), roots))
+
+    for root, bits in results:
+        assert names(graph, bits) == expected[root]
@@ -0,0 +1,165 @@
+import pytest
+from unittest.mock import Mock
+from backend.metadata_cache import CachedFile
+from backend.resolvers.deb import DEBPackageParser, DEBDependencyResolver
+from backend.resolvers.rpm import RPMRepodataParser, RPMDependencyResolver
+
+
+def make_deb_parser(graph):
+    """根据 {包名: [依赖]} 构造 DEB 解析器"""
+    parser = DEBPackageParser("http://example.com/debian/dists/bookworm/main/")
+    for name, depends in graph.items():
+        parser.package_cache.add(name, "1.0", "amd64", f"pool/{name}.deb", requires=depends)
+    return parser
+
+
+def test_deep_chain_without_recursion():
+    """测试超过递归深度限制的依赖链"""
+    graph = {f"pkg{i}": [f"pkg{i + 1}"] for i in range(5000)}
+    graph["pkg5000"] = []
+    resolver = DEBDependencyResolver(make_deb_parser(graph))
+
+    packages = resolver.resolve("pkg0")
+
+    assert len(packages) == 5001
+
+
+def test_circular_dependencies():
+    """测试循环依赖"""
+    resolver = DEBDependencyResolver(make_deb_parser({"a": ["b"], "b": ["c"], "c": ["a"]}))
+
+    packages = resolver.resolve("a")
+
+    assert [p["Package"] for p in packages] == ["a", "b", "c"]
+
+
+def test_missing_root_raises():
+    """测试根包不存在时报错, 缺失的依赖被跳过"""
+    resolver = DEBDependencyResolver(make_deb_parser({"a": ["missing"]}))
+
+    with pytest.raises(ValueError, match="not found"):
+        resolver.resolve("nonexistent")
+    assert [p["Package"] for p in resolver.resolve("a")] == ["a"]
+
+
+def test_second_root_returns_only_new_packages():
+    """测试多个根包共享已解析集合"""
+    resolver = DEBDependencyResolver(make_deb_parser({"a": ["c"], "b": ["c", "d"], "c": [], "d": []}))
+
+    assert [p["Package"] for p in resolver.resolve("a")] == ["a", "c"]
+    assert [p["Package"] for p in resolver.resolve("b")] == ["b", "d"]
+    assert resolver.resolve("a") == []
+
+
+def test_parent_map_explains_inclusion():
+    """测试父节点映射记录每个包被引入的原因"""
+    parser = RPMRepodataParser("http://example.com/os/")
+    parser.package_cache.add("nginx", "1.20", "x86_64", "nginx.rpm", requires=["nginx-core"])
+    parser.package_cache.add(
+        "nginx-core", "1.20", "x86_64", "nginx-core.rpm", requires=["libssl.so.3()(64bit)"]
+    )
+    parser.package_cache.add(
+        "openssl-libs", "3.0", "x86_64", "openssl-libs.rpm", provides=["libssl.so.3()(64bit)"]
+    )
+    resolver = RPMDependencyResolver(parser)
+
+    resolver.resolve("nginx")
+
+    assert resolver.parents["openssl-libs"] == ("nginx-core", "libssl.so.3()(64bit)")
+    assert resolver.explain("openssl-libs") == [
+        ("nginx", None),
+        ("nginx-core", "nginx-core"),
+        ("openssl-libs", "libssl.so.3()(64bit)"),
+    ]
+    assert resolver.explain("unrelated") == []
+
+
+REPOMD = b"""<?xml version="1.0" encoding="UTF-8"?>
+<repomd xmlns="http://linux.duke.edu/metadata/repo">
+  <data type="filelists">
+    <location href="repodata/abc-filelists.xml"/>
+  </data>
+</repomd>
+"""
+
+FILELISTS = b"""<?xml version="1.0" encoding="UTF-8"?>
+<filelists xmlns="http://linux.duke.edu/metadata/filelists" packages="2">
+  <package pkgid="1" name="sendmail" arch="x86_64">
+    <version epoch="0" ver="8.16" rel="1"/>
+    <file>/usr/lib/sendmail</file>
+    <file>/usr/share/doc/sendmail/README</file>
+  </package>
+  <package pkgid="2" name="bash" arch="x86_64">
+    <version epoch="0" ver="5.1" rel="1"/>
+    <file>/usr/bin/bash</file>
+  </package>
+</filelists>
+"""
+
+
+def test_rpm_non_library_capabilities():
+    """测试 perl()/python3dist() 等非库能力通过能力索引解析"""
+    parser = RPMRepodataParser("http://example.com/os/")
+    parser.package_cache.add(
+        "app", "1", "x86_64", "app.rpm", requires=["perl(Foo::Bar)", "python3dist(requests)"]
+    )
+    parser.package_cache.add("perl-Foo-Bar", "1", "noarch", "p.rpm", provides=["perl(Foo::Bar)"])
+    parser.package_cache.add(
+        "python3-requests", "1", "noarch", "r.rpm", provides=["python3dist(requests)"]
+    )
+
+    packages = RPMDependencyResolver(parser).resolve("app")
+
+    assert {p["name"] for p in packages} == {"app", "perl-Foo-Bar", "python3-requests"}
+
+
+def test_rpm_prefers_already_resolved_provider():
+    """测试多个提供者时优先使用已引入的包"""
+    parser = RPMRepodataParser("http://example.com/os/")
+    parser.package_cache.add("a", "1", "x86_64", "a.rpm", requires=["mta", "postfix"])
+    parser.package_cache.add("sendmail", "1", "x86_64", "s.rpm", provides=["mta"])
+    parser.package_cache.add("postfix", "1", "x86_64", "p.rpm", provides=["postfix", "mta"])
+    resolver = RPMDependencyResolver(parser)
+
+    resolver.resolve("postfix")
+    packages = resolver.resolve("a")
+
+    assert [p["name"] for p in packages] == ["a"]
+
+
+def test_rpm_file_requires_from_primary_and_filelists(tmp_path):
+    """测试路径依赖: primary 中的文件直接命中, 其余按需加载 filelists"""
+    (tmp_path / "repomd").write_bytes(REPOMD)
+    (tmp_path / "filelists").write_bytes(FILELISTS)
+    cache = Mock()
+    cache.fetch.side_effect = lambda url, checksum=None: CachedFile(
+        url, tmp_path / ("repomd" if url.endswith("repomd.xml") else "filelists"), "r1", False
+    )
+
+    parser = RPMRepodataParser("http://example.com/os/", cache=cache)
+    parser.package_cache.add(
+        "app", "1", "x86_64", "app.rpm", requires=["/bin/sh", "/usr/lib/sendmail", "/opt/missing"]
+    )
+    parser.package_cache.add("bash", "5.1", "x86_64", "bash.rpm", provides=["bash", "/bin/sh"])
+    parser.package_cache.add("sendmail", "8.16", "x86_64", "sendmail.rpm")
+
+    packages = RPMDependencyResolver(parser).resolve("app")
+
+    assert {p["name"] for p in packages} == {"app", "bash", "sendmail"}
+    assert parser.file_providers() == {"/usr/lib/sendmail": ["sendmail"]}
+
+
+def test_deb_virtual_packages_and_alternatives():
+    """测试 DEB 虚拟包 (Provides) 与可选依赖"""
+    parser = DEBPackageParser("http://example.com/debian/dists/bookworm/main/")
+    parser.package_cache.add(
+        "app", "1", "amd64", "app.deb", requires=["mail-transport-agent", "missing | libfoo"]
+    )
+    parser.package_cache.add("exim4", "4", "amd64", "exim4.deb", provides=["mail-transport-agent"])
+    parser.package_cache.add("libfoo", "1", "amd64", "libfoo.deb")
+
+    resolver = DEBDependencyResolver(parser)
+    packages = resolver.resolve("app")
+
+    assert [p["Package"] for p in packages] == ["app", "exim4", "libfoo"]
+    assert resolver.parents["exim4"] == ("app", "mail-transport-agent")
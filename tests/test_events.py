@@ -0,0 +1,95 @@
+import asyncio
+import json
+import threading
+from unittest.mock import patch
+
+from backend import api_routes
+from backend.events import TaskEventBroker, task_events
+from backend.models import PackageRequest
+from backend.task_manager import TaskManager
+
+
+def parse_events(chunks):
+    events = []
+    for chunk in chunks:
+        if chunk.startswith(":"):
+            continue
+        lines = dict(line.split(": ", 1) for line in chunk.strip().split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_updates_are_coalesced_per_task():
+    """测试订阅者处理前的多次更新合并为一个增量, 只订阅的任务才会收到"""
+    broker = TaskEventBroker()
+
+    async def main():
+        subscription = broker.subscribe("t1")
+        broker.publish("t1", {"progress": 10, "message": "a"})
+        broker.publish("t1", {"progress": 20})
+        broker.publish("t2", {"progress": 99})
+        changes = await subscription.get(timeout=1)
+        timed_out = await subscription.get(timeout=0.01)
+        broker.unsubscribe(subscription)
+        return changes, timed_out
+
+    changes, timed_out = asyncio.run(main())
+    assert changes == {"t1": {"progress": 20, "message": "a"}}
+    assert timed_out is None
+    assert not broker.has_subscribers()
+
+
+def test_publish_from_other_thread_wakes_subscriber():
+    """测试下载线程发布的变化立即唤醒事件循环中的订阅者"""
+    broker = TaskEventBroker()
+
+    async def main():
+        subscription = broker.subscribe()
+        threading.Timer(0.05, broker.publish, args=("t1", {"status": "running"})).start()
+        return await subscription.get(timeout=2)
+
+    assert asyncio.run(main()) == {"t1": {"status": "running"}}
+
+
+def test_task_manager_publishes_changed_fields():
+    """测试 update_task 只发布实际存在的字段"""
+    manager = TaskManager()
+    task = manager.create_task(PackageRequest(packages=["nginx"], system_type="rpm", distribution="centos7"))
+
+    async def main():
+        subscription = task_events.subscribe(task.task_id)
+        manager.update_task(task.task_id, progress=50, unknown_field=1)
+        changes = await subscription.get(timeout=1)
+        task_events.unsubscribe(subscription)
+        return changes
+
+    assert asyncio.run(main()) == {task.task_id: {"progress": 50}}
+
+
+def test_task_event_stream_ends_on_completion():
+    """测试任务事件流: 先推送快照, 再推送增量, 任务完成后关闭"""
+    manager = TaskManager()
+    task = manager.create_task(PackageRequest(packages=["nginx"], system_type="rpm", distribution="centos7"))
+
+    async def main():
+        response = await api_routes.stream_task_events(task.task_id)
+
+        def work():
+            manager.update_task(task.task_id, status="running", progress=30)
+            manager.update_task(task.task_id, status="completed", progress=100)
+
+        threading.Timer(0.05, work).start()
+        return [chunk async for chunk in response.body_iterator]
+
+    with patch.object(api_routes, "task_manager", manager):
+        chunks = asyncio.run(main())
+
+    events = parse_events(chunks)
+    assert events[0][0] == "snapshot"
+    assert events[0][1]["status"] == "pending"
+    assert all(name == "progress" for name, _ in events[1:])
+    final = {}
+    for _, delta in events[1:]:
+        final.update(delta)
+    assert final == {"status": "completed", "progress": 100}
+    assert not task_events.has_subscribers()
@@ -1,4 +1,7 @@
+import hashlib
+import time
 import pytest
+import requests
 from pathlib import Path
 from unittest.mock import Mock, patch
 from backend.downloaders.http import PackageDownloader
@@ -112,3 +115,125 @@ def test_download_package_without_url(tmp_path):
 
     with pytest.raises(ValueError, match="has no URL"):
         downloader._download_single(pkg, tmp_path)
+
+
+def make_response(chunks, status_code=200, error=None):
+    """chunks 发送完后可选抛出 error, 模拟连接中断"""
+    response = Mock()
+    response.status_code = status_code
+    response.headers = {}
+
+    def iter_content(chunk_size):
+        yield from chunks
+        if error:
+            raise error
+
+    response.iter_content = iter_content
+    return response
+
+
+def test_download_resumes_with_range(tmp_path):
+    """测试中断后以 Range 续传, 校验通过后改名"""
+    data = b"linux-firmware" * 100
+    pkg = {
+        "name": "linux-firmware",
+        "url": "http://example.com/linux-firmware.rpm",
+        "checksum": f"sha256:{hashlib.sha256(data).hexdigest()}",
+    }
+    downloader = PackageDownloader(max_workers=1, store=Mock(), retry_delay=0)
+    responses = [
+        make_response([data[:600]], error=requests.ConnectionError("reset")),
+        make_response([data[600:]], status_code=206),
+    ]
+
+    with patch("requests.Session.get", side_effect=responses) as get:
+        result = downloader._download_single(pkg, tmp_path)
+
+    assert get.call_args_list[1].kwargs["headers"] == {"Range": "bytes=600-"}
+    assert result.read_bytes() == data
+    assert not (tmp_path / "linux-firmware.rpm.part").exists()
+
+
+def test_download_restarts_without_range_support(tmp_path):
+    """测试服务器忽略 Range (返回 200) 时从头下载"""
+    data = b"0123456789"
+    pkg = {"name": "p", "url": "http://example.com/p.deb", "SHA256": hashlib.sha256(data).hexdigest()}
+    downloader = PackageDownloader(max_workers=1, store=Mock(), retry_delay=0)
+    responses = [
+        make_response([data[:4]], error=requests.ConnectionError("reset")),
+        make_response([data]),
+    ]
+
+    with patch("requests.Session.get", side_effect=responses):
+        result = downloader._download_single(pkg, tmp_path)
+
+    assert result.read_bytes() == data
+
+
+def test_download_complete_part_file_releases_connection(tmp_path):
+    """测试部分文件已完整 (416) 时直接改名, 响应被关闭"""
+    data = b"0123456789"
+    pkg = {"name": "p", "url": "http://example.com/p.rpm", "SHA256": hashlib.sha256(data).hexdigest()}
+    (tmp_path / "p.rpm.part").write_bytes(data)
+    downloader = PackageDownloader(max_workers=1, store=Mock(), retry_delay=0)
+    response = make_response([], status_code=416)
+
+    with patch("requests.Session.get", return_value=response):
+        result = downloader._download_single(pkg, tmp_path)
+
+    assert result.read_bytes() == data
+    response.close.assert_called_once()
+
+
+def test_download_truncated_file_is_retried(tmp_path):
+    """测试连接正常关闭但数据不足时续传"""
+    pkg = {"name": "p", "url": "http://example.com/p.rpm", "size": 10}
+    downloader = PackageDownloader(max_workers=1, retries=1, retry_delay=0)
+    responses = [make_response([b"01234"]), make_response([b"56789"], status_code=206)]
+
+    with patch("requests.Session.get", side_effect=responses):
+        result = downloader._download_single(pkg, tmp_path)
+
+    assert result.read_bytes() == b"0123456789"
+
+
+def test_download_checksum_mismatch_leaves_no_file(tmp_path):
+    """测试校验失败时不留下正式文件或部分文件"""
+    pkg = {"name": "p", "url": "http://example.com/p.rpm", "checksum": "sha256:" + "0" * 64}
+    downloader = PackageDownloader(max_workers=1, store=Mock())
+
+    with patch("requests.Session.get", return_value=make_response([b"corrupt"])):
+        with pytest.raises(ValueError, match="Checksum mismatch"):
+            downloader._download_single(pkg, tmp_path)
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_download_from_stream_starts_before_stream_ends(tmp_path):
+    """测试包列表为生成器时边取边下载, 并按 URL 去重"""
+    from benchmarks.local_mirror import LocalMirror
+
+    files = {"/pkg1.rpm": b"one" * 1000, "/pkg2.rpm": b"two" * 1000}
+    progress = []
+
+    with LocalMirror(files) as mirror:
+
+        def stream():
+            yield {"name": "pkg1", "url": mirror.url + "/pkg1.rpm"}
+            # 第一个包在生成器继续产出之前就已下载完成
+            for _ in range(500):
+                if (tmp_path / "pkg1.rpm").exists():
+                    break
+                time.sleep(0.01)
+            assert (tmp_path / "pkg1.rpm").exists()
+            yield {"name": "pkg2", "url": mirror.url + "/pkg2.rpm"}
+            yield {"name": "pkg1", "url": mirror.url + "/pkg1.rpm"}
+
+        results = PackageDownloader(max_workers=2, retry_delay=0).download_packages(
+            stream(), tmp_path, lambda current, total, pkg: progress.append((current, total))
+        )
+
+    assert results["total"] == 2
+    assert results["failed"] == []
+    assert len(mirror.requests) == 2
+    assert sorted(progress)[-1] == (2, 2)
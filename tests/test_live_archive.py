@@ -0,0 +1,213 @@
+import asyncio
+import gzip
+import io
+import os
+import tarfile
+import threading
+import pytest
+from unittest.mock import patch
+from backend import api_routes
+from backend import archive as archive_module
+from backend.archive import LiveArchive, ParallelGzip, check_bundle_format, live_archive
+from backend.models import PackageRequest
+from backend.task_manager import TaskManager
+
+
+async def read_body(response):
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+def test_stream_follows_incremental_writes(tmp_path):
+    """测试读取方在压缩包写完之前即可收到数据, 最终得到完整的 tar.gz"""
+    files = {}
+    for i in range(3):
+        files[f"pkg{i}.rpm"] = tmp_path / f"pkg{i}.rpm"
+        files[f"pkg{i}.rpm"].write_bytes(os.urandom(1024 * 1024))
+
+    archive = LiveArchive(tmp_path / "out.tar.gz", ["packages"], ParallelGzip(block_size=64 * 1024))
+    chunks = []
+    first_chunk = threading.Event()
+
+    async def consume():
+        async for chunk in archive.stream():
+            chunks.append(chunk)
+            first_chunk.set()
+
+    def read():
+        asyncio.run(consume())
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+
+    archive.add(files["pkg0.rpm"], "packages/pkg0.rpm")
+    assert first_chunk.wait(5)
+    assert not archive.done
+
+    archive.add(files["pkg1.rpm"], "packages/pkg1.rpm")
+    archive.add(files["pkg2.rpm"], "packages/pkg2.rpm")
+    archive.close()
+    reader.join(5)
+
+    data = b"".join(chunks)
+    assert data == (tmp_path / "out.tar.gz").read_bytes()
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as tar:
+        assert tar.getnames() == ["packages", "packages/pkg0.rpm", "packages/pkg1.rpm", "packages/pkg2.rpm"]
+        assert tar.extractfile("packages/pkg2.rpm").read() == files["pkg2.rpm"].read_bytes()
+
+
+def test_parallel_gzip_compatible_with_gunzip():
+    """测试分块并行 gzip 的输出可用标准 gzip 解压, 且块顺序不变"""
+    data = os.urandom(300 * 1024) + b"repodata" * 50000
+    compressor = ParallelGzip(block_size=64 * 1024)
+    out = b"".join(compressor.compress(data[i : i + 10000]) for i in range(0, len(data), 10000))
+    out += compressor.flush()
+
+    assert gzip.decompress(out) == data
+    assert len(out) < len(data)
+
+
+@pytest.mark.parametrize("bundle_format, mode", [("tar", "r:"), ("tar.gz", "r:gz")])
+def test_bundle_formats(tmp_path, bundle_format, mode):
+    """测试各打包格式生成的文件可被 tarfile 读取"""
+    (tmp_path / "nginx.rpm").write_bytes(b"nginx" * 1000)
+    with patch.object(archive_module.config, "DOWNLOAD_DIR", tmp_path):
+        archive = archive_module.open_live_archive("t1", bundle_format, ["packages"])
+        archive.add(tmp_path / "nginx.rpm", "packages/nginx.rpm")
+        archive.close()
+        archive_module.release_live_archive("t1")
+
+    assert archive.path == tmp_path / f"packages-t1.{bundle_format}"
+    with tarfile.open(archive.path, mode) as tar:
+        assert tar.extractfile("packages/nginx.rpm").read() == b"nginx" * 1000
+
+
+def test_zstd_bundle_roundtrip(tmp_path):
+    """测试 tar.zst 压缩包可解压并由 tarfile 读取 (需要 zstandard)"""
+    zstandard = pytest.importorskip("zstandard")
+    (tmp_path / "nginx.rpm").write_bytes(os.urandom(64 * 1024) + b"nginx" * 10000)
+    with patch.object(archive_module.config, "DOWNLOAD_DIR", tmp_path):
+        archive = archive_module.open_live_archive("t1", "tar.zst", ["packages"])
+        archive.add(tmp_path / "nginx.rpm", "packages/nginx.rpm")
+        archive.close()
+        archive_module.release_live_archive("t1")
+
+    with open(archive.path, "rb") as f:
+        data = zstandard.ZstdDecompressor().stream_reader(f).read()
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:") as tar:
+        assert tar.getnames() == ["packages", "packages/nginx.rpm"]
+        assert tar.extractfile("packages/nginx.rpm").read() == (tmp_path / "nginx.rpm").read_bytes()
+    assert archive.path.stat().st_size < (tmp_path / "nginx.rpm").stat().st_size
+
+
+@pytest.mark.skipif(archive_module.zstandard is not None, reason="zstandard 已安装")
+def test_zstd_requires_optional_dependency():
+    """测试未安装 zstandard 时拒绝 tar.zst 格式"""
+    check_bundle_format("tar")
+    with pytest.raises(ValueError, match="zstandard"):
+        check_bundle_format("tar.zst")
+
+
+def test_abort_fails_readers_and_removes_file(tmp_path):
+    """测试放弃压缩包时等待中的读取方收到异常, 文件被删除"""
+    archive = LiveArchive(tmp_path / "out.tar.gz")
+
+    timer = threading.Timer(0.05, archive.abort, args=(RuntimeError("mirror down"),))
+
+    async def main():
+        timer.start()
+        return [chunk async for chunk in archive.stream()]
+
+    with pytest.raises(IOError, match="mirror down"):
+        asyncio.run(main())
+    timer.join()
+    assert not (tmp_path / "out.tar.gz").exists()
+    assert not archive._readers
+
+
+def test_download_task_streams_while_running(tmp_path):
+    """测试任务运行期间下载接口流式返回压缩包, 完成后返回文件"""
+    manager = TaskManager()
+    request = PackageRequest(packages=["nginx"], system_type="rpm", distribution="centos-7")
+    task = manager.create_task(request)
+    packages = [{"name": "nginx", "url": "http://example.com/Packages/nginx.rpm"}]
+    responses = []
+
+    class Downloader:
+        def download_packages(self, download_stream, output_dir, progress_callback):
+            output_dir.mkdir(parents=True)
+            (output_dir / "nginx.rpm").write_bytes(b"nginx")
+            progress_callback(1, 1, next(download_stream))
+            responses.append(asyncio.run(api_routes.download_file(task.task_id)))
+            return {"success": [output_dir / "nginx.rpm"], "failed": [], "total": 1, "cache_hits": 0}
+
+    with patch.object(api_routes, "task_manager", manager), patch.object(
+        api_routes.config, "DOWNLOAD_DIR", tmp_path
+    ), patch.object(api_routes, "resolve_download_stream", lambda request: iter(packages)), patch.object(
+        api_routes, "create_downloader", lambda **kwargs: Downloader()
+    ):
+        api_routes.run_download_task(task.task_id, request)
+
+    assert manager.get_task(task.task_id).status == "completed"
+    assert live_archive(task.task_id) is None
+    data = asyncio.run(read_body(responses[0]))
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as tar:
+        assert tar.extractfile("packages/packages/nginx.rpm").read() == b"nginx"
+
+
+def test_queue_mode_offers_download_only_after_completion(tmp_path):
+    """测试多 worker 模式下运行中的任务不提供下载链接 (压缩包在 worker 进程中写入)"""
+    manager = TaskManager()
+    request = PackageRequest(packages=["nginx"], system_type="rpm", distribution="centos-7")
+    task = manager.create_task(request)
+    packages = [{"name": "nginx", "url": "http://example.com/Packages/nginx.rpm"}]
+    urls_while_running = []
+
+    class Downloader:
+        def download_packages(self, download_stream, output_dir, progress_callback):
+            output_dir.mkdir(parents=True)
+            (output_dir / "nginx.rpm").write_bytes(b"nginx")
+            progress_callback(1, 1, next(download_stream))
+            urls_while_running.append(manager.get_task(task.task_id).download_url)
+            return {"success": [output_dir / "nginx.rpm"], "failed": [], "total": 1, "cache_hits": 0}
+
+    with patch.object(api_routes, "task_manager", manager), patch.object(
+        api_routes, "job_queue", object()
+    ), patch.object(api_routes.config, "DOWNLOAD_DIR", tmp_path), patch.object(
+        api_routes, "resolve_download_stream", lambda request: iter(packages)
+    ), patch.object(api_routes, "create_downloader", lambda **kwargs: Downloader()):
+        api_routes.run_download_task(task.task_id, request)
+
+    assert urls_while_running == [None]
+    assert manager.get_task(task.task_id).download_url == f"/api/download/{task.task_id}"
+
+
+def test_waiting_readers_do_not_hold_threads(tmp_path):
+    """测试多个读取方等待新数据时只占用事件循环, 不占用线程"""
+    archive = LiveArchive(tmp_path / "out.tar")
+    (tmp_path / "nginx.rpm").write_bytes(b"nginx" * 1000)
+
+    async def main():
+        readers = [asyncio.ensure_future(read_body_of(archive)) for _ in range(50)]
+        await asyncio.sleep(0.05)
+        threads = threading.active_count()
+        archive.add(tmp_path / "nginx.rpm", "nginx.rpm")
+        await asyncio.get_running_loop().run_in_executor(None, archive.close)
+        return threads, await asyncio.gather(*readers)
+
+    threads, bodies = asyncio.run(main())
+    assert threads < 10
+    with tarfile.open(fileobj=io.BytesIO(bodies[0]), mode="r:") as tar:
+        assert tar.extractfile("nginx.rpm").read() == b"nginx" * 1000
+    assert len(set(bodies)) == 1
+
+
+async def read_body_of(archive):
+    return b"".join([chunk async for chunk in archive.stream()])
+
+
+def test_available_bundle_formats():
+    """测试可用打包格式随 zstandard 是否安装变化"""
+    with patch.object(archive_module, "zstandard", None):
+        assert archive_module.available_bundle_formats() == ["tar", "tar.gz"]
+    with patch.object(archive_module, "zstandard", object()):
+        assert "tar.zst" in archive_module.available_bundle_formats()
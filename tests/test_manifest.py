@@ -0,0 +1,72 @@
+from backend.resolvers.index import PackageIndex
+from backend.resolvers.manifest import InstalledManifest
+from backend.resolvers.snapshot import open_snapshot, write_snapshot
+
+
+def test_parse_rpm_qa_and_dpkg_output():
+    """测试解析 rpm -qa 与 dpkg -l 输出, dpkg 表头与非安装状态被忽略"""
+    manifest = InstalledManifest.parse(
+        [
+            "openssl-libs-1.1.1k-5.el8_5.x86_64",
+            "Desired=Unknown/Install/Remove/Purge/Hold",
+            "||/ Name           Version         Architecture Description",
+            "+++-==============-===============-============-=================",
+            "ii  libc6:amd64    2.35-0ubuntu3.1 amd64        GNU C Library",
+            "rc  oldpkg         1.0             amd64        removed",
+            "",
+            "# comment",
+        ]
+    )
+
+    assert manifest.versions == {"openssl-libs": {"1.1.1k-5.el8_5"}, "libc6": {"2.35-0ubuntu3.1"}}
+
+
+def test_parse_names_versions_and_checksums():
+    """测试包名、包名=版本与校验值三种写法"""
+    digest = "ab" * 32
+    manifest = InstalledManifest.parse(["bash", "zlib=1.2.11", "pcre 8.44", f"SHA256:{digest.upper()}", "cd" * 32])
+
+    assert manifest.versions == {"bash": None, "zlib": {"1.2.11"}, "pcre": {"8.44"}}
+    assert manifest.checksums == {f"sha256:{digest}", f"sha256:{'cd' * 32}"}
+
+
+def test_satisfied_dependencies_and_roots():
+    """测试依赖按包名视为已满足, 根包只有版本或校验值一致时才跳过"""
+    index = PackageIndex("rpm", "http://example.com/")
+    index.add("nginx", "1.20", "x86_64", "Packages/nginx.rpm")
+    index.add("openssl", "1.1.1m", "x86_64", "Packages/openssl.rpm")
+    index.add("pcre", "8.44", "x86_64", "Packages/pcre.rpm", checksum="sha256:" + "ab" * 32)
+    index.add("curl", "7.61", "x86_64", "Packages/curl.rpm")
+
+    manifest = InstalledManifest.parse(["openssl=1.1.1k", "nginx=1.18", "curl=7.61", "ab" * 32, "unknown-pkg"])
+
+    assert manifest.satisfied(index, roots=["nginx", "curl"]) == {"openssl", "pcre", "curl"}
+
+
+def test_satisfied_with_snapshot_index(tmp_path):
+    """测试快照 (mmap) 索引上按校验值匹配, 结果与内存索引一致"""
+    index = PackageIndex("rpm", "http://example.com/")
+    index.add("a", "1", "x86_64", "Packages/a.rpm", checksum="sha256:" + "aa" * 32)
+    index.add("b", "1", "x86_64", "Packages/b.rpm", checksum="sha256:" + "bb" * 32)
+    write_snapshot(index, tmp_path / "repo.idx", "r1")
+    mapped = open_snapshot(tmp_path / "repo.idx")
+
+    manifest = InstalledManifest.parse(["bb" * 32])
+
+    assert manifest.satisfied(index, roots=[]) == {"b"}
+    assert manifest.satisfied(mapped, roots=[]) == {"b"}
+
+
+def test_root_with_new_release_is_downloaded():
+    """测试根包只提升 release (安全更新) 时仍然下载; epoch 与 release 缺省时的比较"""
+    index = PackageIndex("rpm", "http://example.com/")
+    index.add("openssl", "1.1.1k", "x86_64", "Packages/openssl.rpm", evr="1:1.1.1k-7.el8_6")
+    index.add("zlib", "1.2.11", "x86_64", "Packages/zlib.rpm", evr="1.2.11-18.el8")
+    index.add("bash", "4.4.20", "x86_64", "Packages/bash.rpm", evr="4.4.20-4.el8")
+    roots = ["openssl", "zlib", "bash"]
+
+    outdated = InstalledManifest.parse(["openssl-1.1.1k-5.el8_5.x86_64", "bash-4.4.20-4.el8.x86_64", "zlib=1.2.11"])
+    assert outdated.satisfied(index, roots) == {"bash", "zlib"}
+
+    current = InstalledManifest.parse(["openssl-1.1.1k-7.el8_6.x86_64"])
+    assert current.satisfied(index, roots) == {"openssl"}
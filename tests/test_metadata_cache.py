@@ -0,0 +1,298 @@
+import hashlib
+import threading
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
+from backend.metadata_cache import MetadataCache
+from backend.resolvers.registry import ParserRegistry
+from backend.resolvers.rpm import RPMRepodataParser
+
+
+def make_response(status_code=200, content=b"", headers=None):
+    response = Mock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.iter_content = lambda chunk_size: [content]
+    if status_code >= 400:
+        response.raise_for_status.side_effect = Exception(f"HTTP {status_code}")
+    return response
+
+
+def test_fetch_downloads_and_stores(tmp_path):
+    """测试首次获取下载并写入缓存"""
+    session = Mock()
+    session.get.return_value = make_response(content=b"metadata", headers={"ETag": '"v1"'})
+    cache = MetadataCache(tmp_path, ttl=0, session=session)
+
+    entry = cache.fetch("http://example.com/repodata/repomd.xml")
+
+    assert entry.changed
+    assert entry.path.read_bytes() == b"metadata"
+    assert entry.revision == hashlib.sha256(b"metadata").hexdigest()
+
+
+def test_fetch_revalidates_with_etag(tmp_path):
+    """测试过期后使用 ETag 条件请求, 304 时复用本地文件"""
+    session = Mock()
+    session.get.return_value = make_response(content=b"metadata", headers={"ETag": '"v1"'})
+    cache = MetadataCache(tmp_path, ttl=0, session=session)
+    first = cache.fetch("http://example.com/repodata/repomd.xml")
+
+    session.get.return_value = make_response(status_code=304)
+    second = cache.fetch("http://example.com/repodata/repomd.xml")
+
+    headers = session.get.call_args.kwargs["headers"]
+    assert headers["If-None-Match"] == '"v1"'
+    assert not second.changed
+    assert second.revision == first.revision
+
+
+def test_fetch_within_ttl_skips_request(tmp_path):
+    """测试 TTL 内不发起请求"""
+    session = Mock()
+    session.get.return_value = make_response(content=b"metadata")
+    cache = MetadataCache(tmp_path, ttl=300, session=session)
+
+    cache.fetch("http://example.com/repodata/repomd.xml")
+    cache.fetch("http://example.com/repodata/repomd.xml")
+
+    assert session.get.call_count == 1
+
+
+def test_fetch_with_known_checksum(tmp_path):
+    """测试已知校验值命中缓存, 不一致时报错"""
+    session = Mock()
+    session.get.return_value = make_response(content=b"primary")
+    cache = MetadataCache(tmp_path, ttl=0, session=session)
+    digest = hashlib.sha256(b"primary").hexdigest()
+
+    cache.fetch("http://example.com/primary.xml.gz", checksum=("sha256", digest))
+    cache.fetch("http://example.com/primary.xml.gz", checksum=("sha256", digest))
+    assert session.get.call_count == 1
+
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        cache.fetch("http://example.com/other.xml.gz", checksum=("sha256", "0" * 64))
+
+
+def test_concurrent_fetch_coalesced(tmp_path):
+    """测试同一文件的并发获取只发起一次请求"""
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_get(*args, **kwargs):
+        started.set()
+        release.wait(5)
+        return make_response(content=b"primary")
+
+    session = Mock()
+    session.get.side_effect = slow_get
+    cache = MetadataCache(tmp_path, ttl=60, session=session)
+    url = "http://example.com/repodata/primary.xml.gz"
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(cache.fetch, url)]
+        started.wait(5)
+        futures += [pool.submit(cache.fetch, url) for _ in range(3)]
+        time.sleep(0.1)
+        release.set()
+        entries = [future.result() for future in futures]
+
+    assert session.get.call_count == 1
+    assert all(entry.path.read_bytes() == b"primary" for entry in entries)
+
+
+def test_registry_shares_parser_for_same_mirror(tmp_path):
+    """测试相同镜像 URL 的发行版共用同一份索引"""
+    registry = ParserRegistry(MetadataCache(tmp_path), snapshot_dir=tmp_path / "index")
+
+    def fake_load(self):
+        self.revision = "r1"
+
+    with patch.object(RPMRepodataParser, "load_metadata", fake_load), patch.object(
+        RPMRepodataParser, "parse_packages"
+    ) as parse, patch.object(RPMRepodataParser, "probe_revision", return_value="r1"):
+        first = registry.get_rpm_parser("https://mirrors.example.com/centos/7/os/x86_64")
+        second = registry.get_rpm_parser("https://mirrors.example.com/centos/7/os/x86_64/")
+
+    assert first is second
+    assert parse.call_count == 1
+
+
+def test_registry_reloads_on_new_revision(tmp_path):
+    """测试仓库版本变化后重新加载"""
+    registry = ParserRegistry(MetadataCache(tmp_path), snapshot_dir=tmp_path / "index")
+
+    def fake_load(self):
+        self.revision = "r1"
+
+    with patch.object(RPMRepodataParser, "load_metadata", fake_load), patch.object(
+        RPMRepodataParser, "parse_packages"
+    ), patch.object(RPMRepodataParser, "probe_revision", return_value="r2"):
+        first = registry.get_rpm_parser("https://mirrors.example.com/fedora/")
+        second = registry.get_rpm_parser("https://mirrors.example.com/fedora/")
+
+    assert first is not second
+
+
+def test_registry_parses_in_worker_process(tmp_path):
+    """测试 parse_workers > 0 时在子进程中解析并写出快照, 本进程只映射结果"""
+    import gzip
+    from benchmarks.bench_rpm_parser import generate_primary
+    from benchmarks.local_mirror import LocalMirror
+    from backend.resolvers.snapshot import MappedPackageIndex
+
+    repomd = b"""<?xml version="1.0" encoding="UTF-8"?>
+<repomd xmlns="http://linux.duke.edu/metadata/repo">
+  <data type="primary"><location href="repodata/primary.xml.gz"/></data>
+</repomd>
+"""
+    files = {"/os/repodata/repomd.xml": repomd, "/os/repodata/primary.xml.gz": gzip.compress(generate_primary(50))}
+    registry = ParserRegistry(MetadataCache(tmp_path / "meta"), snapshot_dir=tmp_path / "index", parse_workers=1)
+
+    try:
+        with LocalMirror(files) as mirror, patch.object(
+            RPMRepodataParser, "parse_packages", side_effect=AssertionError("在本进程内解析")
+        ):
+            parser = registry.get_rpm_parser(f"{mirror.url}/os/")
+            again = registry.get_rpm_parser(f"{mirror.url}/os/")
+    finally:
+        registry.shutdown()
+
+    assert isinstance(parser.package_cache, MappedPackageIndex)
+    assert len(parser.package_cache) == 50
+    assert parser.package_cache["pkg7"]["version"] == "1.7"
+    assert again is parser
+    assert len(list((tmp_path / "index").glob("*.idx"))) == 1
+
+
+def test_background_refresh_swaps_index_atomically(tmp_path):
+    """测试启用后台刷新后获取索引不再重新验证, 新版本构建完成后整体替换"""
+    registry = ParserRegistry(MetadataCache(tmp_path), snapshot_dir=tmp_path / "index")
+    revision = ["r1"]
+
+    def fake_load(self):
+        self.revision = revision[0]
+        self.package_cache.add(f"pkg-{revision[0]}", "1", "x86_64", "pkg.rpm")
+
+    url = "https://mirrors.example.com/centos/7/os/x86_64/"
+    distributions = {"centos-7": {"type": "rpm", "baseos": url}, "rhel-7": {"type": "rpm", "baseos": url}}
+    with patch.object(RPMRepodataParser, "load_metadata", fake_load), patch.object(
+        RPMRepodataParser, "parse_packages"
+    ), patch.object(RPMRepodataParser, "probe_revision", side_effect=lambda: revision[0]) as probe:
+        registry.start_refresher(distributions, interval=3600)
+        wait = time.monotonic() + 5
+        while registry._sources == {} and time.monotonic() < wait:
+            time.sleep(0.01)
+        in_flight = registry.get_rpm_parser(url)
+        assert probe.call_count == 1
+
+        revision[0] = "r2"
+        assert registry.get_rpm_parser(url) is in_flight
+        registry.refresh()
+        current = registry.get_rpm_parser(url)
+
+    registry.shutdown()
+    assert current is not in_flight
+    assert "pkg-r2" in current.package_cache
+    # 已取得旧索引的任务继续使用旧版本
+    assert in_flight.revision == "r1"
+    assert "pkg-r1" in in_flight.package_cache
+
+
+def test_warm_up_skips_failed_repositories(tmp_path):
+    """测试预热时单个仓库失败不影响其他仓库"""
+    registry = ParserRegistry(MetadataCache(tmp_path), snapshot_dir=tmp_path / "index")
+    distributions = {
+        "centos-7": {"type": "rpm", "baseos": "https://a.example.com/os/"},
+        "ubuntu-22": {"type": "deb", "main": "https://b.example.com/main/", "arch": "amd64"},
+    }
+    loaded = Mock(package_cache=[])
+
+    def load_latest(key, url):
+        if key[0] == "deb":
+            raise ConnectionError("offline")
+        return loaded
+
+    with patch.object(registry, "_load_latest", side_effect=load_latest) as load:
+        registry.warm_up(distributions)
+
+    assert sorted(call.args[0][0] for call in load.call_args_list) == ["deb", "rpm"]
+
+
+def fake_rpm_load(self):
+    self.revision = "r1"
+    self.package_cache.add("bash", "5.1", "x86_64", "bash.rpm")
+
+
+def test_broken_parse_pool_keeps_refresher(tmp_path):
+    """测试解析进程池异常退出时只重建进程池, 后台刷新不受影响"""
+    from concurrent.futures.process import BrokenProcessPool
+
+    registry = ParserRegistry(MetadataCache(tmp_path), snapshot_dir=tmp_path / "index", parse_workers=1)
+    broken = Mock()
+    broken.submit.side_effect = BrokenProcessPool("killed")
+    registry._pool = broken
+
+    with patch.object(RPMRepodataParser, "load_metadata", fake_rpm_load), patch.object(
+        RPMRepodataParser, "parse_packages"
+    ), patch.object(RPMRepodataParser, "probe_revision", return_value="r1"):
+        parser = registry.get_rpm_parser("https://mirrors.example.com/centos/")
+
+    assert "bash" in parser.package_cache
+    broken.shutdown.assert_called_once()
+    assert registry._pool is None
+    assert not registry._stop.is_set()
+    registry.shutdown()
+    assert registry._stop.is_set()
+
+
+def test_parse_pool_falls_back_only_on_snapshot_write_error(tmp_path):
+    """测试子进程写快照失败时退回本进程解析, 下载元数据的网络错误照常抛出"""
+    import requests
+    from concurrent.futures import Future
+    from backend.resolvers.registry import SnapshotWriteError
+
+    def failing_pool(error):
+        future = Future()
+        future.set_exception(error)
+        pool = Mock()
+        pool.submit.return_value = future
+        return pool
+
+    registry = ParserRegistry(MetadataCache(tmp_path), snapshot_dir=tmp_path / "index", parse_workers=1)
+    url = "https://mirrors.example.com/centos/"
+    with patch.object(RPMRepodataParser, "load_metadata", fake_rpm_load), patch.object(
+        RPMRepodataParser, "parse_packages"
+    ), patch.object(RPMRepodataParser, "probe_revision", return_value="r1"):
+        registry._pool = failing_pool(requests.ConnectionError("mirror unreachable"))
+        with pytest.raises(requests.ConnectionError):
+            registry.get_rpm_parser(url)
+
+        registry._pool = failing_pool(SnapshotWriteError("disk full"))
+        parser = registry.get_rpm_parser(url)
+
+    assert "bash" in parser.package_cache
+    registry.shutdown()
+
+
+def test_prune_removes_unused_entries(tmp_path):
+    """测试长期未使用的条目被清理, 缓存命中会刷新使用时间"""
+    import os
+
+    session = Mock()
+    session.get.side_effect = lambda *args, **kwargs: make_response(content=b"primary")
+    cache = MetadataCache(tmp_path, ttl=300, session=session)
+    digest = hashlib.sha256(b"primary").hexdigest()
+    old = cache.fetch("http://example.com/repodata/r1-primary.xml.gz", checksum=("sha256", digest))
+    current = cache.fetch("http://example.com/repodata/r2-primary.xml.gz", checksum=("sha256", digest))
+
+    week_ago = time.time() - 7 * 24 * 3600
+    for entry in (old, current):
+        os.utime(entry.path.with_name(f"{entry.path.name}.json"), (week_ago, week_ago))
+    cache.fetch("http://example.com/repodata/r2-primary.xml.gz", checksum=("sha256", digest))
+
+    assert cache.prune(24 * 3600) == 1
+    assert not old.path.exists()
+    assert current.path.exists()
+    assert session.get.call_count == 2
@@ -0,0 +1,79 @@
+import time
+from backend.downloaders.blob_store import BlobStore
+from backend.downloaders.http import PackageDownloader
+from backend.downloaders.mirrors import MirrorGroup, mirror_group_for
+from benchmarks.local_mirror import LocalMirror
+
+
+def test_candidates_rewrite_to_each_mirror():
+    """测试包 URL 改写为各镜像的候选 URL"""
+    group = MirrorGroup(["http://a.test/centos/", "http://b.test/centos"])
+
+    candidates = group.candidates("http://a.test/centos/Packages/bash.rpm")
+
+    assert sorted(candidates) == [
+        "http://a.test/centos/Packages/bash.rpm",
+        "http://b.test/centos/Packages/bash.rpm",
+    ]
+    assert group.candidates("http://other.test/bash.rpm") == ["http://other.test/bash.rpm"]
+
+
+def test_failed_mirror_ranked_last():
+    """测试失败的镜像暂时下线, 排在健康镜像之后"""
+    group = MirrorGroup(["http://down.test/", "http://up1.test/", "http://up2.test/"])
+    group.record_failure("http://down.test/x.rpm")
+
+    for _ in range(20):
+        assert group.ranked()[-1] == "http://down.test/"
+
+    group.record_success("http://down.test/x.rpm", latency=0.1, nbytes=100, elapsed=1)
+    assert group.stats("http://down.test/").healthy(time.monotonic())
+
+
+def test_mirror_group_for_deb_uses_archive_root():
+    """测试 DEB 镜像以 /dists/ 之前的归档根目录为前缀"""
+    group = mirror_group_for({
+        "type": "deb",
+        "main": "http://archive.test/ubuntu/dists/jammy/main/",
+        "mirrors": ["http://mirror.test/ubuntu/dists/jammy/main/"],
+    })
+
+    assert group.bases == ["http://archive.test/ubuntu/", "http://mirror.test/ubuntu/"]
+    assert mirror_group_for({"type": "rpm", "baseos": "http://a.test/"}) is None
+
+
+def test_failover_to_healthy_mirror(tmp_path):
+    """测试镜像缺少文件时切换到其他镜像"""
+    data = b"glibc" * 100
+    with LocalMirror({}) as broken, LocalMirror({"/os/glibc.rpm": data}) as good:
+        group = MirrorGroup([broken.url + "/os/", good.url + "/os/"])
+        downloader = PackageDownloader(max_workers=1, store=BlobStore(tmp_path / "b", 1 << 20),
+                                       retry_delay=0, mirrors=group)
+        pkg = {"name": "glibc", "url": broken.url + "/os/glibc.rpm"}
+
+        for i in range(4):
+            results = downloader.download_packages([pkg], tmp_path / str(i))
+            assert results["failed"] == []
+
+    assert (tmp_path / "3" / "glibc.rpm").read_bytes() == data
+    # 失败一次后该镜像下线, 之后的下载不再请求它
+    assert len(broken.requests) <= 1
+
+
+def test_hedged_request_to_second_mirror(tmp_path):
+    """测试首选镜像迟迟不响应时, 对冲请求由第二个镜像完成"""
+    data = b"x" * 1000
+    with LocalMirror({"/os/p.rpm": data}, delay=3) as slow, LocalMirror({"/os/p.rpm": data}) as fast:
+        group = MirrorGroup([slow.url + "/os/", fast.url + "/os/"], hedge_delay=0.2)
+        group.ranked = lambda: group.bases
+        downloader = PackageDownloader(max_workers=1, store=BlobStore(tmp_path / "b", 1 << 20),
+                                       mirrors=group)
+
+        start = time.monotonic()
+        result = downloader._download_single({"name": "p", "url": slow.url + "/os/p.rpm"}, tmp_path)
+        elapsed = time.monotonic() - start
+
+    assert result.read_bytes() == data
+    assert elapsed < 2
+    assert len(fast.requests) == 1
+    assert downloader._requests()._max_workers == 2
@@ -0,0 +1,88 @@
+import io
+from backend.resolvers.index import PackageIndex, deb_depends_clauses
+from backend.resolvers.rpm import RPMRepodataParser, RPMDependencyResolver
+from backend.resolvers.deb import DEBPackageParser, DEBDependencyResolver
+from tests.test_rpm_resolver import SAMPLE_PRIMARY
+from tests.test_deb_resolver import SAMPLE_PACKAGES
+
+
+def test_record_view():
+    """测试记录以原有字段名暴露"""
+    index = PackageIndex("rpm", "http://example.com/os/")
+    index.add("bash", "5.1.8", "x86_64", "Packages/bash.rpm", 1024, ["libc.so.6()(64bit)"], ["bash"])
+
+    pkg = index["bash"]
+    assert pkg["name"] == "bash"
+    assert pkg["url"] == "http://example.com/os/Packages/bash.rpm"
+    assert pkg["size"] == 1024
+    assert pkg.get("requires") == ["libc.so.6()(64bit)"]
+    assert pkg.get("missing", "default") == "default"
+    assert dict(pkg)["provides"] == ["bash"]
+
+
+def test_strings_are_interned():
+    """测试相同的能力字符串只保存一份"""
+    index = PackageIndex("rpm", "http://example.com/os/")
+    for i in range(100):
+        index.add(f"pkg{i}", "1.0", "x86_64", f"pkg{i}.rpm", 0, ["libc.so.6()(64bit)"])
+
+    # 100 个包名 + 1 个架构 + 1 个能力
+    assert len(index.strings) == 102
+    assert len(index) == 100
+
+
+def test_later_duplicate_wins():
+    """测试同名包以后出现的为准"""
+    index = PackageIndex("rpm", "http://example.com/os/")
+    index.add("bash", "1.0", "x86_64", "old.rpm")
+    index.add("bash", "2.0", "x86_64", "new.rpm")
+
+    assert len(index) == 1
+    assert index["bash"]["version"] == "2.0"
+
+
+def test_deb_depends_clauses():
+    """测试 Depends 字段拆分并去掉版本限制"""
+    clauses = deb_depends_clauses("libc6 (>= 2.34), a (>= 1) | b:any, python3:any")
+    assert clauses == ["libc6", "a | b", "python3"]
+
+
+def test_deb_record_optional_depends():
+    """测试没有依赖的 DEB 包不暴露 Depends 字段"""
+    index = PackageIndex("deb", "http://example.com/ubuntu/dists/jammy/main/")
+    index.add("base-files", "12", "amd64", "pool/base-files.deb", 10)
+
+    pkg = index["base-files"]
+    assert "Depends" not in pkg
+    assert pkg.copy() == {
+        "Package": "base-files",
+        "Version": "12",
+        "Architecture": "amd64",
+        "Filename": "pool/base-files.deb",
+        "Size": "10",
+    }
+
+
+def test_rpm_resolver_on_index():
+    """测试 RPM 解析器基于索引解析依赖"""
+    parser = RPMRepodataParser("http://example.com/os/")
+    parser.parse_stream(io.BytesIO(SAMPLE_PRIMARY))
+
+    resolver = RPMDependencyResolver(parser)
+    packages = resolver.resolve("bash")
+
+    assert [p["name"] for p in packages] == ["bash", "ncurses-libs"]
+
+
+def test_deb_resolver_on_index():
+    """测试 DEB 解析器基于索引解析依赖"""
+    parser = DEBPackageParser("http://example.com/ubuntu/dists/jammy/main/")
+    parser.parse_stream(io.BytesIO(SAMPLE_PACKAGES))
+
+    resolver = DEBDependencyResolver(parser)
+    download_list = resolver.get_download_list(resolver.resolve("bash"))
+
+    assert [p["Package"] for p in download_list] == ["bash", "base-files"]
+    assert download_list[0]["url"] == (
+        "http://example.com/ubuntu/pool/main/b/bash/bash_5.1-6ubuntu1_amd64.deb"
+    )
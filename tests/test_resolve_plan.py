@@ -0,0 +1,90 @@
+import pytest
+from unittest.mock import patch
+from fastapi import HTTPException
+from backend import api_routes
+from backend.models import PackageRequest
+from backend.resolvers.closure_cache import ClosureCache
+from backend.resolvers.deb import DEBPackageParser
+from backend.resolvers.rpm import RPMRepodataParser
+
+
+@pytest.fixture
+def rpm_parser():
+    parser = RPMRepodataParser("http://example.com/")
+    parser.revision = "r1"
+    index = parser.package_cache
+    index.add("nginx", "1.20", "x86_64", "Packages/nginx.rpm", size=600,
+              requires=["openssl", "libmissing.so.1()(64bit)", "rpmlib(PayloadIsXz)"])
+    index.add("openssl", "1.1", "x86_64", "Packages/openssl.rpm", size=400, provides=["openssl"])
+    return parser
+
+
+def plan(request, **patches):
+    with patch.object(api_routes, "closure_cache", ClosureCache()), patch.multiple(
+        api_routes.parser_registry, **patches
+    ):
+        return api_routes.resolve_plan(request)
+
+
+def test_rpm_plan_sizes_and_unresolved(rpm_parser):
+    """测试计划包含各包大小、总大小与无法满足的依赖"""
+    request = PackageRequest(packages=["nginx"], system_type="rpm", distribution="centos-7")
+
+    result = plan(request, get_rpm_parser=lambda url: rpm_parser)
+
+    assert [(pkg.name, pkg.size) for pkg in result.packages] == [("nginx", 600), ("openssl", 400)]
+    assert result.packages[0].url == "http://example.com/Packages/nginx.rpm"
+    assert result.total_size == 1000
+    assert result.revision == "r1"
+    assert [(u.package, u.requirement) for u in result.unresolved] == [
+        ("nginx", "libmissing.so.1()(64bit)")
+    ]
+
+
+def test_deb_plan():
+    """测试 DEB 计划使用 Size 字段"""
+    parser = DEBPackageParser("http://deb.example.com/ubuntu/", arch="amd64")
+    parser.revision = "d1"
+    parser.package_cache.add("curl", "7.81", "amd64", "pool/c/curl.deb", size=200, requires=["libc6"])
+    parser.package_cache.add("libc6", "2.35", "amd64", "pool/g/libc6.deb", size=3000)
+    request = PackageRequest(
+        packages=["curl"], system_type="deb", distribution="ubuntu-22", arch="x86_64"
+    )
+
+    result = plan(request, get_deb_parser=lambda url, arch: parser)
+
+    assert result.arch == "amd64"
+    assert result.total_size == 3200
+    assert result.unresolved == []
+
+
+def test_resolve_endpoint_rejects_missing_package(rpm_parser):
+    """测试根包不存在时返回 400"""
+    request = PackageRequest(packages=["missing"], system_type="rpm", distribution="centos-7")
+
+    with patch.object(api_routes, "closure_cache", ClosureCache()), patch.object(
+        api_routes.parser_registry, "get_rpm_parser", return_value=rpm_parser
+    ):
+        with pytest.raises(HTTPException) as exc:
+            api_routes.resolve_packages(request)
+
+    assert exc.value.status_code == 400
+
+
+def test_plan_prunes_installed_packages():
+    """测试提供目标机已有的包时只保留缺少的包, 已有包的依赖不再展开"""
+    parser = RPMRepodataParser("http://example.com/")
+    parser.revision = "r1"
+    index = parser.package_cache
+    index.add("nginx", "1.20", "x86_64", "Packages/nginx.rpm", size=600, requires=["openssl", "pcre"])
+    index.add("openssl", "1.1", "x86_64", "Packages/openssl.rpm", size=400, requires=["zlib"])
+    index.add("pcre", "8.44", "x86_64", "Packages/pcre.rpm", size=100)
+    index.add("zlib", "1.2", "x86_64", "Packages/zlib.rpm", size=50)
+    request = PackageRequest(
+        packages=["nginx"], system_type="rpm", distribution="centos-7", installed=["openssl-1.1-5.el7.x86_64"]
+    )
+
+    result = plan(request, get_rpm_parser=lambda url: parser)
+
+    assert [pkg.name for pkg in result.packages] == ["nginx", "pcre"]
+    assert result.total_size == 700
@@ -1,7 +1,43 @@
+import gzip
+import io
 import pytest
 from backend.resolvers.rpm import RPMRepodataParser
 
 
+SAMPLE_PRIMARY = b"""<?xml version="1.0" encoding="UTF-8"?>
+<metadata xmlns="http://linux.duke.edu/metadata/common" xmlns:rpm="http://linux.duke.edu/metadata/rpm" packages="2">
+<package type="rpm">
+  <name>bash</name>
+  <arch>x86_64</arch>
+  <version epoch="0" ver="5.1.8" rel="6.el9"/>
+  <checksum type="sha256" pkgid="YES">5f2c0bd7a6e4</checksum>
+  <location href="Packages/bash-5.1.8-6.el9.x86_64.rpm"/>
+  <format>
+    <rpm:provides>
+      <rpm:entry name="bash"/>
+      <rpm:entry name="/bin/sh"/>
+    </rpm:provides>
+    <rpm:requires>
+      <rpm:entry name="rpmlib(BuiltinLuaScripts)"/>
+      <rpm:entry name="libtinfo.so.6()(64bit)"/>
+    </rpm:requires>
+  </format>
+</package>
+<package type="rpm">
+  <name>ncurses-libs</name>
+  <arch>x86_64</arch>
+  <version epoch="0" ver="6.2" rel="8.el9"/>
+  <location href="Packages/ncurses-libs-6.2-8.el9.x86_64.rpm"/>
+  <format>
+    <rpm:provides>
+      <rpm:entry name="libtinfo.so.6()(64bit)"/>
+    </rpm:provides>
+  </format>
+</package>
+</metadata>
+"""
+
+
 @pytest.fixture
 def rpm_parser():
     return RPMRepodataParser(
@@ -12,8 +48,8 @@ def rpm_parser():
 def test_load_metadata(rpm_parser):
     """测试加载 repomd.xml"""
     rpm_parser.load_metadata()
-    assert rpm_parser.primary_xml is not None
-    assert len(rpm_parser.primary_xml) > 0
+    assert rpm_parser.primary_path is not None
+    assert rpm_parser.primary_path.stat().st_size > 0
 
 
 def test_parse_packages(rpm_parser):
@@ -93,3 +129,31 @@ def test_avoid_duplicates(rpm_parser):
     # 检查没有重复的包
     names = [p["name"] for p in packages]
     assert len(names) == len(set(names))
+
+
+def test_parse_stream():
+    """测试流式解析 primary.xml"""
+    parser = RPMRepodataParser(mirror_url="http://example.com/os/")
+    parser.parse_stream(io.BytesIO(SAMPLE_PRIMARY))
+
+    bash_pkg = parser.find_package("bash")
+    assert bash_pkg["version"] == "5.1.8"
+    assert bash_pkg["url"] == "http://example.com/os/Packages/bash-5.1.8-6.el9.x86_64.rpm"
+    assert bash_pkg["requires"] == ["libtinfo.so.6()(64bit)"]
+    assert bash_pkg["provides"] == ["bash", "/bin/sh"]
+    assert bash_pkg["checksum"] == "sha256:5f2c0bd7a6e4"
+    assert parser.find_package("ncurses-libs")["requires"] == []
+    assert "checksum" not in parser.find_package("ncurses-libs")
+
+
+def test_parse_packages_from_gzip_file(tmp_path):
+    """测试从缓存的 primary.xml.gz 增量解压解析"""
+    primary = tmp_path / "primary"
+    primary.write_bytes(gzip.compress(SAMPLE_PRIMARY))
+
+    parser = RPMRepodataParser(mirror_url="http://example.com/os/")
+    parser.primary_path = primary
+    parser.primary_href = "repodata/abc-primary.xml.gz"
+    parser.parse_packages()
+
+    assert set(parser.package_cache) == {"bash", "ncurses-libs"}
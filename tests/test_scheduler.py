@@ -0,0 +1,102 @@
+import threading
+import time
+import pytest
+from backend.scheduler import DownloadScheduler, QueueFull
+
+
+def blocking_job(started, release, name):
+    def run():
+        started.append(name)
+        release.wait(5)
+    return run
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_concurrency_limit_and_queue_position():
+    """测试同时运行的任务数受限, 其余任务排队并有位置"""
+    scheduler = DownloadScheduler(concurrency=2)
+    started, release = [], threading.Event()
+
+    for i in range(4):
+        scheduler.submit(f"t{i}", blocking_job(started, release, f"t{i}"), client="a")
+
+    wait_until(lambda: len(started) == 2)
+    assert scheduler.stats()["running"] == 2
+    assert scheduler.position("t2") == 1
+    assert scheduler.position("t3") == 2
+    assert scheduler.position("t0") is None
+
+    release.set()
+    wait_until(lambda: len(started) == 4)
+    wait_until(lambda: scheduler.stats()["running"] == 0)
+
+
+def test_fair_share_between_clients():
+    """测试突发提交的客户端不会挤占其他客户端"""
+    scheduler = DownloadScheduler(concurrency=1)
+    started, release = [], threading.Event()
+    scheduler.submit("blocker", blocking_job(started, release, "blocker"), client="x")
+    wait_until(lambda: started == ["blocker"])
+
+    for i in range(3):
+        scheduler.submit(f"a{i}", lambda: None, client="a")
+    scheduler.submit("b0", lambda: None, client="b")
+
+    order = [job.task_id for job in scheduler._dispatch_order()]
+    assert order == ["a0", "b0", "a1", "a2"]
+    release.set()
+
+
+def test_priority_first():
+    """测试高优先级任务先启动"""
+    scheduler = DownloadScheduler(concurrency=1)
+    started, release = [], threading.Event()
+    scheduler.submit("blocker", blocking_job(started, release, "blocker"))
+    wait_until(lambda: started == ["blocker"])
+
+    scheduler.submit("low", lambda: started.append("low"), client="a")
+    scheduler.submit("high", lambda: started.append("high"), client="b", priority=5)
+    assert scheduler.position("high") == 1
+
+    release.set()
+    wait_until(lambda: len(started) == 3)
+    assert started == ["blocker", "high", "low"]
+
+
+def test_runtime_concurrency_and_cancel():
+    """测试运行时调大并发后立即启动排队任务, 以及取消排队任务"""
+    scheduler = DownloadScheduler(concurrency=1)
+    started, release = [], threading.Event()
+    for i in range(3):
+        scheduler.submit(f"t{i}", blocking_job(started, release, f"t{i}"))
+    wait_until(lambda: len(started) == 1)
+
+    assert scheduler.cancel("t2")
+    scheduler.set_concurrency(3)
+    wait_until(lambda: len(started) == 2)
+    assert scheduler.stats()["queued"] == 0
+    release.set()
+
+
+def test_queue_limit_rejects_when_full():
+    """测试排队任务达到上限后拒绝提交, 有空闲槽位时仍可提交"""
+    scheduler = DownloadScheduler(concurrency=1, max_queued=2)
+    started, release = [], threading.Event()
+    scheduler.submit("t0", blocking_job(started, release, "t0"))
+    wait_until(lambda: started == ["t0"])
+    scheduler.submit("t1", lambda: None)
+    scheduler.submit("t2", lambda: None)
+
+    with pytest.raises(QueueFull):
+        scheduler.submit("t3", lambda: None)
+    assert scheduler.stats()["queued"] == 2
+
+    release.set()
+    wait_until(lambda: scheduler.stats()["running"] == 0 and scheduler.stats()["queued"] == 0)
+    scheduler.submit("t4", lambda: None)
@@ -0,0 +1,132 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from backend.downloaders.async_http import AsyncEngine, AsyncPackageDownloader
+from backend.downloaders.blob_store import BlobStore
+from backend.downloaders.http import PackageDownloader
+from backend.singleflight import AsyncSingleFlight, SingleFlight
+from benchmarks.local_mirror import LocalMirror
+
+
+def run_concurrently(fns):
+    with ThreadPoolExecutor(max_workers=len(fns)) as pool:
+        return [future.result() for future in [pool.submit(fn) for fn in fns]]
+
+
+def test_concurrent_calls_share_result():
+    """测试执行期间到达的相同 key 调用共享一次执行结果"""
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "done"
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        leader = pool.submit(flight.do, "key", slow)
+        started.wait(5)
+        followers = [pool.submit(flight.do, "key", slow) for _ in range(3)]
+        while flight.shared < 3:
+            pass
+        release.set()
+
+        assert leader.result() == ("done", False)
+        assert [f.result() for f in followers] == [("done", True)] * 3
+    assert len(calls) == 1
+
+    # 执行结束后 key 被移除, 再次调用重新执行
+    release.set()
+    assert flight.do("key", slow) == ("done", False)
+    assert len(calls) == 2
+
+
+def test_leader_error_shared_or_retried():
+    """测试执行者失败时等待者默认共享异常, retry_on_error 时自行重新执行"""
+    for retry_on_error in (False, True):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def failing():
+            started.set()
+            release.wait(5)
+            raise IOError("mirror down")
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            leader = pool.submit(flight.do, "key", failing)
+            started.wait(5)
+            follower = pool.submit(flight.do, "key", lambda: "retried", retry_on_error)
+            while flight.shared < 1:
+                pass
+            release.set()
+
+            with pytest.raises(IOError):
+                leader.result()
+            if retry_on_error:
+                assert follower.result() == ("retried", False)
+            else:
+                with pytest.raises(IOError):
+                    follower.result()
+
+
+def test_async_singleflight():
+    """测试 asyncio 版本合并同一事件循环中的并发调用"""
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", fetch) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert sorted(results) == [("done", False)] + [("done", True)] * 4
+    assert len(calls) == 1
+
+
+def test_concurrent_tasks_download_package_once(tmp_path):
+    """测试两个任务同时下载同一个包时只向镜像请求一次, 两个任务目录都得到文件"""
+    data = b"kernel" * 10000
+    store = BlobStore(tmp_path / "blobs", quota_bytes=1 << 30)
+
+    with LocalMirror({"/kernel.rpm": data}, delay=0.2) as mirror:
+        pkg = {"name": "kernel", "url": mirror.url + "/kernel.rpm"}
+        downloaders = [PackageDownloader(store=store, retry_delay=0) for _ in range(2)]
+        results = run_concurrently(
+            [lambda d=d, i=i: d.download_packages([pkg], tmp_path / f"task{i}") for i, d in enumerate(downloaders)]
+        )
+
+    assert len(mirror.requests) == 1
+    assert sorted(r["cache_hits"] for r in results) == [0, 1]
+    for i in range(2):
+        assert (tmp_path / f"task{i}" / "kernel.rpm").read_bytes() == data
+
+
+def test_async_concurrent_tasks_download_package_once(tmp_path):
+    """测试 asyncio 引擎中不同任务的相同包只下载一次"""
+    data = b"glibc" * 10000
+    store = BlobStore(tmp_path / "blobs", quota_bytes=1 << 30)
+    engine = AsyncEngine(limit=8, limit_per_host=4)
+
+    try:
+        with LocalMirror({"/glibc.rpm": data}, delay=0.2) as mirror:
+            pkg = {"name": "glibc", "url": mirror.url + "/glibc.rpm"}
+            downloader = AsyncPackageDownloader(store=store, engine=engine, retry_delay=0)
+            results = run_concurrently(
+                [lambda i=i: downloader.download_packages([pkg], tmp_path / f"task{i}") for i in range(2)]
+            )
+    finally:
+        engine.close()
+
+    assert len(mirror.requests) == 1
+    assert sorted(r["cache_hits"] for r in results) == [0, 1]
+    for i in range(2):
+        assert (tmp_path / f"task{i}" / "glibc.rpm").read_bytes() == data
@@ -0,0 +1,105 @@
+import io
+import pytest
+from unittest.mock import patch
+from backend.metadata_cache import MetadataCache
+from backend.resolvers.deb import DEBPackageParser
+from backend.resolvers.registry import ParserRegistry
+from backend.resolvers.rpm import RPMRepodataParser, RPMDependencyResolver
+from backend.resolvers.snapshot import MappedPackageIndex, open_snapshot, write_snapshot
+from tests.test_deb_resolver import SAMPLE_PACKAGES
+from tests.test_rpm_resolver import SAMPLE_PRIMARY
+
+
+@pytest.fixture
+def rpm_parser():
+    parser = RPMRepodataParser("http://example.com/os/")
+    parser.parse_stream(io.BytesIO(SAMPLE_PRIMARY))
+    return parser
+
+
+def test_snapshot_roundtrip(rpm_parser, tmp_path):
+    """测试快照写入后映射打开, 记录内容一致"""
+    path = tmp_path / "rpm.idx"
+    write_snapshot(rpm_parser.package_cache, path, "r1")
+
+    index = open_snapshot(path)
+
+    assert isinstance(index, MappedPackageIndex)
+    assert index.revision == "r1"
+    assert sorted(index) == ["bash", "ncurses-libs"]
+    for name in index:
+        assert dict(index[name]) == dict(rpm_parser.package_cache[name])
+
+
+def test_snapshot_lookups(rpm_parser, tmp_path):
+    """测试直接在映射缓冲上按包名和能力查找"""
+    path = tmp_path / "rpm.idx"
+    write_snapshot(rpm_parser.package_cache, path, "r1")
+    index = open_snapshot(path)
+
+    assert "bash" in index
+    assert index.get("nonexistent") is None
+    (provider,) = index.providers_of("libtinfo.so.6()(64bit)")
+    assert index.name_of(provider) == "ncurses-libs"
+    assert index.providers_of("missing()") == []
+
+
+def test_resolve_against_snapshot(rpm_parser, tmp_path):
+    """测试解析器基于映射索引解析依赖"""
+    path = tmp_path / "rpm.idx"
+    write_snapshot(rpm_parser.package_cache, path, "r1")
+    rpm_parser.package_cache = open_snapshot(path)
+
+    packages = RPMDependencyResolver(rpm_parser).resolve("bash")
+
+    assert [p["name"] for p in packages] == ["bash", "ncurses-libs"]
+
+
+def test_deb_snapshot_roundtrip(tmp_path):
+    """测试 DEB 索引快照"""
+    parser = DEBPackageParser("http://example.com/ubuntu/dists/jammy/main/")
+    parser.parse_stream(io.BytesIO(SAMPLE_PACKAGES))
+    path = tmp_path / "deb.idx"
+    write_snapshot(parser.package_cache, path, "r1")
+
+    index = open_snapshot(path)
+
+    assert dict(index["bash"]) == dict(parser.package_cache["bash"])
+    assert "Depends" not in index["base-files"]
+
+
+def test_snapshot_version_mismatch(rpm_parser, tmp_path):
+    """测试格式版本不匹配时拒绝打开"""
+    path = tmp_path / "rpm.idx"
+    write_snapshot(rpm_parser.package_cache, path, "r1")
+
+    with patch("backend.resolvers.snapshot.SNAPSHOT_VERSION", 999):
+        with pytest.raises(ValueError, match="Unsupported snapshot"):
+            open_snapshot(path)
+
+
+def test_registry_warm_start_from_snapshot(tmp_path):
+    """测试新进程直接映射已有快照, 不再解析元数据"""
+    cache = MetadataCache(tmp_path / "metadata")
+
+    def fake_load(self):
+        self.revision = "r1"
+        self.parse_stream(io.BytesIO(SAMPLE_PRIMARY))
+
+    with patch.object(RPMRepodataParser, "load_metadata", fake_load), patch.object(
+        RPMRepodataParser, "parse_packages"
+    ), patch.object(RPMRepodataParser, "probe_revision", return_value="r1"):
+        ParserRegistry(cache, snapshot_dir=tmp_path / "index").get_rpm_parser(
+            "http://example.com/os/"
+        )
+
+    with patch.object(RPMRepodataParser, "load_metadata") as load, patch.object(
+        RPMRepodataParser, "probe_revision", return_value="r1"
+    ):
+        parser = ParserRegistry(cache, snapshot_dir=tmp_path / "index").get_rpm_parser(
+            "http://example.com/os/"
+        )
+
+    load.assert_not_called()
+    assert isinstance(parser.package_cache, MappedPackageIndex)
+    assert parser.find_package("bash")["version"] == "5.1.8"
@@ -1,3 +1,4 @@
+import sqlite3
 import pytest
 from backend.task_manager import TaskManager
 from backend.models import PackageRequest
@@ -57,3 +58,68 @@ def test_concurrent_limit():
         manager.increment_active()
 
     assert not manager.can_start_download()
+
+
+def make_request():
+    return PackageRequest(packages=["nginx"], system_type="rpm", distribution="centos-8")
+
+
+def test_tasks_survive_restart(tmp_path):
+    """测试任务写入数据库, 重启后已结束的任务保留, 未结束的任务标记为失败"""
+    db_path = tmp_path / "tasks.db"
+    manager = TaskManager(db_path, flush_interval=60)
+    done = manager.create_task(make_request())
+    running = manager.create_task(make_request())
+    manager.update_task(done.task_id, status="completed", progress=100)
+    manager.update_task(running.task_id, status="running", progress=40)
+    manager.close()
+
+    # 终态写入后移出内存
+    assert done.task_id not in manager.tasks
+
+    reopened = TaskManager(db_path)
+    assert reopened.get_task(done.task_id).status == "completed"
+    interrupted = reopened.get_task(running.task_id)
+    assert interrupted.status == "failed"
+    assert interrupted.progress == 40
+
+
+def test_progress_updates_are_batched(tmp_path):
+    """测试进度更新不立即写盘, flush 后才写入"""
+    manager = TaskManager(tmp_path / "tasks.db", flush_interval=60)
+    task = manager.create_task(make_request())
+    manager.update_task(task.task_id, status="running", progress=50)
+
+    stored = sqlite3.connect(tmp_path / "tasks.db")
+    assert stored.execute("SELECT status FROM tasks").fetchone() == ("pending",)
+
+    manager.flush()
+    assert stored.execute("SELECT status FROM tasks").fetchone() == ("running",)
+    # 列表使用内存中的最新状态
+    assert manager.list_tasks()[0].progress == 50
+
+
+def test_list_tasks_cursor_pagination():
+    """测试按创建时间倒序的游标分页与状态过滤"""
+    manager = TaskManager()
+    created = [manager.create_task(make_request()) for _ in range(5)]
+    manager.update_task(created[1].task_id, status="completed")
+
+    first = manager.list_tasks(limit=2)
+    second = manager.list_tasks(limit=2, before=(first[-1].created_at, first[-1].task_id))
+    third = manager.list_tasks(limit=2, before=(second[-1].created_at, second[-1].task_id))
+
+    ids = [task.task_id for task in first + second + third]
+    expected = sorted(created, key=lambda t: (t.created_at, t.task_id), reverse=True)
+    assert ids == [task.task_id for task in expected]
+    assert [task.task_id for task in manager.list_tasks(status="completed")] == [created[1].task_id]
+
+
+def test_delete_task():
+    """测试删除任务"""
+    manager = TaskManager()
+    task = manager.create_task(make_request())
+
+    assert manager.delete_task(task.task_id)
+    assert manager.get_task(task.task_id) is None
+    assert manager.count() == 0
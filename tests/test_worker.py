@@ -0,0 +1,208 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from backend import worker as worker_module
+from backend.events import task_events
+from backend.jobs import SQLiteJobQueue
+from backend.models import PackageRequest
+from backend.scheduler import QueueFull
+from backend.task_manager import TaskManager
+from backend.worker import Worker
+
+
+def make_request():
+    return PackageRequest(packages=["nginx"], system_type="rpm", distribution="centos-8")
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_queue_order_position_and_limit(tmp_path):
+    """测试按优先级与提交顺序出队, 排队位置, 取消与队列上限"""
+    queue = SQLiteJobQueue(tmp_path / "jobs.db", max_queued=3)
+    queue.submit("a", "{}")
+    queue.submit("b", "{}")
+    queue.submit("urgent", "{}", priority=5)
+
+    assert queue.position("urgent") == 1
+    assert queue.position("b") == 3
+    with pytest.raises(QueueFull):
+        queue.submit("c", "{}")
+
+    assert queue.cancel("b")
+    assert queue.claim("w1", lease=60).task_id == "urgent"
+    assert queue.claim("w1", lease=60).task_id == "a"
+    assert queue.claim("w1", lease=60) is None
+    assert queue.stats() == {"running": 2, "queued": 0, "max_queued": 3, "workers": 1}
+    # 已认领的任务被删除时也移出队列, worker 续租时得知租约丢失
+    assert queue.cancel("a")
+    assert queue.heartbeat("w1", ["urgent", "a"], lease=60) == ["a"]
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    """测试续租期间任务不会被抢走, 租约过期后由其他 worker 重新认领"""
+    db_path = tmp_path / "jobs.db"
+    first, second = SQLiteJobQueue(db_path), SQLiteJobQueue(db_path)
+    first.submit("t1", "{}")
+
+    assert first.claim("w1", lease=0.2).attempts == 1
+    time.sleep(0.1)
+    assert first.heartbeat("w1", ["t1"], lease=0.2) == []
+    time.sleep(0.15)
+    assert second.claim("w2", lease=60) is None
+
+    time.sleep(0.1)
+    job = second.claim("w2", lease=60)
+    assert (job.task_id, job.attempts) == ("t1", 2)
+
+    # 原 worker 续租时得知租约已丢失, 结束时也不会移除已被重新认领的任务
+    assert first.heartbeat("w1", ["t1"], lease=60) == ["t1"]
+    first.complete("t1", "w1")
+    assert first.stats()["running"] == 1
+
+    second.complete("t1", "w2")
+    assert first.stats()["running"] == 0
+
+
+def test_worker_runs_task_created_by_api(tmp_path):
+    """测试 API 进程创建并交出的任务由 worker 认领执行, 两边共享任务状态"""
+    db_path = tmp_path / "tasks.db"
+    api_side = TaskManager(db_path, flush_interval=60, recover=False)
+    worker_side = TaskManager(db_path, flush_interval=60, recover=False)
+    queue = SQLiteJobQueue(tmp_path / "jobs.db")
+
+    task = api_side.create_task(make_request())
+    queue.submit(task.task_id, make_request().model_dump_json())
+    api_side.detach(task.task_id)
+
+    def run(task_id, request):
+        assert request.packages == ["nginx"]
+        worker_side.update_task(task_id, status="running", progress=50)
+        worker_side.update_task(task_id, status="completed", progress=100)
+
+    worker = Worker(queue, worker_id="w1", concurrency=2, lease=60, run=run, poll_interval=0.01)
+    with patch.object(worker_module, "task_manager", worker_side):
+        thread = threading.Thread(target=worker.serve)
+        thread.start()
+        wait_until(lambda: api_side.get_task(task.task_id).status == "completed")
+        worker.stop()
+        thread.join()
+
+    assert queue.stats()["running"] == 0
+    assert task.task_id not in api_side.tasks
+
+
+def test_worker_gives_up_after_max_attempts(tmp_path):
+    """测试认领次数超过上限的任务标记为失败而不再执行"""
+    manager = TaskManager(tmp_path / "tasks.db", recover=False)
+    queue = SQLiteJobQueue(tmp_path / "jobs.db")
+    task = manager.create_task(make_request())
+    manager.detach(task.task_id)
+    queue.submit(task.task_id, make_request().model_dump_json())
+    for _ in range(3):
+        queue.claim("crashed", lease=-1)
+
+    ran = []
+    worker = Worker(queue, worker_id="w1", lease=60, run=lambda *args: ran.append(args), poll_interval=0.01)
+    with patch.object(worker_module, "task_manager", manager), patch.object(
+        worker_module.config, "JOB_MAX_ATTEMPTS", 3
+    ):
+        assert worker._claim_one()
+        wait_until(lambda: worker.active() == 0)
+
+    assert ran == []
+    assert manager.get_task(task.task_id).status == "failed"
+
+
+def test_worker_abandons_task_after_losing_lease(tmp_path):
+    """测试租约被其他 worker 接管后, 原 worker 停止产出下载项且不再写入任务状态"""
+    from backend import api_routes
+
+    manager = TaskManager(tmp_path / "tasks.db", flush_interval=60, recover=False)
+    queue = SQLiteJobQueue(tmp_path / "jobs.db")
+    task = manager.create_task(make_request())
+    queue.submit(task.task_id, make_request().model_dump_json())
+    produced = []
+
+    def packages():
+        for i in range(100):
+            produced.append(i)
+            yield {"url": f"http://example.com/p{i}.rpm"}
+            time.sleep(0.01)
+
+    def run(task_id, request):
+        manager.update_task(task_id, status="running")
+        with patch.object(api_routes, "task_manager", manager):
+            for _ in api_routes._while_owned(task_id, packages()):
+                pass
+
+    worker = Worker(queue, worker_id="w1", lease=0.3, run=run, poll_interval=0.01)
+    with patch.object(worker_module, "task_manager", manager):
+        thread = threading.Thread(target=worker.serve)
+        thread.start()
+        wait_until(lambda: produced)
+        # 模拟 w1 停顿期间租约过期, 任务被 w2 认领
+        queue._db.execute("UPDATE jobs SET worker = 'w2', lease_until = ?", (time.time() + 60,))
+        wait_until(lambda: worker.active() == 0)
+        worker.stop()
+        thread.join()
+
+    assert len(produced) < 100
+    assert not manager.owns(task.task_id)
+    assert manager.get_task(task.task_id).status == "pending"
+    assert queue.stats()["running"] == 1
+
+
+def test_watch_external_publishes_worker_progress(tmp_path):
+    """测试 API 进程读取 worker 写入数据库的进度并发布事件"""
+    db_path = tmp_path / "tasks.db"
+    api_side = TaskManager(db_path, flush_interval=60, recover=False)
+    worker_side = TaskManager(db_path, flush_interval=60, recover=False)
+    task = api_side.create_task(make_request())
+    api_side.detach(task.task_id)
+    worker_side.attach(task.task_id)
+
+    async def main():
+        subscription = task_events.subscribe(task.task_id)
+        api_side.watch_external(interval=0.02)
+        worker_side.update_task(task.task_id, status="running", progress=40)
+        worker_side.flush()
+        merged = {}
+        while merged.get("progress") != 40:
+            merged.update((await subscription.get(timeout=2))[task.task_id])
+        worker_side.update_task(task.task_id, status="completed", progress=100)
+        changes = await subscription.get(timeout=2)
+        task_events.unsubscribe(subscription)
+        return changes[task.task_id]
+
+    try:
+        assert asyncio.run(main()) == {"status": "completed", "progress": 100}
+    finally:
+        api_side.close()
+
+
+def test_deleted_running_task_is_not_written_back(tmp_path):
+    """测试 API 进程删除运行中的任务后, worker 落盘不会把任务写回, 且不再由 worker 更新"""
+    db_path = tmp_path / "tasks.db"
+    api_side = TaskManager(db_path, flush_interval=60, recover=False)
+    worker_side = TaskManager(db_path, flush_interval=60, recover=False)
+    task = api_side.create_task(make_request())
+    api_side.detach(task.task_id)
+    worker_side.attach(task.task_id)
+    worker_side.update_task(task.task_id, status="running", progress=40)
+    worker_side.flush()
+
+    api_side.delete_task(task.task_id)
+    worker_side.update_task(task.task_id, progress=60)
+    worker_side.flush()
+
+    assert api_side.get_task(task.task_id) is None
+    assert not worker_side.owns(task.task_id)